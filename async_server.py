@@ -0,0 +1,187 @@
+# async_server.py
+#
+# Single event-loop server core. Runs the same handshake, lobby and game logic
+# as the threaded core in socket_server.py, but every connection is an asyncio
+# protocol instead of a dedicated thread blocking on recv().
+
+import asyncio
+import socket
+
+import socket_server
+import log
+import stats
+import tracing
+import wire
+from outbound import MAX_QUEUED_BYTES
+from framing import LineReader, FrameTooLarge, MIN_RECV_SIZE
+
+LISTEN_BACKLOG = 4096        # room for connection bursts; the kernel caps it at somaxconn
+
+
+def raise_fd_limit():
+    """Raise the soft open-file limit to the hard limit so we can hold 10k+ sockets."""
+    try:
+        import resource
+    except ImportError:   # not available on Windows
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            pass
+
+
+class AsyncConnection:
+    """Socket-like wrapper around an asyncio transport.
+
+    The game logic only ever calls sendall(), shutdown() and close() on the
+    connections registered in a GameRoom's clients, so this adapter lets it run
+    unchanged. Writes are non-blocking: the transport's write buffer is this
+    client's outbound queue, bounded by the same overflow policy as the
+    threaded core's OutboundQueue.
+    """
+    def __init__(self, transport, max_bytes=MAX_QUEUED_BYTES):
+        self.transport = transport
+        self.max_bytes = max_bytes
+        self.encoding = wire.JSON
+        self.deltas = False
+
+    def sendall(self, data, sent=None):
+        # a closing transport is pruned by connection_lost(); never raise here,
+        # since broadcast() may be running under game_lock
+        if self.transport.is_closing():
+            return
+        pending = self.transport.get_write_buffer_size()
+        if pending + len(data) > self.max_bytes:
+            stats.incr("outbound_overflows")
+            log.warning("outbound_overflow", "Outbound queue overflow ({pending} bytes pending), disconnecting client.",
+                        pending=pending)
+            self.transport.abort()
+            return
+        # write() tries one send() right away unless data is already buffered
+        stats.update(send_calls=1, bytes_sent=len(data))
+        self.transport.write(data)
+        if sent is not None:
+            sent()    # written, or left in the transport's buffer for the loop to flush
+
+    def pending_bytes(self):
+        return self.transport.get_write_buffer_size()
+
+    def shutdown(self, how=socket.SHUT_RDWR):
+        self.transport.close()
+
+    def close(self):
+        self.transport.close()
+
+
+class PlayerProtocol(asyncio.BufferedProtocol):
+    """One player connection: handshake line, then messages in the negotiated encoding.
+
+    The transport receives straight into this connection's reader buffer.
+    A gateway that already read the handshake line passes it in, along with
+    any bytes that arrived after it as pending.
+    """
+    def __init__(self, handshake=None, pending=b""):
+        self.transport = None
+        self.conn = None
+        self.addr = None
+        self.handshake = handshake
+        self.username = None
+        self.room = None
+        self.reader = LineReader()
+        self.reader.feed(pending)
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.conn = AsyncConnection(transport)
+        self.addr = transport.get_extra_info("peername")
+        if self.handshake is not None:
+            self.start()
+            if self.room is not None and len(self.reader):
+                self.dispatch()
+
+    def start(self):
+        try:
+            self.username = socket_server.start_session(self.conn, self.handshake)
+            self.reader = socket_server.reader_for(self.conn, self.reader)
+            self.room = socket_server.admit_player(self.conn, self.addr, self.username)
+        except Exception as e:
+            log.warning("handshake_failed", "Bad handshake from {addr}: {error!r}",
+                        limit_key=self.addr[0] if self.addr else None, addr=self.addr, error=e)
+            self.transport.abort()
+
+    def get_buffer(self, sizehint):
+        return self.reader.writable(max(sizehint, MIN_RECV_SIZE))
+
+    def buffer_updated(self, nbytes):
+        self.reader.commit(nbytes)
+        try:
+            self.dispatch(tracing.clock() if socket_server.TRACE_PICKS else None)
+        except FrameTooLarge as e:
+            log.warning("frame_too_large", "{player}: {error}", limit_key=self.username or self.addr,
+                        player=self.username or self.addr, error=e)
+            self.transport.abort()
+
+    def dispatch(self, received=None):
+        if self.room is None:
+            if self.handshake is not None:
+                return   # rejected during the handshake; the transport is closing
+            # Step 1: the first line is the handshake (a username or a hello)
+            line = self.reader.next_frame()
+            if line is None:
+                if len(self.reader) > socket_server.HANDSHAKE_BYTES:
+                    self.transport.close()
+                return   # wait for the rest of the handshake
+            try:
+                self.handshake = line.decode()
+            except UnicodeDecodeError:
+                self.transport.close()
+                return
+            self.start()
+            if self.room is None:
+                return
+
+        for frame in self.reader.frames():
+            socket_server.handle_message(self.room, self.username, frame, self.conn.encoding, received)
+
+    def connection_lost(self, exc):
+        if self.room is not None:
+            log.info("player_left", "{username} disconnected. {reason}", username=self.username, reason=exc or "")
+            room, self.room = self.room, None
+            socket_server.drop_player(room, self.conn)
+
+
+async def serve():
+    loop = asyncio.get_running_loop()
+    # keep every delayed transition (lobby start, next round, room close) on this loop
+    socket_server.call_later = loop.call_later
+
+    server = await loop.create_server(
+        PlayerProtocol,
+        socket_server.HOST,
+        socket_server.PORT,
+        reuse_address=True,
+        backlog=LISTEN_BACKLOG,
+    )
+    # shutdown_server() closes socket_server.server_socket, which ends serve_forever()
+    socket_server.server_socket = server
+    log.info("listening", "Server listening on port {port} (asyncio core)…", port=socket_server.PORT)
+    try:
+        await server.serve_forever()
+    except asyncio.CancelledError:
+        pass
+
+
+def main():
+    raise_fd_limit()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        socket_server.shutdown_server()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# benchmarks/broadcast_cost.py
+#
+# Serialization and send cost per pick, from the stats counters.
+#
+# Four players connected over socketpairs (drained by reader threads) make
+# picks in one room; afterwards the per-pick encodes, broadcast frames, send
+# calls and bytes sent are printed for the chosen wire encoding.
+#
+# Usage: python3 benchmarks/broadcast_cost.py [--picks N] [--encoding json|bin1]
+
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import socket_server   # noqa: E402
+import stats   # noqa: E402
+import wire   # noqa: E402
+from catalogue import Catalogue, GameCourses   # noqa: E402
+from outbound import OutboundQueue   # noqa: E402
+
+PLAYERS = 4
+COURSE = "BENCH 100"
+
+
+def drain(sock):
+    while sock.recv(65536):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--picks", type=int, default=20000)
+    parser.add_argument("--encoding", choices=(wire.JSON, wire.BINARY), default=wire.JSON)
+    args = parser.parse_args()
+
+    room = socket_server.GameRoom(0)
+    for i in range(PLAYERS):
+        server_end, client_end = socket.socketpair()
+        threading.Thread(target=drain, args=(client_end,), daemon=True).start()
+        conn = OutboundQueue(server_end)
+        conn.encoding = args.encoding
+        room.clients.add(conn, f"p{i}")
+        room.scores.add(f"p{i}")
+        room.player_ids[f"p{i}"] = i
+    room.round_no = 1
+    room.phase = socket_server.PLAYING
+    room.courses = GameCourses(Catalogue.from_dict({COURSE: {"name": "Benchmark", "points": 0, "available_seats": 10 ** 9}}))
+    room.choose_round_courses()
+
+    # keep the round open: nobody but p0..p2 ever picks
+    stats.reset()
+    start = time.perf_counter()
+    for i in range(args.picks):
+        room.handle_selection(f"p{i % (PLAYERS - 1)}", COURSE)
+    elapsed = time.perf_counter() - start
+    time.sleep(0.5)   # let the writer threads flush
+
+    print(f"{args.picks} picks to {PLAYERS} {args.encoding} players in {elapsed:.2f}s ({args.picks / elapsed:,.0f} picks/s)")
+    for name, value in stats.per_pick().items():
+        print(f"  {name:<17}: {value:.2f} per pick")
+
+
+if __name__ == "__main__":
+    main()
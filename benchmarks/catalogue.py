@@ -0,0 +1,106 @@
+# benchmarks/catalogue.py
+#
+# Course catalogue cost for catalogues of several sizes, old dict-of-dicts
+# against the compact Catalogue/GameCourses:
+#
+#   memory         bytes held by the catalogue (tracemalloc)
+#   new game       copying the dicts per game vs. creating a GameCourses
+#   game           one game: draw every round and take seats (the old code
+#                  rescans the catalogue for a pool every round and finds
+#                  points with a linear search)
+#
+# Usage: python3 benchmarks/catalogue.py [--sizes 1000,100000,1000000] [--rounds N]
+
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalogue import Catalogue, GameCourses   # noqa: E402
+
+COURSES_PER_ROUND = 5
+PICKS_PER_ROUND = 4
+
+
+def make_courses(count):
+    return {f"BENCH {i}": {"name": f"Benchmark course number {i}", "points": i % 5, "available_seats": 1 + i % 3}
+            for i in range(count)}
+
+
+def copy_dicts(courses):
+    return {code: info.copy() for code, info in courses.items()}
+
+
+def play_dicts(courses, rounds):
+    game_courses = copy_dicts(courses)
+    for _ in range(rounds):
+        pool = [(code, info) for code, info in game_courses.items() if info["available_seats"] > 0]
+        picks = random.sample(pool, min(COURSES_PER_ROUND, len(pool)))
+        round_courses = [{"code": code, "name": info["name"], "points": info["points"],
+                          "available_seats": info["available_seats"]} for code, info in picks]
+        seat_map = {c["code"]: c["available_seats"] for c in round_courses}
+        for course in round_courses[:PICKS_PER_ROUND]:
+            code = course["code"]
+            seat_map[code] -= 1
+            game_courses[code]["available_seats"] -= 1
+            next(c["points"] for c in round_courses if c["code"] == code)
+
+
+def play_indexed(catalogue, rounds):
+    courses = GameCourses(catalogue)
+    for _ in range(rounds):
+        slots = courses.sample(COURSES_PER_ROUND)
+        for slot in slots:
+            courses.course(slot)
+        for slot in slots[:PICKS_PER_ROUND]:
+            courses.take_seat(slot)
+            catalogue.points[slot]
+
+
+def timed(func, *args, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(*args)
+    return (time.perf_counter() - start) / repeat
+
+
+def traced(build, *args):
+    """Build something under tracemalloc; returns (result, bytes still allocated)."""
+    gc.collect()
+    tracemalloc.start()
+    result = build(*args)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--rounds", type=int, default=6)
+    args = parser.parse_args()
+
+    print(f"game = {args.rounds} rounds of {COURSES_PER_ROUND} courses, {PICKS_PER_ROUND} picks each")
+    print(f"  {'courses':>8} | {'dict MB':>8} {'compact MB':>10} | {'new game ms':>11} {'compact':>9} |"
+          f" {'game ms':>8} {'compact':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        courses, dict_bytes = traced(make_courses, size)
+        catalogue, compact_bytes = traced(Catalogue.from_dict, courses)
+        repeat = max(1, 100000 // size)
+        copy_s = timed(copy_dicts, courses, repeat=repeat)
+        new_s = timed(GameCourses, catalogue, repeat=1000)
+        old_game = timed(play_dicts, courses, args.rounds, repeat=repeat)
+        new_game = timed(play_indexed, catalogue, args.rounds, repeat=1000)
+        print(f"  {size:>8} | {dict_bytes / 1e6:>8.1f} {compact_bytes / 1e6:>10.1f} |"
+              f" {copy_s * 1e3:>11.2f} {new_s * 1e3:>9.4f} | {old_game * 1e3:>8.2f} {new_game * 1e3:>8.3f}")
+        del courses, catalogue
+        gc.collect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/catalogue_files.py
+#
+# Startup cost of loading a course catalogue from disk: a generated catalogue
+# is written as JSON lines and compiled to the binary format, then each is
+# loaded and one game is played over it. Also reports how long a fresh
+# interpreter takes to import utils (which no longer builds a course list).
+#
+# Usage: python3 benchmarks/catalogue_files.py [--courses N]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import catalogue   # noqa: E402
+
+COURSES_PER_ROUND = 5
+ROUNDS = 6
+
+
+def write_jsonl(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            f.write(json.dumps({"code": f"BENCH {i}", "name": f"Benchmark course number {i}",
+                                "points": i % 5, "available_seats": 1 + i % 3}) + "\n")
+
+
+def first_game(cat):
+    game = catalogue.GameCourses(cat)
+    for _ in range(ROUNDS):
+        for slot in game.sample(COURSES_PER_ROUND):
+            game.course(slot)
+            game.take_seat(slot)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def import_time(module):
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(out.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--courses", type=int, default=2000000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        jsonl = os.path.join(tmp, "courses.jsonl")
+        compiled = os.path.join(tmp, "courses.cat")
+        write_jsonl(jsonl, args.courses)
+        _, compile_s = timed(catalogue.save, catalogue.load(jsonl), compiled)
+
+        print(f"{args.courses} courses: {os.path.getsize(jsonl) / 1e6:.1f} MB JSON lines, "
+              f"{os.path.getsize(compiled) / 1e6:.1f} MB compiled")
+        for label, path in (("JSON lines", jsonl), ("compiled", compiled)):
+            cat, load_s = timed(catalogue.load, path)
+            _, game_s = timed(first_game, cat)
+            print(f"  {label:<11} load {load_s * 1e3:10.2f} ms   first game {game_s * 1e3:8.3f} ms")
+            del cat
+
+    print(f"import utils: {import_time('utils') * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# benchmarks/framing.py
+#
+# Line framing throughput: the old str-buffer split loop vs framing.LineReader.
+#
+# A burst of pipelined seat_update-sized JSON lines is delivered in chunks of
+# different sizes (in memory, and through a real socketpair) and each reader
+# extracts every complete line. Large chunks are where the old loop goes
+# quadratic: every split() copies the whole remaining backlog.
+#
+# Usage: python3 benchmarks/framing.py [--messages N]
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from framing import LineReader   # noqa: E402
+
+
+def make_burst(count):
+    line = json.dumps({"type": "seat_update", "course_code": "CMPT 225", "seats_left": 3,
+                       "username": "Zoë", "denied": False}).encode() + b"\n"
+    return line * count
+
+
+def split_lines(chunks):
+    """The original loop: decode each chunk, append, split one line at a time."""
+    count = 0
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk.decode()
+        while '\n' in buffer:
+            line, buffer = buffer.split('\n', 1)
+            count += 1
+    return count
+
+
+def line_reader(chunks):
+    count = 0
+    reader = LineReader()
+    for chunk in chunks:
+        reader.feed(chunk)
+        for _ in reader.frames():
+            count += 1
+    return count
+
+
+def in_memory(burst, chunk_size, messages):
+    chunks = [burst[i:i + chunk_size] for i in range(0, len(burst), chunk_size)]
+    results = {}
+    for name, fn in (("str split", split_lines), ("LineReader", line_reader)):
+        start = time.perf_counter()
+        assert fn(chunks) == messages
+        results[name] = messages / (time.perf_counter() - start)
+    return results
+
+
+def over_socket(burst, messages):
+    """recv(1024)+split vs LineReader.recv_from() on a socketpair carrying the whole burst."""
+    results = {}
+    for name in ("str split", "LineReader"):
+        a, b = socket.socketpair()
+        sender = threading.Thread(target=lambda: (a.sendall(burst), a.close()))
+        start = time.perf_counter()
+        sender.start()
+        count = 0
+        if name == "LineReader":
+            reader = LineReader()
+            while reader.recv_from(b):
+                for _ in reader.frames():
+                    count += 1
+        else:
+            buffer = ""
+            while True:
+                data = b.recv(1024).decode(errors="ignore")
+                if not data:
+                    break
+                buffer += data
+                while '\n' in buffer:
+                    line, buffer = buffer.split('\n', 1)
+                    count += 1
+        results[name] = messages / (time.perf_counter() - start)
+        sender.join()
+        b.close()
+        assert count == messages
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=50000)
+    args = parser.parse_args()
+    burst = make_burst(args.messages)
+    print(f"{args.messages} messages, {len(burst) / 1e6:.1f} MB burst")
+    print(f"{'delivery':<22} {'str split msg/s':>16} {'LineReader msg/s':>17} {'speedup':>8}")
+
+    rows = [(f"memory, {size}-byte chunks", in_memory(burst, size, args.messages))
+            for size in (1024, 16 * 1024, 256 * 1024)]
+    rows.append(("socketpair, recv()", over_socket(burst, args.messages)))
+    for label, r in rows:
+        print(f"{label:<22} {r['str split']:>16,.0f} {r['LineReader']:>17,.0f} "
+              f"{r['LineReader'] / r['str split']:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+# benchmarks/hotpaths.py
+#
+# Microbenchmarks for the server's hot paths, run in isolation against fake
+# sockets (no network, no threads): handle_selection, broadcast,
+# choose_round_courses, update_lobby and the LineReader framing that
+# handle_connection runs on every recv.
+#
+# For each benchmark it records
+#   ops_per_s         operations per second (best of several timed batches)
+#   peak_bytes        transient memory one operation allocates (tracemalloc peak)
+#   blocks_per_op     memory blocks still allocated afterwards, per operation
+#                     (non-zero means the operation grows some structure)
+#
+# Results can be saved as JSON and compared with a saved baseline; the
+# comparison exits with status 1 if anything regressed beyond --tolerance.
+# A benchmark that comes out slower is timed again (--retries) and keeps its
+# best rate, so one run disturbed by a busy host doesn't fail the check.
+# The whole suite takes well under a minute.
+#
+# Usage: python3 benchmarks/hotpaths.py [--save results.json] [--baseline benchmarks/baseline.json]
+#                                       [--only NAME ...] [--seconds 0.5]
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import socket_server   # noqa: E402
+import wire   # noqa: E402
+from catalogue import Catalogue, GameCourses   # noqa: E402
+from framing import LineReader   # noqa: E402
+
+PLAYERS = socket_server.MAX_CLIENTS
+COURSE = "BENCH 100"
+CATALOGUE_SIZE = 10000
+
+
+class FakeConn:
+    """Stands in for an OutboundQueue/AsyncConnection: counts what would be sent."""
+    def __init__(self, encoding=wire.JSON):
+        self.encoding = encoding
+        self.bytes_sent = 0
+
+    def sendall(self, data):
+        self.bytes_sent += len(data)
+
+    def shutdown(self, how):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeSocket:
+    """recv_into() from a fixed burst of bytes, over and over."""
+    def __init__(self, data, chunk):
+        self.data = data
+        self.chunk = chunk
+        self.pos = 0
+
+    def recv_into(self, buffer):
+        if self.pos >= len(self.data):
+            self.pos = 0
+        n = min(len(buffer), self.chunk, len(self.data) - self.pos)
+        buffer[:n] = self.data[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+
+def make_room(encoding=wire.JSON, players=PLAYERS, courses=None):
+    """A room mid-round whose one course never runs out of seats (so rounds never end)."""
+    room = socket_server.GameRoom(0)
+    for i in range(players):
+        room.clients.add(FakeConn(encoding), f"p{i}")
+        room.scores.add(f"p{i}")
+        room.player_ids[f"p{i}"] = i
+    room.courses = GameCourses(courses or Catalogue.from_dict(
+        {COURSE: {"name": "Benchmark", "points": 0, "available_seats": 10 ** 9}}))
+    room.round_no = 1
+    room.phase = socket_server.PLAYING
+    room.choose_round_courses()
+    return room
+
+
+def big_catalogue():
+    return Catalogue.from_dict({f"BENCH {i}": {"name": f"Benchmark course {i}", "points": i % 5,
+                                               "available_seats": 1 + i % 3}
+                                for i in range(CATALOGUE_SIZE)})
+
+
+# ─── benchmarks: each returns a zero-argument callable doing one operation ──
+
+def bench_handle_selection():
+    room = make_room()
+    picker = iter(range(10 ** 12))
+    # only p0..p2 pick, so the round stays open
+    return lambda: room.handle_selection(f"p{next(picker) % (PLAYERS - 1)}", COURSE)
+
+
+def bench_handle_selection_bin1():
+    room = make_room(wire.BINARY)
+    picker = iter(range(10 ** 12))
+    return lambda: room.handle_selection(f"p{next(picker) % (PLAYERS - 1)}", COURSE)
+
+
+def bench_handle_selection_denied():
+    room = make_room()
+    return lambda: room.handle_selection("p0", "NOT OFFERED")
+
+
+def bench_handle_selection_ranked():
+    # a select_ranked whose first choice is full: granted its second choice
+    room = make_room(courses=Catalogue.from_dict({
+        COURSE: {"name": "Benchmark", "points": 0, "available_seats": 10 ** 9},
+        "BENCH FULL": {"name": "Full", "points": 0, "available_seats": 1}}))
+    room.handle_selection("p0", "BENCH FULL")
+    picker = iter(range(10 ** 12))
+    return lambda: room.handle_selection(f"p{next(picker) % (PLAYERS - 1)}", "BENCH FULL", fallbacks=(COURSE,))
+
+
+def bench_broadcast():
+    room = make_room()
+    message = {"type": "seat_update", "course_code": COURSE, "seats_left": 3, "username": "p0", "denied": False}
+    return lambda: room.broadcast(message)
+
+
+def bench_choose_round_courses():
+    room = make_room(courses=big_catalogue())
+    return room.choose_round_courses
+
+
+def bench_update_lobby():
+    # a lobby one player short of full, so nothing gets scheduled
+    room = make_room(players=PLAYERS - 1)
+    room.phase = socket_server.LOBBY
+    room.round_no = 0
+    return room.update_lobby
+
+
+def bench_framing():
+    # one recv of a pipelined burst of picks, split into lines and parsed
+    line = wire.encode_json({"type": "select_course", "course_code": COURSE})
+    sock = FakeSocket(line * 64, chunk=4096)
+    reader = LineReader()
+
+    def op():
+        reader.recv_from(sock)
+        for frame in reader.frames():
+            json.loads(frame)
+    return op
+
+
+BENCHMARKS = {
+    "handle_selection": bench_handle_selection,
+    "handle_selection_bin1": bench_handle_selection_bin1,
+    "handle_selection_denied": bench_handle_selection_denied,
+    "handle_selection_ranked": bench_handle_selection_ranked,
+    "broadcast": bench_broadcast,
+    "choose_round_courses": bench_choose_round_courses,
+    "update_lobby": bench_update_lobby,
+    "framing": bench_framing,
+}
+
+
+# ─── measurement ────────────────────────────────────────────────────────────
+
+def ops_per_second(op, seconds):
+    """Best rate over five batches sized to take about seconds / 5 each."""
+    batch = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(batch):
+            op()
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds / 50:
+            break
+        batch *= 2
+    batch = max(1, int(batch * (seconds / 5) / elapsed))
+    rates = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(batch):
+            op()
+        rates.append(batch / (time.perf_counter() - start))
+    return max(rates)
+
+
+def peak_bytes(op, samples=20):
+    """Median tracemalloc peak of a single operation."""
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(samples):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            op()
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    return statistics.median(peaks)
+
+
+def blocks_per_op(op, count=2000):
+    gc.collect()
+    before = sys.getallocatedblocks()
+    for _ in range(count):
+        op()
+    gc.collect()
+    return (sys.getallocatedblocks() - before) / count
+
+
+def run_suite(names, seconds):
+    results = {}
+    for name in names:
+        op = BENCHMARKS[name]()
+        op()   # warm up (first-call allocations, lazily built structures)
+        results[name] = {
+            "ops_per_s": ops_per_second(op, seconds),
+            "peak_bytes": peak_bytes(op),
+            "blocks_per_op": blocks_per_op(op),
+        }
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print current vs. baseline; returns the names that regressed."""
+    regressed = []
+    print(f"{'benchmark':<26} {'ops/s':>12} {'baseline':>12} {'change':>8}   {'peak B':>8} {'baseline':>8}")
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<26} {current['ops_per_s']:>12,.0f} {'(new)':>12}")
+            continue
+        change = current["ops_per_s"] / base["ops_per_s"] - 1
+        slower = change < -tolerance
+        bigger = current["peak_bytes"] > base["peak_bytes"] * (1 + tolerance) + 64
+        leaks = current["blocks_per_op"] > base["blocks_per_op"] + 0.5
+        flag = "  REGRESSION" if slower or bigger or leaks else ""
+        if flag:
+            regressed.append(name)
+        print(f"{name:<26} {current['ops_per_s']:>12,.0f} {base['ops_per_s']:>12,.0f} {change:>+8.1%}"
+              f"   {current['peak_bytes']:>8.0f} {base['peak_bytes']:>8.0f}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument("--seconds", type=float, default=0.5, help="timing budget per benchmark")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with results saved earlier with --save")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed slowdown / memory growth before a result counts as a regression")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="times a benchmark slower than the baseline is re-timed before it counts")
+    args = parser.parse_args()
+
+    names = args.only or list(BENCHMARKS)
+    results = run_suite(names, args.seconds)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "benchmarks": results,
+            }, f, indent=2)
+            f.write("\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["benchmarks"]
+        for _ in range(args.retries):
+            slow = [name for name, r in results.items() if name in baseline
+                    and r["ops_per_s"] < baseline[name]["ops_per_s"] * (1 - args.tolerance)]
+            if not slow:
+                break
+            for name, again in run_suite(slow, args.seconds).items():
+                results[name]["ops_per_s"] = max(results[name]["ops_per_s"], again["ops_per_s"])
+        regressed = compare(results, baseline, args.tolerance)
+        if regressed:
+            print(f"\n{len(regressed)} regression(s): {', '.join(regressed)}")
+            sys.exit(1)
+    else:
+        print(f"{'benchmark':<26} {'ops/s':>12} {'peak B':>8} {'blocks/op':>10}")
+        for name, r in results.items():
+            print(f"{name:<26} {r['ops_per_s']:>12,.0f} {r['peak_bytes']:>8.0f} {r['blocks_per_op']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
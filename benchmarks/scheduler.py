@@ -0,0 +1,67 @@
+# benchmarks/scheduler.py
+#
+# Cost of keeping many rooms' transitions pending at once: N callbacks are
+# scheduled with random delays, as when N rooms sit in their round break, using
+# one threading.Timer per call (the old approach) and the shared Scheduler.
+# Reports peak thread count, time to schedule and how late callbacks fire.
+#
+# Usage: python3 benchmarks/scheduler.py [--calls N] [--max-delay SECONDS]
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import Scheduler   # noqa: E402
+
+
+def timer_call_later(delay, callback, *args):
+    timer = threading.Timer(delay, callback, args)
+    timer.daemon = True
+    timer.start()
+    return timer
+
+
+def run(call_later, calls, max_delay):
+    lateness = []
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def fired(due):
+        late = time.monotonic() - due
+        with lock:
+            lateness.append(late)
+            if len(lateness) == calls:
+                done.set()
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        delay = random.uniform(0, max_delay)
+        call_later(delay, fired, time.monotonic() + delay)
+    schedule_s = time.perf_counter() - start
+    peak_threads = threading.active_count()
+    done.wait(max_delay + 30)
+    return schedule_s, peak_threads, lateness
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--max-delay", type=float, default=1.0)
+    args = parser.parse_args()
+
+    print(f"{args.calls} pending transitions, delays up to {args.max_delay}s")
+    for name, call_later in (("Timer", timer_call_later), ("Scheduler", Scheduler().call_later)):
+        schedule_s, threads, lateness = run(call_later, args.calls, args.max_delay)
+        ms = sorted(x * 1000 for x in lateness)
+        print(f"  {name:<10} threads {threads:>5}   schedule {schedule_s * 1e3:8.1f} ms   "
+              f"late p50 {statistics.median(ms):6.2f} ms  p99 {ms[int(len(ms) * 0.99) - 1]:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# benchmarks/sharding.py
+#
+# Rooms per second through gateway.py at 1, 2, 4 and 8 worker processes.
+#
+# Starts a gateway on a free local port with all round delays set to ~0, then
+# runs complete games with simple bots (pick a random course, retry on denial)
+# from separate driver processes, and reports finished games per second.
+# Scaling only shows on a machine with that many idle cores.
+#
+# Usage: python3 benchmarks/sharding.py [--rooms 200] [--workers 1 2 4 8]
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import socket_server   # noqa: E402
+from gateway import Gateway   # noqa: E402
+
+FAST_SETTINGS = {
+    "LOBBY_DELAY": 0,
+    "ROUND_BREAK": 0,
+    "GAME_OVER_DELAY": 0.05,   # long enough for game_over to leave the outbound queue
+}
+
+
+async def play(port, username):
+    """One bot: join, pick until enrolled each round, return True on game_over."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write((username + "\n").encode())
+    candidates = []
+
+    def pick():
+        if candidates:
+            msg = {"type": "select_course", "course_code": candidates.pop()}
+            writer.write((json.dumps(msg) + "\n").encode())
+
+    try:
+        async for line in reader:
+            msg = json.loads(line)
+            kind = msg["type"]
+            if kind == "round_start":
+                candidates = [c["code"] for c in msg["courses"] if c["available_seats"] > 0]
+                random.shuffle(candidates)
+                pick()
+            elif kind == "seat_update" and msg["username"] == username and msg["denied"]:
+                pick()
+            elif kind == "game_over":
+                return True
+        return False
+    finally:
+        writer.close()
+
+
+async def drive(port, players, prefix):
+    results = await asyncio.gather(*(play(port, f"{prefix}-{i}") for i in range(players)),
+                                   return_exceptions=True)
+    return sum(1 for r in results if r is True)
+
+
+def driver_main(port, players, prefix):
+    return asyncio.run(drive(port, players, prefix))
+
+
+def run(workers, rooms, drivers, core):
+    gateway = Gateway(workers, host="127.0.0.1", port=0, core=core, settings=FAST_SETTINGS)
+    gateway.start_workers()
+    gateway.listen()
+    thread = threading.Thread(target=gateway.serve_forever, daemon=True)
+    thread.start()
+
+    players = rooms * socket_server.MAX_CLIENTS
+    per_driver = [players // drivers + (1 if i < players % drivers else 0) for i in range(drivers)]
+    # keep each driver's share a multiple of a room so rooms fill completely
+    per_driver = [n - n % socket_server.MAX_CLIENTS for n in per_driver]
+    per_driver[0] += players - sum(per_driver)
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(drivers) as pool:
+        finished = sum(pool.starmap(driver_main,
+                                    [(gateway.port, n, f"w{workers}d{i}") for i, n in enumerate(per_driver)]))
+    elapsed = time.perf_counter() - start
+
+    gateway.stop()
+    thread.join(timeout=2)
+    return finished / socket_server.MAX_CLIENTS, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rooms", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--drivers", type=int, default=min(4, os.cpu_count() or 1),
+                        help="bot driver processes")
+    parser.add_argument("--core", choices=("threads", "asyncio"), default="asyncio")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPU(s), {args.rooms} rooms per run, {args.core} workers, {args.drivers} bot driver(s)")
+    print(f"{'workers':>8} {'games':>7} {'seconds':>8} {'rooms/s':>9}")
+    for workers in args.workers:
+        games, elapsed = run(workers, args.rooms, args.drivers, args.core)
+        print(f"{workers:>8} {games:>7.0f} {elapsed:>8.2f} {games / elapsed:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/wire.py
+#
+# Size and CPU cost of the JSON and bin1 wire encodings for the messages a
+# pick produces (seat_update + round_wait) and for a lobby roster, for a room
+# of the given size. Encode times are server side (once per broadcast);
+# decode times are what each client pays.
+#
+# Usage: python3 benchmarks/wire.py [--players N] [--iterations N]
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import wire   # noqa: E402
+from framing import LineReader, LengthPrefixedReader   # noqa: E402
+
+
+def sample_messages(players):
+    users = [f"player{i}" for i in range(players)]
+    courses = [{"code": f"CMPT {100 + i}", "name": f"Course {i}", "points": 3, "available_seats": 10}
+               for i in range(5)]
+    seat_update = {"type": "seat_update", "course_code": "CMPT 102", "seats_left": 7,
+                   "username": users[0], "denied": False}
+    round_wait = {"type": "round_wait", "round": 3, "player_count": players, "current_players": 1,
+                  "users": users[:1], "scores": {u: 7 for u in users}}
+    lobby = {"type": "lobby", "player_count": players, "users": users}
+    round_start = {"type": "round_start", "round": 3, "courses": courses}
+    player_ids = {u: i for i, u in enumerate(users)}
+    course_index = {c["code"]: i for i, c in enumerate(courses)}
+    return [seat_update, round_wait], lobby, round_start, player_ids, course_index
+
+
+def per_call_us(func, iterations):
+    return timeit.timeit(func, number=iterations) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--iterations", type=int, default=50000)
+    args = parser.parse_args()
+
+    pick, lobby, round_start, player_ids, course_index = sample_messages(args.players)
+
+    def encode_json(messages):
+        return b"".join(wire.encode_json(m) for m in messages)
+
+    def encode_binary(messages):
+        return b"".join(wire.encode_binary(m, course_index, player_ids) for m in messages)
+
+    def decode_json(data):
+        reader = LineReader()
+        reader.feed(data)
+        return [json.loads(line) for line in reader.frames()]
+
+    decoder = wire.BinaryDecoder()
+
+    def decode_binary(data):
+        reader = LengthPrefixedReader()
+        reader.feed(data)
+        return [decoder.decode(payload) for payload in reader.frames()]
+
+    # the client learns player ids and course positions before any pick
+    decode_binary(encode_binary([lobby, round_start]))
+
+    print(f"{args.players} players, {args.iterations} iterations")
+    print(f"  {'message':<12} {'encoding':<6} {'bytes':>6} {'encode us':>10} {'decode us':>10}")
+    for label, messages in (("pick", pick), ("lobby", [lobby])):
+        for name, encode, decode in ((wire.JSON, encode_json, decode_json),
+                                     (wire.BINARY, encode_binary, decode_binary)):
+            data = encode(messages)
+            assert decode(data) == messages, f"{name} round trip changed {label}"
+            enc = per_call_us(lambda: encode(messages), args.iterations)
+            dec = per_call_us(lambda: decode(data), args.iterations)
+            print(f"  {label:<12} {name:<6} {len(data):>6} {enc:>10.2f} {dec:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+# catalogue.py
+#
+# Compact, indexed course catalogue. A Catalogue stores every course column by
+# column, addressed by slot number: codes and names live in StringTables (one
+# UTF-8 blob plus an offsets array) and points and seats in fixed-width
+# arrays, so a course costs a few dozen bytes instead of a dict of dicts.
+#
+# Each game gets its own GameCourses over the shared catalogue. Seat counts are
+# copy-on-write (only courses the game has taken seats from are stored), so a
+# new game is created in O(1). Drawing a round samples the catalogue's open
+# slots and taking a seat updates the game in place, so a round costs the same
+# whether the catalogue has 94 courses or a million.
+#
+# Code that expects the old dict shape can still read info["name"],
+# info["points"] and info["available_seats"] through a CourseView.
+#
+# Catalogues are loaded from disk with load(): either JSON lines (one course
+# per line, parsed up front; courses.jsonl is the default) or a compiled
+# binary file, which is memory-mapped so its columns are used in place and
+# pages are only read as courses are touched. Compile one with
+#
+#   python3 catalogue.py compile courses.jsonl courses.cat
+#
+# Binary layout (native little-endian, every section padded to 8 bytes):
+#   header   magic, course count, open-slot count, code blob size, name blob size
+#   points   uint16 per course         seats       uint32 per course
+#   open     uint32 per open slot      code/name offsets  uint32 per course + 1
+#   code blob, name blob (UTF-8)
+
+import argparse
+import array
+import collections.abc
+import json
+import mmap
+import random
+import struct
+import sys
+
+MAGIC = b"ERCAT\x00\x01\x00"
+HEADER = struct.Struct("<8s4Q")
+
+
+class StringTable:
+    """Many strings stored as one UTF-8 blob; item i is decoded on access."""
+    def __init__(self, blob, offsets):
+        self.blob = blob          # bytes (or any buffer) holding every string back to back
+        self.offsets = offsets    # string i is blob[offsets[i]:offsets[i + 1]]
+
+    @classmethod
+    def from_strings(cls, strings):
+        parts = []
+        offsets = array.array("I", [0])
+        end = 0
+        for text in strings:
+            data = text.encode()
+            parts.append(data)
+            end += len(data)
+            offsets.append(end)
+        return cls(b"".join(parts), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return str(self.blob[self.offsets[index]:self.offsets[index + 1]], "utf-8")
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def nbytes(self):
+        return len(self.blob) + self.offsets.itemsize * len(self.offsets)
+
+
+class CourseView(collections.abc.Mapping):
+    """Read-only dict-like view of one course: name, points and available_seats.
+
+    Seats come from the game when one is given, otherwise from the catalogue.
+    """
+    FIELDS = ("name", "points", "available_seats")
+
+    def __init__(self, catalogue, slot, game=None):
+        self.catalogue = catalogue
+        self.slot = slot
+        self.game = game
+
+    def __getitem__(self, key):
+        if key == "name":
+            return self.catalogue.names[self.slot]
+        if key == "points":
+            return self.catalogue.points[self.slot]
+        if key == "available_seats":
+            if self.game is not None:
+                return self.game.seats_left(self.slot)
+            return self.catalogue.seats[self.slot]
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+
+class Catalogue(collections.abc.Mapping):
+    """Read-only course data shared by every game, stored column-wise by slot.
+
+    Also a mapping of course code -> CourseView, so it can stand in for a
+    dict like utils.cmpt_courses.
+    """
+    def __init__(self, codes, names, points, seats, open_slots=None):
+        self.codes = codes        # StringTable
+        self.names = names        # StringTable
+        self.points = points      # unsigned shorts (an array, or a memoryview of a mapped file)
+        self.seats = seats        # unsigned ints: seats each game starts with
+        # the slots a new game can draw from
+        if open_slots is None:
+            open_slots = array.array("I", (slot for slot, left in enumerate(seats) if left > 0))
+        self.open_slots = open_slots
+        self._slots = None        # code -> slot, built on first lookup by code
+
+    @classmethod
+    def from_dict(cls, courses):
+        """Build a catalogue from {code: {"name", "points", "available_seats"}}."""
+        return cls.from_rows({"code": code, **info} for code, info in courses.items())
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a catalogue from dicts with code, name, points and available_seats."""
+        rows = list(rows)
+        return cls(
+            StringTable.from_strings(row["code"] for row in rows),
+            StringTable.from_strings(row["name"] for row in rows),
+            array.array("H", (row["points"] for row in rows)),
+            array.array("I", (row["available_seats"] for row in rows))
+        )
+
+    def __len__(self):
+        return len(self.points)
+
+    def __iter__(self):
+        return iter(self.codes)
+
+    def __getitem__(self, code):
+        slot = self.slot(code)
+        if slot is None:
+            raise KeyError(code)
+        return CourseView(self, slot)
+
+    def slot(self, code):
+        """Slot number of a course code, or None if it is not in the catalogue."""
+        if self._slots is None:
+            self._slots = {code: slot for slot, code in enumerate(self.codes)}
+        return self._slots.get(code)
+
+    def nbytes(self):
+        """Bytes held by the columns (not counting the lazy code -> slot dict)."""
+        return (self.codes.nbytes() + self.names.nbytes() + self.open_slots.itemsize * len(self.open_slots)
+                + self.points.itemsize * len(self.points) + self.seats.itemsize * len(self.seats))
+
+
+class GameCourses:
+    """One game's seat counts over a shared Catalogue, created in O(1).
+
+    taken holds the seats left in every course this game has taken a seat
+    from; every other course still has the catalogue's count.
+    """
+    def __init__(self, catalogue):
+        self.catalogue = catalogue
+        self.taken = {}        # slot -> seats left
+        self.exhausted = 0     # open catalogue slots this game has filled
+
+    def __len__(self):
+        """Number of courses that still have seats."""
+        return len(self.catalogue.open_slots) - self.exhausted
+
+    def __getitem__(self, code):
+        slot = self.catalogue.slot(code)
+        if slot is None:
+            raise KeyError(code)
+        return CourseView(self.catalogue, slot, self)
+
+    def seats_left(self, slot):
+        left = self.taken.get(slot)
+        return self.catalogue.seats[slot] if left is None else left
+
+    def sample(self, count):
+        """Pick up to count distinct slots that still have seats, at random."""
+        open_slots = self.catalogue.open_slots
+        available = len(open_slots) - self.exhausted
+        count = min(count, available)
+        if available < 4 * count or available * 2 < len(open_slots):
+            # few courses left to choose from: list them rather than retry
+            pool = [slot for slot in open_slots if self.seats_left(slot) > 0]
+            return random.sample(pool, count)
+
+        # draw from every open slot, skipping filled ones and repeats
+        picked = []
+        while len(picked) < count:
+            slot = open_slots[random.randrange(len(open_slots))]
+            if slot not in picked and self.seats_left(slot) > 0:
+                picked.append(slot)
+        return picked
+
+    def course(self, slot):
+        """The course in slot as the dict sent to clients in round_start."""
+        catalogue = self.catalogue
+        return {
+            "code": catalogue.codes[slot],
+            "name": catalogue.names[slot],
+            "points": catalogue.points[slot],
+            "available_seats": self.seats_left(slot)
+        }
+
+    def take_seat(self, slot):
+        """Take one seat in slot; returns the seats left (the caller checks there was one)."""
+        left = self.seats_left(slot) - 1
+        self.taken[slot] = left
+        if left == 0:
+            self.exhausted += 1
+        return left
+
+    def release_seat(self, slot):
+        """Give back a seat taken with take_seat (a hold that was not used); returns the seats left."""
+        left = self.taken[slot] + 1
+        self.taken[slot] = left
+        if left == 1:
+            self.exhausted -= 1
+        return left
+
+
+# ─── files ──────────────────────────────────────────────────────────────────
+
+def load(path):
+    """Load a catalogue file: compiled binary (memory-mapped) or JSON lines."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) == MAGIC:
+            return _load_binary(f)
+    return load_jsonl(path)
+
+
+def load_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return Catalogue.from_rows(json.loads(line) for line in f if line.strip())
+
+
+def _padded(size):
+    return (size + 7) & ~7
+
+
+def _load_binary(f):
+    if sys.byteorder != "little":
+        raise ValueError("compiled catalogues can only be mapped on little-endian machines")
+    # the mapping stays open for as long as the catalogue's views reference it
+    data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    magic, count, open_count, code_bytes, name_bytes = HEADER.unpack_from(data)
+    pos = _padded(HEADER.size)
+
+    def take(nbytes, fmt=None):
+        nonlocal pos
+        if pos + nbytes > len(data):
+            raise ValueError("catalogue file is truncated")
+        view = data[pos:pos + nbytes]
+        pos += _padded(nbytes)
+        return view.cast(fmt) if fmt else view
+
+    points = take(2 * count, "H")
+    seats = take(4 * count, "I")
+    open_slots = take(4 * open_count, "I")
+    code_offsets = take(4 * (count + 1), "I")
+    name_offsets = take(4 * (count + 1), "I")
+    codes = StringTable(take(code_bytes), code_offsets)
+    names = StringTable(take(name_bytes), name_offsets)
+    return Catalogue(codes, names, points, seats, open_slots)
+
+
+def save(catalogue, path):
+    """Write a catalogue in the compiled binary format."""
+    if sys.byteorder != "little":
+        raise ValueError("compiled catalogues can only be written on little-endian machines")
+    sections = [
+        array.array("H", catalogue.points).tobytes(),
+        array.array("I", catalogue.seats).tobytes(),
+        array.array("I", catalogue.open_slots).tobytes(),
+        array.array("I", catalogue.codes.offsets).tobytes(),
+        array.array("I", catalogue.names.offsets).tobytes(),
+        bytes(catalogue.codes.blob),
+        bytes(catalogue.names.blob),
+    ]
+    header = HEADER.pack(MAGIC, len(catalogue), len(catalogue.open_slots),
+                         len(sections[-2]), len(sections[-1]))
+    with open(path, "wb") as f:
+        for section in [header] + sections:
+            f.write(section)
+            f.write(bytes(_padded(len(section)) - len(section)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enrolment Rush course catalogues")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compile_cmd = commands.add_parser("compile", help="compile a JSON lines catalogue to the binary format")
+    compile_cmd.add_argument("source")
+    compile_cmd.add_argument("target")
+    info_cmd = commands.add_parser("info", help="print a catalogue's size and first courses")
+    info_cmd.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "compile":
+        catalogue = load(args.source)
+        save(catalogue, args.target)
+        print(f"Wrote {len(catalogue)} courses to {args.target}")
+    else:
+        catalogue = load(args.path)
+        print(f"{len(catalogue)} courses, {len(catalogue.open_slots)} with seats")
+        for slot in range(min(5, len(catalogue))):
+            print(f"  {catalogue.codes[slot]}: {dict(CourseView(catalogue, slot))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,113 @@ import socket
 import threading
 import json
 import queue
+import time
+
+import tracing
+import wire
+from framing import LineReader, LengthPrefixedReader
 
 MAX_CLIENTS = 4
 
 
+class RoomState:
+    """The room as a deltas client sees it: a state snapshot plus every delta after it.
+
+    apply() takes each message from the server in order and returns the
+    messages to hand to the GUI callbacks, rebuilt in the full form the
+    server sends to other clients (the whole roster, every score and so on).
+    A sequence gap makes it ask for a resync and drop messages until the
+    fresh snapshot arrives.
+    """
+    def __init__(self):
+        self.seq = None         # sequence number of the last message applied; None until the first snapshot
+        self.awaiting = False   # a gap was seen and a snapshot requested
+        self.users = []         # players in the lobby, in join order
+        self.round = 0
+        self.courses = []       # this round's course dicts, available_seats kept current
+        self.picks = []         # players who picked this round
+        self.scores = {}        # username -> points
+        self.gaps = 0
+
+    def apply(self, message):
+        """Returns (messages for the callbacks, whether to send a resync request)."""
+        seq = message.get("seq")
+        if message.get("type") == "state":
+            return self._snapshot(message), False
+        if seq is None:
+            return [message], False     # not part of the room state (username_taken and the like)
+        if self.awaiting:
+            return [], False
+        if self.seq is None or seq > self.seq + 1:
+            self.awaiting = True
+            self.gaps += 1
+            return [], True
+        if seq <= self.seq:
+            return [], False            # already covered by the snapshot
+        self.seq = seq
+        return [self._delta(message)], False
+
+    def _snapshot(self, message):
+        replacing = self.seq is not None or self.awaiting
+        previous_round = self.round
+        self.seq = message["seq"]
+        self.awaiting = False
+        self.users = list(message["users"])
+        self.round = message["round"]
+        self.courses = [dict(course) for course in message["courses"]]
+        self.picks = list(message["picks"])
+        self.scores = dict(message["scores"])
+        if not replacing:
+            return []   # joining: the lobby delta that follows announces us
+        # after a gap, bring the screens up to date
+        if self.round == 0:
+            return [self.lobby()]
+        if self.round != previous_round:
+            return [{"type": "round_start", "round": self.round, "courses": [dict(c) for c in self.courses],
+                     "time_left": message.get("time_left", 0)}]
+        return [self.round_wait()]
+
+    def _delta(self, message):
+        kind = message.get("type")
+        if kind == "lobby":
+            left = set(message["left"])
+            present = set(self.users)
+            self.users = [u for u in self.users if u not in left]
+            self.users += [u for u in message["joined"] if u not in present]
+            for username in message["joined"]:
+                self.scores.setdefault(username, 0)
+            return self.lobby()
+        if kind == "round_start":
+            self.round = message["round"]
+            self.courses = [dict(course) for course in message["courses"]]
+            self.picks = []
+            return message
+        if kind == "seat_update":
+            for course in self.courses:
+                if course["code"] == message["course_code"]:
+                    course["available_seats"] = message["seats_left"]
+                    break
+            return message
+        if kind == "round_wait":
+            if message["picked"] not in self.picks:
+                self.picks.append(message["picked"])
+            self.scores[message["picked"]] = message["points"]
+            return self.round_wait()
+        if kind == "round_over":
+            return {"type": "round_over", "round": message["round"], "scores": dict(self.scores),
+                    "users": list(self.picks), "no_pick": message["no_pick"]}
+        if kind == "game_over":
+            return {"type": "game_over", "winner": message["winner"], "final_scores": dict(self.scores)}
+        return message
+
+    def lobby(self):
+        return {"type": "lobby", "player_count": len(self.users), "users": list(self.users)}
+
+    def round_wait(self):
+        return {"type": "round_wait", "round": self.round, "player_count": len(self.picks),
+                "current_players": len(self.users), "users": list(self.picks), "scores": dict(self.scores)}
+
+
 class ClientConnection:
     def __init__(
         self,
@@ -21,7 +124,9 @@ class ClientConnection:
         game_over_callback=None,
         server_host='127.0.0.1',        # testing
         #server_host='165.227.45.38',  # final demo
-        server_port=11888
+        server_port=11888,
+        stamp_picks=False,
+        deltas=True
     ):
         self.server_host = server_host
         self.server_port = server_port
@@ -35,18 +140,39 @@ class ClientConnection:
         self.seat_update_callback = seat_update_callback
         self.game_over_callback = game_over_callback
 
+        # with stamp_picks, each select_course (or select_ranked) carries its wall-clock send time
+        # (so a --trace server can time the network leg) and the round trip to
+        # our own seat_update is recorded in pick_rtt (microseconds)
+        self.stamp_picks = stamp_picks
+        self.pick_rtt = tracing.Histogram()
+        self.pick_sent = None
+
+        # with deltas (and a server that offers them), the server sends only
+        # what changed and state holds the rebuilt room; callbacks still get
+        # full messages
+        self.want_deltas = deltas
+        self.state = None
+
         self.sock = None
+        self.encoding = wire.JSON       # switched by the server's welcome
+        self.decoder = None
         self.out_q = queue.Queue()
         self.running = True
 
         # start networking thread
         threading.Thread(target=self.connect_to_server, daemon=True).start()
 
-    # public helper to send any JSON message to the server
+    # public helper to send any message to the server, in the negotiated encoding
     def send(self, data):
         try:
             if self.sock:
-                self.sock.sendall((json.dumps(data) + '\n').encode())
+                if self.stamp_picks and data.get("type") in ("select_course", "select_ranked"):
+                    data = {**data, "sent_at": time.time()}
+                    self.pick_sent = time.perf_counter()
+                if self.encoding == wire.BINARY:
+                    self.sock.sendall(wire.encode_select(data))
+                else:
+                    self.sock.sendall(wire.encode_json(data))
         except Exception as e:
             print(f"[Client] send() failed: {e}")
 
@@ -56,24 +182,35 @@ class ClientConnection:
             self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.sock.connect((self.server_host, self.server_port))
 
-            # send username with newline
-            self.sock.sendall((self.username + '\n').encode())
+            # say hello (username + the encodings we understand) and read the welcome
+            self.sock.sendall(wire.hello(self.username, features=(wire.DELTAS,) if self.want_deltas else ()))
+            reader = LineReader(size=64 * 1024)
+            welcome = None
+            while welcome is None:
+                if not reader.recv_from(self.sock):
+                    return  # connection closed by server
+                welcome = reader.next_frame()
+            welcome = json.loads(welcome)
+            if welcome.get("type") == "welcome":
+                self.encoding = welcome.get("encoding", wire.JSON)
+                if wire.DELTAS in welcome.get("features", ()):
+                    self.state = RoomState()
+                if self.encoding == wire.BINARY:
+                    self.decoder = wire.BinaryDecoder()
+                    framed = LengthPrefixedReader(size=64 * 1024)
+                    framed.feed(reader.pending())
+                    reader = framed
+                first = []
+            else:
+                first = [welcome]  # not a welcome: handle it like any other message
 
-            buffer = ""
             while self.running:
-                payload = self.sock.recv(1024).decode()
-                if not payload:
-                    break  # connection closed by server
-                buffer += payload
-
-                # process newline-delimited JSON messages
-                while '\n' in buffer:
-                    line, buffer = buffer.split('\n', 1)
-
-                    if not line:
-                        continue
-
-                    message = json.loads(line)
+                # process JSON lines or bin1 frames, decoded to the same dicts
+                messages = first + [self.decode(frame) for frame in reader.frames() if frame]
+                first = []
+                if self.state is not None:
+                    messages = self.rebuild(messages)
+                for message in messages:
                     msg_type = message.get("type")
 
                     # route by message type
@@ -113,6 +250,10 @@ class ClientConnection:
                             self.round_update_callback(message)
 
                     elif msg_type == "seat_update":
+                        if (self.pick_sent is not None and message.get("username") == self.username
+                                and "hold" not in message):
+                            self.pick_rtt.record((time.perf_counter() - self.pick_sent) * 1e6)
+                            self.pick_sent = None
                         if self.seat_update_callback:
                             seat_denied = message.get("denied")
                             if seat_denied is True:
@@ -148,6 +289,9 @@ class ClientConnection:
                             pass
                         return
 
+                if not reader.recv_from(self.sock):
+                    break  # connection closed by server
+
         except Exception as e:
             print(f"Error connecting to server: {e}")
             if self.lobby_fail_callback:
@@ -159,6 +303,22 @@ class ClientConnection:
                 except:
                     pass
 
+    def decode(self, frame):
+        if self.decoder is not None:
+            return self.decoder.decode(frame)
+        return json.loads(frame)
+
+    def rebuild(self, messages):
+        """Apply deltas to self.state; returns the full messages for the callbacks."""
+        rebuilt = []
+        for message in messages:
+            applied, resync = self.state.apply(message)
+            rebuilt += applied
+            if resync:
+                print(f"[Client] sequence gap at {message.get('seq')}, asking for the room state")
+                self.send({"type": "resync"})
+        return rebuilt
+
     def disconnect(self):
         try:
             self.running = False  # stops recursive loops from happening
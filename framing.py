@@ -0,0 +1,156 @@
+# framing.py
+#
+# Incremental message framing shared by the server cores, the gateway and the
+# client: newline-delimited JSON (LineReader) and varint length-prefixed
+# binary frames (LengthPrefixedReader). Bytes are received straight into a
+# preallocated bytearray with recv_into(); the search for the next b"\n"
+# resumes where the previous one stopped, so a large pipelined burst is
+# scanned once instead of being re-split (and re-copied) for every message.
+# Lines are only decoded once complete, so a UTF-8 character split across two
+# recv() calls is safe.
+
+DEFAULT_BUFFER_SIZE = 4096         # per connection; grows only for bursts, so idle sockets stay cheap
+MIN_RECV_SIZE = 1024
+MAX_LINE_BYTES = 1024 * 1024    # a single message larger than this is a protocol error
+
+
+class FrameTooLarge(ValueError):
+    """A peer sent more than max_line bytes without a newline."""
+
+
+class LineReader:
+    """Buffer for newline-delimited messages.
+
+    Fill it with recv_from(sock), feed(data), or writable() + commit(n) (as
+    asyncio.BufferedProtocol does), then take complete lines, without their
+    trailing newline, as bytes: all of them with frames(), or one at a time
+    with next_frame() (e.g. for a handshake).
+    """
+    def __init__(self, size=DEFAULT_BUFFER_SIZE, max_line=MAX_LINE_BYTES):
+        self.buf = bytearray(size)
+        self.view = memoryview(self.buf)
+        self.start = 0      # first byte not yet returned as a frame
+        self.end = 0        # end of received data
+        self.scan = 0       # no newline in buf[start:scan]; searches resume here
+        self.max_line = max(max_line, size)
+
+    def __len__(self):
+        """Number of buffered bytes not yet returned as frames."""
+        return self.end - self.start
+
+    def writable(self, min_size=1):
+        """Return a memoryview of free space (at least min_size bytes) to receive into."""
+        if len(self.buf) - self.end < min_size:
+            self._make_room(min_size)
+        return self.view[self.end:]
+
+    def commit(self, nbytes):
+        """Record that nbytes were written into the view returned by writable()."""
+        self.end += nbytes
+
+    def recv_from(self, sock, min_size=MIN_RECV_SIZE):
+        """recv_into() the free space; returns the byte count (0 means the peer closed)."""
+        nbytes = sock.recv_into(self.writable(min_size))
+        self.end += nbytes
+        return nbytes
+
+    def feed(self, data):
+        """Copy bytes that were received elsewhere into the buffer."""
+        if data:
+            self.writable(len(data))[:len(data)] = data
+            self.end += len(data)
+
+    def frames(self):
+        """Return every complete line received so far, as bytes without the newline.
+
+        Only bytes that arrived since the last call are searched: one rfind()
+        for the last newline, then one C-level split() of the complete region.
+        """
+        last = self.buf.rfind(b"\n", self.scan, self.end)
+        if last < 0:
+            self.scan = self.end
+            if self.end - self.start > self.max_line:
+                raise FrameTooLarge(f"no newline in {self.end - self.start} bytes")
+            return []
+        lines = bytes(self.view[self.start:last]).split(b"\n")
+        self._consume(last + 1)
+        return lines
+
+    def next_frame(self):
+        """Return the first complete line (consuming only it), or None if there is none yet."""
+        newline = self.buf.find(b"\n", self.scan, self.end)
+        if newline < 0:
+            self.scan = self.end
+            if self.end - self.start > self.max_line:
+                raise FrameTooLarge(f"no newline in {self.end - self.start} bytes")
+            return None
+        line = bytes(self.view[self.start:newline])
+        self._consume(newline + 1)
+        return line
+
+    def _consume(self, upto):
+        if upto == self.end:
+            # everything consumed: rewind so the next recv starts at the front
+            self.start = self.scan = self.end = 0
+        else:
+            self.start = upto
+            self.scan = max(self.scan, upto)
+
+    def pending(self):
+        """Return (without consuming) the bytes after the last complete frame."""
+        return bytes(self.view[self.start:self.end])
+
+    def _make_room(self, min_size):
+        unread = self.end - self.start
+        if unread + min_size <= len(self.buf):
+            # compact: move the partial line to the front (a same-size slice
+            # assignment, which is allowed while self.view is exported)
+            self.buf[:unread] = bytes(self.view[self.start:self.end])
+        else:
+            size = len(self.buf)
+            while size < unread + min_size:
+                size *= 2
+            new_buf = bytearray(size)
+            new_buf[:unread] = self.view[self.start:self.end]
+            self.view.release()
+            self.buf = new_buf
+            self.view = memoryview(new_buf)
+        self.scan -= self.start
+        self.start = 0
+        self.end = unread
+
+
+class LengthPrefixedReader(LineReader):
+    """Buffer for frames of <varint length><payload> (the bin1 encoding in wire.py).
+
+    Same filling API as LineReader; frames() and next_frame() return payloads.
+    """
+    def frames(self):
+        frames = []
+        while True:
+            payload = self.next_frame()
+            if payload is None:
+                return frames
+            frames.append(payload)
+
+    def next_frame(self):
+        buf, pos, end = self.buf, self.start, self.end
+        length = shift = 0
+        while True:
+            if pos >= end:
+                return None          # length prefix not complete yet
+            byte = buf[pos]
+            pos += 1
+            length |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+            if shift > 35:
+                raise FrameTooLarge("length prefix too long")
+        if length > self.max_line:
+            raise FrameTooLarge(f"frame of {length} bytes")
+        if pos + length > end:
+            return None              # payload not complete yet
+        payload = bytes(self.view[pos:pos + length])
+        self._consume(pos + length)
+        return payload
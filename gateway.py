@@ -0,0 +1,331 @@
+# gateway.py
+#
+# Multi-process front door. The gateway accepts players on PORT, reads the
+# handshake line and hands the connected socket itself (its file
+# descriptor) to one of N worker processes over a Unix socket. Each worker runs
+# the normal game server (rooms, rounds, picks) for the players it is given, so
+# games are spread across cores instead of sharing one interpreter's GIL.
+# Descriptor passing uses socket.send_fds(), so the gateway needs Linux/Unix.
+# Each hand-off is one SOCK_SEQPACKET record: the descriptor plus a small
+# JSON header with the handshake line and any bytes read past it (base64).
+#
+# Run with: python3 gateway.py --workers 4 [--core asyncio]
+
+import argparse
+import base64
+import binascii
+import json
+import multiprocessing
+import os
+import selectors
+import socket
+import threading
+
+import log
+import socket_server
+from framing import LineReader, FrameTooLarge
+
+# bytes read past the handshake line that the gateway forwards; a client
+# that pipelines more than this before its welcome is turned away
+MAX_PENDING = socket_server.HANDSHAKE_BYTES
+# largest hand-off record: base64 of the handshake and pending bytes plus the JSON around them
+CONTROL_BYTES = 2 * (socket_server.HANDSHAKE_BYTES + MAX_PENDING) + 512
+
+
+# ─── worker side ────────────────────────────────────────────────────────────
+
+def receive_player(channel):
+    """Read one hand-off: (sock, addr, handshake, pending), or None if it was unusable.
+
+    Raises EOFError once the gateway has gone.
+    """
+    try:
+        msg, fds, flags, _ = socket.recv_fds(channel, CONTROL_BYTES, 1)
+    except OSError:
+        raise EOFError
+    if not msg and not fds:
+        raise EOFError
+    try:
+        if flags & (socket.MSG_TRUNC | socket.MSG_CTRUNC) or len(fds) != 1:
+            raise ValueError(f"truncated record ({len(msg)} bytes, {len(fds)} descriptors)")
+        info = json.loads(msg)
+        addr = tuple(info["addr"])
+        handshake = base64.b64decode(info["handshake"], validate=True).decode(errors="replace")
+        pending = base64.b64decode(info["pending"], validate=True)
+    except (ValueError, KeyError, TypeError, binascii.Error) as e:
+        # only this player is lost; the worker keeps serving the rest
+        log.error("handoff_invalid", "Dropped a player with an unreadable hand-off: {error}", error=e)
+        for fd in fds:
+            os.close(fd)
+        return None
+    return socket.socket(fileno=fds[0]), addr, handshake, pending
+
+
+def receive_players(channel):
+    """Yield (sock, addr, handshake, pending) for every player the gateway hands over."""
+    while True:
+        try:
+            player = receive_player(channel)
+        except EOFError:
+            return
+        if player is not None:
+            yield player
+
+
+def run_threaded_worker(channel):
+    for sock, addr, handshake, pending in receive_players(channel):
+        threading.Thread(
+            target=socket_server.handle_connection,
+            args=(sock, addr, handshake, pending),
+            daemon=True
+        ).start()
+
+
+def run_asyncio_worker(channel):
+    import asyncio
+    import async_server
+
+    async def serve():
+        loop = asyncio.get_running_loop()
+        socket_server.call_later = loop.call_later
+        done = loop.create_future()
+
+        def on_handoff():
+            try:
+                player = receive_player(channel)
+            except EOFError:
+                loop.remove_reader(channel.fileno())
+                done.set_result(None)
+                return
+            if player is None:
+                return
+            sock, addr, handshake, pending = player
+            sock.setblocking(False)
+            loop.create_task(loop.connect_accepted_socket(
+                lambda: async_server.PlayerProtocol(handshake, pending), sock))
+
+        loop.add_reader(channel.fileno(), on_handoff)
+        await done
+
+    asyncio.run(serve())
+
+
+def worker_main(index, channel, core="threads", settings=None):
+    """Entry point of one worker process: serve every player the gateway passes in."""
+    # settings overrides server constants (e.g. LOBBY_DELAY) for this worker
+    for name, value in (settings or {}).items():
+        setattr(socket_server, name, value)
+    if socket_server.METRICS_PORT:
+        socket_server.METRICS_PORT += index     # one port per worker process
+    if socket_server.LOG_FILE:
+        root, ext = os.path.splitext(socket_server.LOG_FILE)
+        socket_server.LOG_FILE = f"{root}-{index}{ext}"     # one log file per worker process
+    socket_server.start_logging(prefix=f"[WORKER {index}]")
+    socket_server.get_catalogue()
+    socket_server.start_metrics()
+    socket_server.install_profiler()
+    log.info("worker_ready", "ready (pid {pid}, {core} core)", pid=os.getpid(), core=core)
+    try:
+        if core == "asyncio":
+            run_asyncio_worker(channel)
+        else:
+            run_threaded_worker(channel)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        socket_server.shutdown_server()
+
+
+# ─── gateway side ───────────────────────────────────────────────────────────
+
+class Gateway:
+    """Accepts players, reads their handshake line and passes them to workers by room.
+
+    Room affinity: consecutive players are sent to the same worker until a
+    room's worth (MAX_CLIENTS) has been handed over, so a room's players share
+    one worker process and that worker's RoomRegistry groups them together.
+    """
+    def __init__(self, num_workers, host=None, port=None, core="threads", settings=None):
+        self.host = socket_server.HOST if host is None else host
+        self.port = socket_server.PORT if port is None else port
+        self.num_workers = num_workers
+        self.core = core
+        self.settings = settings
+        self.workers = []            # list of (process, channel), by worker index
+        self.handed_off = 0
+        self.listener = None
+        self.selector = selectors.DefaultSelector()
+        self.stopped = threading.Event()
+
+    def start_workers(self):
+        for index in range(self.num_workers):
+            self.workers.append(self.spawn(index, multiprocessing))
+
+    def spawn(self, index, context):
+        """Start worker index; returns (process, channel)."""
+        # SEQPACKET keeps each hand-off a record of its own: a worker never
+        # reads half of one or two run together
+        parent_end, child_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        process = context.Process(
+            target=worker_main,
+            args=(index, child_end, self.core, self.settings),
+            daemon=True
+        )
+        process.start()
+        child_end.close()
+        return process, parent_end
+
+    def listen(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind((self.host, self.port))
+        self.listener.listen(4096)
+        self.listener.setblocking(False)
+        self.port = self.listener.getsockname()[1]
+        self.selector.register(self.listener, selectors.EVENT_READ, None)
+
+    def pick_worker(self):
+        """Worker for the next player: one whole room's worth per worker, in turn.
+
+        A worker that has exited is replaced first, so its share of the
+        players isn't handed to a closed channel.
+        """
+        index = self.handed_off // socket_server.MAX_CLIENTS % self.num_workers
+        process, channel = self.workers[index]
+        if not process.is_alive():
+            log.error("worker_died", "Worker {index} (pid {pid}) exited with status {status}; starting a new one",
+                      index=index, pid=process.pid, status=process.exitcode)
+            channel.close()
+            # spawned, not forked: a fork now would leak the listener and
+            # every half-read player socket into the new worker
+            process, channel = self.workers[index] = self.spawn(index, multiprocessing.get_context("spawn"))
+        return channel
+
+    def accept(self):
+        try:
+            conn, addr = self.listener.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        conn.setblocking(False)
+        reader = LineReader(size=socket_server.HANDSHAKE_BYTES, max_line=socket_server.HANDSHAKE_BYTES)
+        self.selector.register(conn, selectors.EVENT_READ, (addr, reader))
+
+    def read_handshake(self, conn, addr, reader):
+        try:
+            received = reader.recv_from(conn, min_size=1)
+            handshake = reader.next_frame()
+        except (BlockingIOError, InterruptedError):
+            return
+        except (OSError, FrameTooLarge):
+            received = 0
+        if not received:
+            self.selector.unregister(conn)
+            conn.close()
+            return
+        if handshake is None:
+            return   # wait for the rest of the handshake line
+
+        self.selector.unregister(conn)
+        self.hand_off(conn, addr, handshake, reader.pending())
+
+    def hand_off(self, conn, addr, handshake, pending):
+        if len(handshake) > socket_server.HANDSHAKE_BYTES or len(pending) > MAX_PENDING:
+            log.warning("handoff_refused", "{addr} sent {size} bytes before its welcome; closing",
+                        addr=addr, size=len(handshake) + len(pending))
+            conn.close()
+            return
+        channel = self.pick_worker()
+        info = json.dumps({
+            "addr": list(addr[:2]),
+            "handshake": base64.b64encode(handshake).decode("ascii"),
+            "pending": base64.b64encode(pending).decode("ascii"),
+        }).encode()
+        conn.setblocking(True)
+        try:
+            socket.send_fds(channel, [info], [conn.fileno()])
+            self.handed_off += 1
+        except OSError as e:
+            log.error("handoff_failed", "Could not hand {addr} to a worker: {error}", addr=addr, error=e)
+        finally:
+            conn.close()   # the worker now owns its own copy of the descriptor
+
+    def serve_forever(self):
+        log.info("gateway_listening", "Listening on port {port} with {workers} worker(s)…",
+                 port=self.port, workers=self.num_workers)
+        while not self.stopped.is_set():
+            for key, _ in self.selector.select(timeout=0.5):
+                if key.data is None:
+                    self.accept()
+                else:
+                    addr, reader = key.data
+                    self.read_handshake(key.fileobj, addr, reader)
+
+    def stop(self):
+        self.stopped.set()
+        for process, channel in self.workers:
+            try:
+                channel.close()   # workers exit when their channel closes
+            except OSError:
+                pass
+        for process, _ in self.workers:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+        if self.listener:
+            self.listener.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enrolment Rush gateway: shards rooms across worker processes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes (default: one per CPU)")
+    parser.add_argument("--core", choices=("threads", "asyncio"), default="threads",
+                        help="server core each worker runs")
+    parser.add_argument("--port", type=int, default=socket_server.PORT)
+    parser.add_argument("--catalogue", default=socket_server.CATALOGUE_PATH,
+                        help="course catalogue: JSON lines or a file compiled with catalogue.py")
+    parser.add_argument("--trace", action="store_true",
+                        help="time each pick in the workers and print latency histograms on shutdown")
+    parser.add_argument("--lock-debug", action="store_true",
+                        help="record lock call sites and order in the workers; print contention reports on shutdown")
+    parser.add_argument("--log-file", default=None,
+                        help="worker i logs to this file with -i before the extension (default: stdout)")
+    parser.add_argument("--log-format", choices=("text", "json"), default="text",
+                        help="text lines (default) or one JSON record per line")
+    parser.add_argument("--profile-dir", default=socket_server.PROFILE_DIR,
+                        help="where kill -USR1 <worker pid> profiling writes its reports")
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="serve each worker's Prometheus metrics on 127.0.0.1:PORT+i (worker i; default: off)")
+    socket_server.add_delay_arguments(parser)
+    args = parser.parse_args()
+    # the gateway's own records go to stdout; --log-file is for the workers
+    log.configure(fmt=args.log_format, prefix="[GATEWAY]")
+
+    gateway = Gateway(args.workers, port=args.port, core=args.core, settings={
+        "CATALOGUE_PATH": args.catalogue,
+        "LOBBY_DELAY": args.lobby_delay,
+        "ROUND_BREAK": args.round_break,
+        "GAME_OVER_DELAY": args.game_over_delay,
+        "ROUND_TIME": args.round_time,
+        "PICK_BATCH_WINDOW": args.pick_batch_ms / 1000,
+        "HOLD_TIME": args.hold_seconds,
+        "TRACE_PICKS": args.trace,
+        "LOCK_DEBUG": args.lock_debug,
+        "METRICS_PORT": args.metrics_port,
+        "LOG_FILE": args.log_file,
+        "LOG_FORMAT": args.log_format,
+        "PROFILE_DIR": args.profile_dir,
+    })
+    gateway.start_workers()
+    gateway.listen()
+    try:
+        gateway.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        gateway.stop()
+        log.flush()
+
+
+if __name__ == "__main__":
+    main()
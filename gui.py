@@ -59,7 +59,16 @@ class GUI:
                     course_info["available_seats"] = seats
                     break
 
-            sel.update_course_display(code, seats)
+            ours = user == self.local_username and msg.get("hold") == "held" and not denied
+            sel.update_course_display(code, seats, held=ours)
+
+            # a hold (or its expiry) only moves the seat count, unless ours was refused
+            if "hold" in msg:
+                if user == self.local_username and denied:
+                    messagebox.showwarning("Course Full", f"{code} is already full. Please choose another course.")
+                    sel.selected_course.set("__NONE__")
+                    self.show_screen("gameplay_course_selection")
+                return
 
             # Only pop up to *this* client
             if user == self.local_username:
@@ -580,6 +589,9 @@ class CourseSelectionScreen(tk.Frame):
             tk.messagebox.showwarning("No Selection", "Please select a course before adding to cart.")
             self.gui_controller.root.focus_force()
         else:
+            # keep a seat for us while we confirm in the cart
+            self.gui_controller.client_connection.send({"type": "hold_course",
+                                                        "course_code": self.selected_course.get()})
             self.gui_controller.show_screen("gameplay_course_cart")
 
     def update_courses(self, course_list):
@@ -595,8 +607,8 @@ class CourseSelectionScreen(tk.Frame):
         # build UI from the server’s list of dicts
         self.create_course_boxes(self.courses_frame, course_list)
 
-    def update_course_display(self, code, seats_left):
-        """Updates a course's seat count and disables it if full."""
+    def update_course_display(self, code, seats_left, held=False):
+        """Updates a course's seat count and disables it if full (unless the seat is held for us)."""
         # check if we have stored widgets for this course
         course_widgets = self.course_vars.get(code)
         if not course_widgets:
@@ -606,10 +618,9 @@ class CourseSelectionScreen(tk.Frame):
         seat_label = course_widgets['seat_label']
         seat_label.config(text=f"Seats available: {seats_left}")
 
-        # disable the radio button if seats are zero
-        if seats_left <= 0:
-            button = course_widgets['button']
-            button.config(state='disabled')
+        # disable the radio button if seats are zero (a released hold can bring one back)
+        button = course_widgets['button']
+        button.config(state='disabled' if seats_left <= 0 and not held else 'normal')
 
     def create_course_boxes(self, parent, course_list):
         # remove any old “none” radio button
@@ -685,6 +696,7 @@ class CourseCartScreen(tk.Frame):
         self.courses_frame = None
         self.gui_controller = gui_controller
         self.course_code = None
+        self.fallback = tk.BooleanVar(value=False)
         self.config(bg=utils.colours["background"])
         self.setup()
 
@@ -706,6 +718,13 @@ class CourseCartScreen(tk.Frame):
         right_frame.pack(side='right', fill='y', padx=(40, 0))
         right_frame.pack_propagate(False)
 
+        # rank the other courses behind this one, so a lost race needs no second try
+        fallback_check = tk.Checkbutton(right_frame, text="If it is full, enrol me in\nthe best course left",
+                                        variable=self.fallback, font=('Arial', 12), justify='left',
+                                        fg=utils.colours["foreground"], bg=utils.colours["background"],
+                                        activebackground=utils.colours["background"])
+        fallback_check.pack(side='bottom', anchor='w', padx=10, pady=10)
+
         back_button = tk.Button(button_frame, text="Back", font=('Arial', 16, 'bold'), relief='flat', width=14,
                                 height=2, command=lambda: self.gui_controller.show_screen("gameplay_course_selection"))
         back_button.pack(side='left')
@@ -721,13 +740,25 @@ class CourseCartScreen(tk.Frame):
             return
 
         # tell the server what we picked – the server will decide
-        self.gui_controller.client_connection.send({"type": "select_course",
-                                                    "course_code": self.course_code,
-                                                    "username": self.gui_controller.local_username})
+        if self.fallback.get():
+            self.gui_controller.client_connection.send({"type": "select_ranked",
+                                                        "course_codes": self.preferences()})
+        else:
+            # no username: the server knows the connection's player, and the
+            # two-field message fits bin1's compact select_course frame
+            self.gui_controller.client_connection.send({"type": "select_course",
+                                                        "course_code": self.course_code})
 
         # optimistic local feedback; the server will correct us if seat is gone
         messagebox.showinfo("Submitted", "Request sent. Waiting for other players…")
 
+    def preferences(self):
+        """The cart's course, then the round's other courses with seats left, most points first."""
+        others = [c for c in self.gui_controller.current_round_courses
+                  if c["code"] != self.course_code and c["available_seats"] > 0]
+        others.sort(key=lambda c: c["points"], reverse=True)
+        return [self.course_code] + [c["code"] for c in others]
+
     def update_cart(self, course_code):
         """update the cart with the selected course"""
         self.course_code = course_code
@@ -747,7 +778,10 @@ class CourseCartScreen(tk.Frame):
                                   fg=utils.colours["course_text"], bg=utils.colours["course_container"])
             code_label.pack(anchor='w')
 
-            value_label = tk.Label(label_frame, text=f"{utils.cmpt_courses[self.course_code]['name']}", font=('Arial', 11),
+            # the name comes from the courses the server sent for this round
+            name = next((c["name"] for c in self.gui_controller.current_round_courses
+                         if c["code"] == self.course_code), "")
+            value_label = tk.Label(label_frame, text=name, font=('Arial', 11),
                                    fg=utils.colours["course_text"], bg=utils.colours["course_container"])
             value_label.pack(anchor='w', pady=(2, 0))
         else:
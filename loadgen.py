@@ -0,0 +1,303 @@
+# loadgen.py
+#
+# Headless load generator. Runs thousands of simulated players from one
+# process on a single asyncio event loop, speaking the same protocol as
+# client.ClientConnection (hello handshake, then bin1 frames or JSON lines)
+# without importing gui or Tk. Each bot joins a room, waits a configurable
+# think time after every round_start, picks a course by its strategy and
+# retries on denial until the game ends (with --ranked, sends its whole
+# preference list in one select_ranked instead). With --hold, each bot first
+# holds its choice halfway through its think time, moving on to its next
+# choice if the hold is refused.
+#
+# Reports connect latency, pick -> seat_update latency percentiles, the
+# denial rate, rounds and games finished per second, and the bytes received.
+#
+# Run with: python3 loadgen.py --players 2000 [--port 11888] [--think 200] [--strategy random]
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import socket_server
+import wire
+from framing import LineReader, LengthPrefixedReader
+
+STRATEGIES = {
+    "random": "shuffle the round's courses",
+    "points": "highest points first",
+    "contended": "everyone tries the first course first (worst-case denials)",
+}
+READ_SIZE = 64 * 1024
+
+
+def percentiles(values, points=(50, 90, 99)):
+    """{"p50": ..., "p90": ..., "p99": ..., "max": ...} of a list of numbers (empty dict if none)."""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    result = {f"p{p}": ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] for p in points}
+    result["max"] = ordered[-1]
+    return result
+
+
+class LoadReport:
+    """Counters and latency samples shared by every bot (one event loop, so no locks)."""
+    def __init__(self):
+        self.connect_times = []      # seconds from connect() to the server's first reply
+        self.pick_latencies = []     # seconds from sending a pick to its seat_update
+        self.picks = 0
+        self.denials = 0
+        self.hold_denials = 0        # hold_course refused: the course was already full
+        self.round_ends = 0          # round_over/game_over messages seen (one per bot per round)
+        self.games = 0               # game_over messages seen (one per bot per game)
+        self.rejected = 0            # username_taken / game_in_progress
+        self.bytes_in = 0            # bytes received from the server by every bot
+        self.errors = 0
+        self.first_error = None
+        self.started = time.perf_counter()
+
+    def summary(self, room_size=socket_server.MAX_CLIENTS):
+        elapsed = time.perf_counter() - self.started
+        rounds = self.round_ends / room_size
+        games = self.games / room_size
+        return {
+            "elapsed_s": elapsed,
+            "connect_ms": {k: v * 1000 for k, v in percentiles(self.connect_times).items()},
+            "pick_ms": {k: v * 1000 for k, v in percentiles(self.pick_latencies).items()},
+            "picks": self.picks,
+            "denials": self.denials,
+            "denial_rate": self.denials / self.picks if self.picks else 0.0,
+            "hold_denials": self.hold_denials,
+            "rounds": rounds,
+            "rounds_per_s": rounds / elapsed if elapsed else 0.0,
+            "games": games,
+            "games_per_s": games / elapsed if elapsed else 0.0,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "bytes_in": self.bytes_in,
+        }
+
+    def record_error(self, error):
+        self.errors += 1
+        if self.first_error is None:
+            self.first_error = repr(error)
+
+
+class Bot:
+    """One simulated player: plays games until its deadline (or one game without --loop)."""
+    def __init__(self, username, args, report):
+        self.username = username
+        self.args = args
+        self.report = report
+        self.writer = None
+        self.encoding = wire.JSON
+        self.candidates = []
+        self.sent_at = None
+        self.pick_timer = None
+        self.hold_timer = None
+
+    async def run(self, start_delay, deadline):
+        await asyncio.sleep(start_delay)
+        loop = asyncio.get_running_loop()
+        while loop.time() < deadline:
+            try:
+                finished = await self.play_game()
+            except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                self.report.record_error(e)
+                finished = False
+            if not (finished and self.args.loop):
+                return
+
+    async def play_game(self):
+        """Join, play one game; returns True if it reached game_over."""
+        started = time.perf_counter()
+        reader, self.writer = await asyncio.open_connection(self.args.host, self.args.port)
+        try:
+            if self.args.encoding == "legacy":
+                self.writer.write((self.username + "\n").encode())
+            else:
+                features = (wire.DELTAS,) if self.args.deltas else ()
+                self.writer.write(wire.hello(self.username, (self.args.encoding, wire.JSON), features))
+            frames = LineReader(size=READ_SIZE)
+            decode = json.loads
+            negotiated = self.args.encoding == "legacy"
+            first_reply = True
+
+            while True:
+                data = await reader.read(READ_SIZE)
+                if not data:
+                    return False
+                self.report.bytes_in += len(data)
+                if first_reply:
+                    self.report.connect_times.append(time.perf_counter() - started)
+                    first_reply = False
+                frames.feed(data)
+                if not negotiated:
+                    welcome = frames.next_frame()
+                    if welcome is None:
+                        continue
+                    negotiated = True
+                    self.encoding = json.loads(welcome).get("encoding", wire.JSON)
+                    if self.encoding == wire.BINARY:
+                        framed = LengthPrefixedReader(size=READ_SIZE)
+                        framed.feed(frames.pending())
+                        frames, decode = framed, wire.BinaryDecoder().decode
+                for frame in frames.frames():
+                    result = self.handle(decode(frame))
+                    if result is not None:
+                        return result
+        finally:
+            if self.pick_timer:
+                self.pick_timer.cancel()
+            if self.hold_timer:
+                self.hold_timer.cancel()
+            self.writer.close()
+
+    def handle(self, msg):
+        """React to one server message; returns True/False to end the game, else None."""
+        kind = msg.get("type")
+        report = self.report
+        if kind == "round_start":
+            self.candidates = self.choose(msg["courses"])
+            think = self.args.think / 1000 * random.uniform(0.5, 1.5)
+            loop = asyncio.get_running_loop()
+            if self.args.hold:
+                self.hold_timer = loop.call_later(think / 2, self.hold)
+            self.pick_timer = loop.call_later(think, self.pick)
+        elif kind == "seat_update" and "hold" in msg:
+            # someone else's hold, or ours going through: only a refusal changes our plan
+            if msg["username"] == self.username and msg["denied"]:
+                report.hold_denials += 1
+                if msg["course_code"] in self.candidates:
+                    self.candidates.remove(msg["course_code"])
+                self.hold()
+        elif kind == "seat_update" and msg["username"] == self.username and self.sent_at is not None:
+            report.pick_latencies.append(time.perf_counter() - self.sent_at)
+            report.picks += 1
+            self.sent_at = None
+            if msg["denied"]:
+                report.denials += 1
+                self.pick()
+        elif kind == "round_over":
+            report.round_ends += 1
+        elif kind == "game_over":
+            report.round_ends += 1
+            report.games += 1
+            return True
+        elif kind in ("username_taken", "game_in_progress"):
+            report.rejected += 1
+            return False
+        return None
+
+    def choose(self, courses):
+        codes = [c["code"] for c in courses if c["available_seats"] > 0]
+        strategy = self.args.strategy
+        if strategy == "random":
+            random.shuffle(codes)
+        elif strategy == "points":
+            points = {c["code"]: c["points"] for c in courses}
+            codes.sort(key=points.get, reverse=True)
+        return codes
+
+    def hold(self):
+        self.hold_timer = None
+        if not self.candidates or self.sent_at is not None or self.writer.is_closing():
+            return
+        self.send({"type": "hold_course", "course_code": self.candidates[0]})
+
+    def send(self, msg):
+        if self.encoding == wire.BINARY:
+            self.writer.write(wire.encode_select(msg))
+        else:
+            self.writer.write(wire.encode_json(msg))
+
+    def pick(self):
+        self.pick_timer = None
+        if not self.candidates or self.writer.is_closing():
+            return
+        if self.args.ranked:
+            msg = {"type": "select_ranked", "course_codes": self.candidates}
+            self.candidates = []
+        else:
+            msg = {"type": "select_course", "course_code": self.candidates.pop(0)}
+        if self.args.stamp:
+            msg["sent_at"] = time.time()
+        self.send(msg)
+        self.sent_at = time.perf_counter()
+
+
+async def run_swarm(args):
+    """Run every bot until they finish (or the duration runs out); returns the LoadReport."""
+    import async_server
+    async_server.raise_fd_limit()
+
+    report = LoadReport()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + args.duration
+    bots = [Bot(f"{args.prefix}{i}", args, report) for i in range(args.players)]
+    tasks = [loop.create_task(bot.run(i / args.rate, deadline)) for i, bot in enumerate(bots)]
+    done, pending = await asyncio.wait(tasks, timeout=args.duration)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    return report
+
+
+def print_summary(args, summary, first_error=None):
+    strategy = f"{args.strategy}, ranked" if args.ranked else args.strategy
+    print(f"{args.players} players ({args.encoding}, {strategy}, think {args.think:g} ms) "
+          f"over {summary['elapsed_s']:.1f}s")
+    for label, key in (("connect", "connect_ms"), ("pick -> seat_update", "pick_ms")):
+        stats = summary[key]
+        if stats:
+            print(f"  {label:<20} " + "  ".join(f"{k} {v:7.2f} ms" for k, v in stats.items()))
+    print(f"  picks {summary['picks']}, denied {summary['denials']} ({summary['denial_rate']:.1%})"
+          + (f", holds refused {summary['hold_denials']}" if args.hold else ""))
+    print(f"  rounds {summary['rounds']:.0f} ({summary['rounds_per_s']:.1f}/s), "
+          f"games {summary['games']:.0f} ({summary['games_per_s']:.2f}/s)")
+    per_pick = summary["bytes_in"] / summary["picks"] if summary["picks"] else 0
+    print(f"  received {summary['bytes_in'] / 1e6:.2f} MB ({per_pick:.0f} bytes per pick)")
+    print(f"  rejected {summary['rejected']}, errors {summary['errors']}"
+          + (f" (first: {first_error})" if first_error else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enrolment Rush headless load generator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=socket_server.PORT)
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=500,
+                        help="new connections per second while ramping up")
+    parser.add_argument("--think", type=float, default=200,
+                        help="mean milliseconds between round_start and a pick (uniform +-50%%)")
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), default="random",
+                        help="; ".join(f"{k}: {v}" for k, v in STRATEGIES.items()))
+    parser.add_argument("--encoding", choices=(wire.BINARY, wire.JSON, "legacy"), default=wire.BINARY,
+                        help="legacy sends a bare username line like pre-hello clients")
+    parser.add_argument("--duration", type=float, default=120, help="stop after this many seconds")
+    parser.add_argument("--loop", action="store_true", help="rejoin after each game until --duration")
+    parser.add_argument("--deltas", action="store_true",
+                        help="ask for delta updates (a state snapshot, then only what changed)")
+    parser.add_argument("--ranked", action="store_true",
+                        help="send the whole preference list as one select_ranked instead of retrying denials")
+    parser.add_argument("--hold", action="store_true",
+                        help="hold each course halfway through the think time before picking it")
+    parser.add_argument("--prefix", default="bot", help="username prefix")
+    parser.add_argument("--stamp", action="store_true",
+                        help="stamp each pick with its send time (a --trace server then times the network leg)")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_swarm(args))
+    summary = report.summary()
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(args, summary, report.first_error)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+# locks.py
+#
+# Timed locks for the game rooms. A TimedLock is a drop-in threading.Lock
+# that counts acquisitions and how long threads waited for it and held it.
+# The counters are only written while the lock itself is held, so they need
+# no extra synchronisation; readers (the metrics endpoint) see values at most
+# one acquisition stale. An uncontended acquire costs one clock read more
+# than a plain Lock.
+#
+# Rooms come and go, so a closed room's lock counters are folded into a
+# process-wide total per lock name with retire().
+#
+# With --lock-debug the rooms use InstrumentedLock instead, which also
+# attributes every hold to the line that took the lock and checks the order
+# locks are taken in; report() summarises both at shutdown.
+
+import os
+import sys
+import threading
+import time
+
+import log
+
+clock = time.perf_counter
+
+COUNTERS = ("acquisitions", "contended", "wait", "hold", "max_wait", "max_hold")
+
+
+class TimedLock:
+    """threading.Lock with acquisition counts and wait/hold times (in seconds)."""
+    __slots__ = ("name", "_lock", "_acquired_at", "last_wait") + COUNTERS
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._acquired_at = 0.0
+        self.last_wait = 0.0    # wait of the current (or latest) holder
+        self.acquisitions = 0
+        self.contended = 0      # acquisitions that had to wait
+        self.wait = 0.0
+        self.hold = 0.0
+        self.max_wait = 0.0
+        self.max_hold = 0.0
+
+    def acquire(self, blocking=True, timeout=-1):
+        if self._lock.acquire(False):
+            self._acquired_at = clock()
+            self.last_wait = 0.0
+        else:
+            if not blocking:
+                return False
+            start = clock()
+            if not self._lock.acquire(True, timeout):
+                return False
+            self._acquired_at = now = clock()
+            self.last_wait = waited = now - start
+            self.contended += 1
+            self.wait += waited
+            if waited > self.max_wait:
+                self.max_wait = waited
+        self.acquisitions += 1
+        return True
+
+    def release(self):
+        held = clock() - self._acquired_at
+        self.hold += held
+        if held > self.max_hold:
+            self.max_hold = held
+        self._lock.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    # the with statement is how the rooms take their locks: __enter__ and
+    # __exit__ repeat the uncontended paths of acquire() and release() to save
+    # a method call on each
+    def __enter__(self):
+        if self._lock.acquire(False):
+            self._acquired_at = clock()
+            self.last_wait = 0.0
+            self.acquisitions += 1
+        else:
+            self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        held = clock() - self._acquired_at
+        self.hold += held
+        if held > self.max_hold:
+            self.max_hold = held
+        self._lock.release()
+
+    def counters(self):
+        return {name: getattr(self, name) for name in COUNTERS}
+
+
+class InstrumentedLock(TimedLock):
+    """TimedLock that also records call sites and lock ordering (--lock-debug).
+
+    Each acquisition is attributed to the line that took the lock, so the
+    report can show which call sites wait longest and hold it longest.
+    Before blocking, the lock looks at the locks this thread already holds:
+    taking B while holding A records the order A -> B, and if B -> A was
+    ever seen, the pair is reported as an inversion (a potential deadlock)
+    whether or not two threads actually collided on it.
+    """
+    __slots__ = ("sites", "_site")
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.sites = {}     # (file, line, function) -> [holds, wait, hold, max_hold]
+        self._site = None
+
+    def __enter__(self):
+        self._acquire_at(sys._getframe(1))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    def acquire(self, blocking=True, timeout=-1):
+        return self._acquire_at(sys._getframe(1), blocking, timeout)
+
+    def _acquire_at(self, frame, blocking=True, timeout=-1):
+        site = (os.path.basename(frame.f_code.co_filename), frame.f_lineno, frame.f_code.co_name)
+        held = held_locks()
+        check_order(held, self, site)
+        if not super().acquire(blocking, timeout):
+            return False
+        self._site = site
+        held.append(self)
+        entry = self.sites.get(site)
+        if entry is None:
+            entry = self.sites[site] = [0, 0.0, 0.0, 0.0]
+        entry[0] += 1
+        entry[1] += self.last_wait
+        return True
+
+    def release(self):
+        held = held_locks()
+        for i in range(len(held) - 1, -1, -1):
+            if held[i] is self:
+                del held[i]
+                break
+        # one clock read for both the lock's and the call site's hold time
+        held_for = clock() - self._acquired_at
+        self.hold += held_for
+        if held_for > self.max_hold:
+            self.max_hold = held_for
+        entry = self.sites[self._site]
+        entry[2] += held_for
+        if held_for > entry[3]:
+            entry[3] = held_for
+        self._lock.release()
+
+
+# ─── lock order ─────────────────────────────────────────────────────────────
+
+_local = threading.local()
+_order_lock = threading.Lock()
+_order = {}         # (first name, second name) -> (site holding first, site taking second), first seen
+_inversions = {}    # frozenset of two names -> description, in the order found
+
+
+def held_locks():
+    """The InstrumentedLocks the calling thread holds, oldest first."""
+    try:
+        return _local.held
+    except AttributeError:
+        _local.held = []
+        return _local.held
+
+
+def format_site(site):
+    return f"{site[0]}:{site[1]} {site[2]}" if site else "?"
+
+
+def check_order(held, lock, site):
+    """Record the order of lock after every lock in held; report re-entry and inversions."""
+    for other in held:
+        if other is lock:
+            # a plain Lock taken twice by one thread never returns
+            log.error("lock_reentry", "Lock {lock} re-acquired at {site} while this thread holds it "
+                      "(from {held_from}): deadlock", lock=lock.name, site=format_site(site),
+                      held_from=format_site(other._site))
+            continue
+        if other.name == lock.name:
+            continue    # two rooms' locks of the same kind; no room does this
+        with _order_lock:
+            _order.setdefault((other.name, lock.name), (other._site, site))
+            reverse = _order.get((lock.name, other.name))
+            pair = frozenset((other.name, lock.name))
+            if reverse is None or pair in _inversions:
+                continue
+            _inversions[pair] = message = (
+                f"{other.name} -> {lock.name} at {format_site(site)} (holding {other.name} from "
+                f"{format_site(other._site)}), but {lock.name} -> {other.name} at {format_site(reverse[1])} "
+                f"(holding {lock.name} from {format_site(reverse[0])})")
+        log.warning("lock_inversion", "Lock order inversion: {message}", message=message)
+
+
+def inversions():
+    with _order_lock:
+        return list(_inversions.values())
+
+
+# ─── process-wide totals ────────────────────────────────────────────────────
+
+_lock = threading.Lock()
+_retired = {}       # lock name -> counters of locks that are no longer in use
+_retired_sites = {} # lock name -> {site: [holds, wait, hold, max_hold]} of retired InstrumentedLocks
+
+
+def add_counters(totals, counters):
+    """Accumulate one lock's counters into totals (maxima are kept, not summed)."""
+    for name in COUNTERS:
+        value = counters[name]
+        if name.startswith("max_"):
+            totals[name] = max(totals.get(name, 0.0), value)
+        else:
+            totals[name] = totals.get(name, 0) + value
+
+
+def add_sites(totals, sites):
+    for site, (holds, wait, hold, max_hold) in sites.items():
+        entry = totals.get(site)
+        if entry is None:
+            totals[site] = [holds, wait, hold, max_hold]
+        else:
+            entry[0] += holds
+            entry[1] += wait
+            entry[2] += hold
+            entry[3] = max(entry[3], max_hold)
+
+
+def retire(*locks):
+    """Fold the counters of locks that are going away into the per-name totals."""
+    with _lock:
+        for lock in locks:
+            add_counters(_retired.setdefault(lock.name, {}), lock.counters())
+            sites = getattr(lock, "sites", None)
+            if sites:
+                add_sites(_retired_sites.setdefault(lock.name, {}), sites)
+
+
+def totals(live_locks=()):
+    """{lock name: counters} over every retired lock plus live_locks."""
+    with _lock:
+        result = {name: dict(counters) for name, counters in _retired.items()}
+    for lock in live_locks:
+        add_counters(result.setdefault(lock.name, {}), lock.counters())
+    return result
+
+
+def site_totals(live_locks=()):
+    """{lock name: {site: [holds, wait, hold, max_hold]}} over retired and live InstrumentedLocks."""
+    with _lock:
+        result = {name: {site: list(entry) for site, entry in sites.items()}
+                  for name, sites in _retired_sites.items()}
+    for lock in live_locks:
+        sites = getattr(lock, "sites", None)
+        if sites:
+            add_sites(result.setdefault(lock.name, {}), sites)
+    return result
+
+
+def report(live_locks=(), top=5):
+    """Contention report: per-lock totals, the call sites holding each lock longest, and the lock order."""
+    live_locks = list(live_locks)
+    lines = []
+    sites = site_totals(live_locks)
+    for name, c in sorted(totals(live_locks).items()):
+        acquisitions = c["acquisitions"]
+        share = c["contended"] / acquisitions if acquisitions else 0.0
+        lines.append(f"  {name}: {acquisitions} acquisitions, {c['contended']} contended ({share:.2%}); "
+                     f"wait {c['wait']:.4f} s total, {c['max_wait'] * 1e3:.3f} ms max; "
+                     f"hold {c['hold']:.4f} s total, {c['max_hold'] * 1e3:.3f} ms max")
+        longest = sorted(sites.get(name, {}).items(), key=lambda item: item[1][3], reverse=True)[:top]
+        for site, (holds, wait, hold, max_hold) in longest:
+            lines.append(f"    {format_site(site):<45} {holds:>8} holds  hold max {max_hold * 1e3:8.3f} ms "
+                         f"mean {hold / holds * 1e3:7.3f} ms  wait {wait * 1e3:9.3f} ms total")
+    with _order_lock:
+        order = sorted(_order.items())
+    for (first, second), (holding, taking) in order:
+        lines.append(f"  order {first} -> {second} (first at {format_site(taking)}, "
+                     f"holding {first} from {format_site(holding)})")
+    found = inversions()
+    lines.append(f"  inversions: {len(found) or 'none'}")
+    lines.extend(f"    {message}" for message in found)
+    return "\n".join(lines)
@@ -0,0 +1,231 @@
+# log.py
+#
+# Structured, asynchronous logging for the game server. Game code calls
+#
+#   log.info("round_over", "Room {room}: round {round} completed", room=3, round=2)
+#
+# which only appends a tuple to a bounded in-memory queue; a background thread
+# formats the records and writes them to stdout or a size-rotated file, so a
+# slow terminal or a full pipe never holds up a room. Records are written as
+# text (the familiar "[SERVER] ..." lines) or as JSON lines with every field
+# (--log-format json).
+#
+# Noisy per-client problems pass a limit_key (usually the username): each
+# (event, key) pair gets RATE_LIMIT records per RATE_WINDOW seconds, and the
+# next record after a quiet spell says how many similar ones were suppressed.
+
+import atexit
+import collections
+import json
+import os
+import sys
+import threading
+import time
+
+import stats
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVEL_NAMES = {DEBUG: "debug", INFO: "info", WARNING: "warning", ERROR: "error"}
+
+MAX_PENDING = 10000         # records queued before new ones are dropped (counted in stats "log_dropped")
+FLUSH_INTERVAL = 0.05       # seconds the writer sleeps when the queue is empty
+RATE_LIMIT = 5              # records per (event, limit_key) per window
+RATE_WINDOW = 10.0
+MAX_BYTES = 10 * 1024 * 1024
+BACKUPS = 5
+
+# collections.deque append() and popleft() are atomic, so producers on any
+# thread (or the asyncio loop) never take a lock to log
+_queue = collections.deque()
+_start_lock = threading.Lock()
+_write_lock = threading.Lock()      # the writer thread and flush() take turns writing
+_writer = None
+_level = INFO
+_output = None                      # Console or RotatingFile; created by configure() or on first write
+_json = False
+_prefix = "[SERVER]"
+
+_limit_lock = threading.Lock()
+_limits = {}                        # (event, limit_key) -> [window start, records in window, suppressed]
+
+
+class Console:
+    """Writes to stdout."""
+    timestamps = False
+
+    def write(self, text):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+
+class RotatingFile:
+    """Appends to path; once it passes max_bytes, renames it to path.1 (path.1 to path.2, ...)."""
+    timestamps = True
+
+    def __init__(self, path, max_bytes=MAX_BYTES, backups=BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.file = open(path, "a", encoding="utf-8")
+
+    def write(self, text):
+        self.file.write(text)
+        self.file.flush()
+        if self.file.tell() >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        self.file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.file = open(self.path, "a", encoding="utf-8")
+
+
+def configure(path=None, fmt="text", level=INFO, prefix="[SERVER]", max_bytes=MAX_BYTES, backups=BACKUPS):
+    """Choose where and how records are written: stdout (path None) or a rotating file, as text or json."""
+    global _output, _json, _level, _prefix
+    with _write_lock:
+        _output = Console() if path is None else RotatingFile(path, max_bytes, backups)
+        _json = fmt == "json"
+        _level = level
+        _prefix = prefix
+
+
+# ─── producers ──────────────────────────────────────────────────────────────
+
+def emit(level, event, template, fields, limit_key=None):
+    """Queue one record. template is a str.format template over fields, or a function of fields."""
+    if level < _level:
+        return
+    suppressed = 0
+    if limit_key is not None:
+        suppressed = _check_limit(event, limit_key)
+        if suppressed is None:
+            return
+    if len(_queue) >= MAX_PENDING:
+        stats.incr("log_dropped")
+        return
+    _queue.append((time.time(), level, event, template, fields, suppressed))
+    if _writer is None:
+        _start_writer()
+
+
+def debug(event, template, limit_key=None, **fields):
+    emit(DEBUG, event, template, fields, limit_key)
+
+
+def info(event, template, limit_key=None, **fields):
+    emit(INFO, event, template, fields, limit_key)
+
+
+def warning(event, template, limit_key=None, **fields):
+    emit(WARNING, event, template, fields, limit_key)
+
+
+def error(event, template, limit_key=None, **fields):
+    emit(ERROR, event, template, fields, limit_key)
+
+
+def _check_limit(event, limit_key):
+    """None to drop the record; otherwise how many similar records were dropped before it."""
+    now = time.monotonic()
+    key = (event, limit_key)
+    with _limit_lock:
+        state = _limits.get(key)
+        if state is None or now - state[0] >= RATE_WINDOW:
+            suppressed = state[2] if state else 0
+            if len(_limits) >= MAX_PENDING:
+                # forget keys whose window has passed (mostly players long gone)
+                for stale in [k for k, s in _limits.items() if now - s[0] >= RATE_WINDOW]:
+                    del _limits[stale]
+            _limits[key] = [now, 1, 0]
+            return suppressed
+        if state[1] < RATE_LIMIT:
+            state[1] += 1
+            return 0
+        state[2] += 1
+        return None
+
+
+# ─── writer ─────────────────────────────────────────────────────────────────
+
+def _start_writer():
+    global _writer
+    with _start_lock:
+        if _writer is None:
+            # started on first use, so importing the server never spawns it
+            _writer = threading.Thread(target=_run, name="log-writer", daemon=True)
+            _writer.start()
+
+
+def _after_fork():
+    # gateway.py forks its workers: the writer thread (and any lock it held)
+    # stays behind in the parent, so the child starts afresh on first use
+    global _writer, _start_lock, _write_lock, _limit_lock
+    _writer = None
+    _start_lock = threading.Lock()
+    _write_lock = threading.Lock()
+    _limit_lock = threading.Lock()
+    _queue.clear()      # the parent writes its own records
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def _run():
+    while True:
+        if not _queue:
+            time.sleep(FLUSH_INTERVAL)
+            continue
+        flush()
+
+
+def flush():
+    """Write every queued record now (the writer thread does this continuously)."""
+    global _output
+    with _write_lock:
+        lines = []
+        while _queue:
+            try:
+                lines.append(format_record(_queue.popleft()))
+            except IndexError:
+                break
+            except Exception as e:
+                lines.append(f"{_prefix} (unformattable log record: {e!r})\n")
+        if not lines:
+            return
+        if _output is None:
+            _output = Console()
+        try:
+            _output.write("".join(lines))
+        except (OSError, ValueError):
+            pass    # stdout closed or disk full: losing log lines must not stop the writer
+
+
+def format_record(record):
+    when, level, event, template, fields, suppressed = record
+    message = template(fields) if callable(template) else template.format(**fields)
+    if _json:
+        entry = {"ts": round(when, 6), "level": LEVEL_NAMES.get(level, level), "event": event, "msg": message}
+        entry.update(fields)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        return json.dumps(entry, default=str) + "\n"
+    line = f"{_prefix} {message}"
+    if level >= WARNING:
+        line = f"{_prefix} {LEVEL_NAMES[level].upper()}: {message}"
+    if suppressed:
+        line += f" (+{suppressed} similar suppressed)"
+    if _output is not None and _output.timestamps:
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(when))
+        line = f"{stamp}.{int(when % 1 * 1000):03d} {line}"
+    return line + "\n"
+
+
+atexit.register(flush)
@@ -0,0 +1,202 @@
+# metrics.py
+#
+# Live metrics for a running game server in the Prometheus text format,
+# served over HTTP on a separate local port (socket_server.py --metrics-port):
+#
+#   curl http://127.0.0.1:9108/metrics
+#
+# A scrape reads the process counters (stats), the room registry, each room's
+# client list and the room locks' timing counters. It takes the registry lock
+# and each room's clients_lock for a moment, but never game_lock, so scraping
+# cannot delay a pick. Counters are totals since start; rates (messages per
+# second and so on) are left to the scraper, e.g. rate(enrolment_messages_in_total[1m]).
+# The one control on the port, POST /profile, toggles profiler.py.
+
+import collections
+import http.server
+import threading
+import time
+
+import locks
+import log
+import profiler
+import stats
+import tracing
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+QUANTILES = (("0.5", "p50"), ("0.9", "p90"), ("0.99", "p99"), ("0.999", "p99.9"))
+STARTED = time.time()
+
+# stats counter -> help text, exported as enrolment_<name>_total
+COUNTERS = {
+    "messages_in": "Messages received from clients.",
+    "picks": "select_course messages handled.",
+    "frames_out": "Frames queued to client connections.",
+    "frames_broadcast": "Broadcasts (one frame to every player in a room).",
+    "broadcast_bytes": "Bytes queued by broadcasts, summed over recipients.",
+    "encodes": "Messages encoded.",
+    "bytes_sent": "Bytes written to client sockets.",
+    "send_calls": "Socket writes.",
+    "dead_connections": "Connections pruned after a failed broadcast.",
+    "outbound_overflows": "Clients disconnected for falling too far behind.",
+    "round_timeouts": "Rounds ended by their deadline.",
+    "log_dropped": "Log records dropped because the log queue was full.",
+    "encode_errors": "Broadcasts a client's wire encoding could not carry (the client is kept).",
+    "resyncs": "State snapshots resent to delta clients that saw a sequence gap.",
+    "ranked_picks": "select_ranked messages (a preference list instead of one course).",
+    "ranked_fallbacks": "select_ranked picks granted a course after their first choice.",
+    "holds": "hold_course messages (a seat reserved while the player confirms).",
+    "holds_denied": "Holds refused because the course was full.",
+    "holds_expired": "Holds whose seat went back after --hold-seconds without a pick.",
+    "pick_batches": "Batches of picks resolved together (--pick-batch-ms).",
+    "batched_picks": "Picks resolved in batches (--pick-batch-ms).",
+}
+
+LOCK_METRICS = (
+    ("acquisitions", "counter", "acquisitions_total", "Lock acquisitions."),
+    ("contended", "counter", "contended_total", "Acquisitions that had to wait."),
+    ("wait", "counter", "wait_seconds_total", "Time spent waiting to acquire the lock."),
+    ("hold", "counter", "hold_seconds_total", "Time the lock was held."),
+    ("max_wait", "gauge", "wait_seconds_max", "Longest single wait."),
+    ("max_hold", "gauge", "hold_seconds_max", "Longest single hold."),
+)
+
+
+def format_value(value):
+    # ints exactly; floats with full precision (repr gives the shortest exact form)
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+class Exposition:
+    """Builds one scrape's text, a metric family at a time."""
+    def __init__(self):
+        self.lines = []
+
+    def family(self, name, kind, help_text, samples):
+        """samples: list of (labels dict, value), or a single value."""
+        if not isinstance(samples, list):
+            samples = [({}, samples)]
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            self.lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+
+    def summary(self, name, help_text, summaries, label=None):
+        """Histogram summaries (microseconds) as a Prometheus summary in seconds.
+
+        summaries is one Histogram.summary(), or {label value: summary} with label.
+        """
+        if label is None:
+            summaries = {None: summaries}
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} summary")
+        for key, s in summaries.items():
+            labels = {} if label is None else {label: key}
+            for quantile, field in QUANTILES:
+                self.lines.append(f"{name}{format_labels({**labels, 'quantile': quantile})} "
+                                  f"{format_value(s[field] / 1e6)}")
+            self.lines.append(f"{name}_sum{format_labels(labels)} {format_value(s['mean'] * s['count'] / 1e6)}")
+            self.lines.append(f"{name}_count{format_labels(labels)} {s['count']}")
+
+    def text(self):
+        return "\n".join(self.lines) + "\n"
+
+
+def render(registry):
+    """The current metrics of the server whose rooms are in registry, as exposition text."""
+    out = Exposition()
+    counters = stats.snapshot()
+    for key, help_text in COUNTERS.items():
+        out.family(f"enrolment_{key}_total", "counter", help_text, counters.get(key, 0))
+
+    rooms = registry.snapshot()
+    phases = collections.Counter(room.phase for room in rooms)
+    out.family("enrolment_rooms", "gauge", "Rooms hosted, by phase.",
+               [({"phase": phase}, count) for phase, count in sorted(phases.items())])
+
+    clients = 0
+    depths = []
+    for room in rooms:
+        with room.clients_lock:
+            conns = room.clients.conns()
+        clients += len(conns)
+        for conn in conns:
+            pending = getattr(conn, "pending_bytes", None)
+            if pending is not None:
+                depths.append(pending())
+    out.family("enrolment_connected_clients", "gauge", "Players connected to a room.", clients)
+    out.family("enrolment_outbound_queued_bytes", "gauge",
+               "Bytes queued for clients and not yet written.", sum(depths))
+    out.family("enrolment_outbound_queued_bytes_max", "gauge",
+               "Largest outbound backlog of a single client.", max(depths, default=0))
+    out.family("enrolment_outbound_backlogged_clients", "gauge",
+               "Clients with bytes still queued.", sum(1 for depth in depths if depth))
+
+    lock_totals = registry.lock_totals()
+    for key, kind, suffix, help_text in LOCK_METRICS:
+        out.family(f"enrolment_lock_{suffix}", kind, help_text,
+                   [({"lock": name}, totals[key]) for name, totals in sorted(lock_totals.items())])
+    out.family("enrolment_lock_order_inversions", "gauge",
+               "Lock pairs seen taken in both orders (--lock-debug only).", len(locks.inversions()))
+
+    timings = stats.timings()
+    if "round_seconds" in timings:
+        out.summary("enrolment_round_seconds", "Time from round_start to round_over.",
+                    timings["round_seconds"])
+    if "pick_batch_wait" in timings:
+        out.summary("enrolment_pick_batch_wait_seconds",
+                    "Time from a batch's first pick to resolving the batch (--pick-batch-ms).",
+                    timings["pick_batch_wait"])
+    stages = tracing.snapshot()
+    if stages:
+        out.summary("enrolment_pick_stage_seconds", "Traced pick latency by stage (--trace).",
+                    stages, label="stage")
+
+    out.family("process_start_time_seconds", "gauge", "Start time of the process since the epoch.", STARTED)
+    return out.text()
+
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    registry = None     # set on the subclass serve() creates
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = render(self.registry).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        # the one control on this port: start/stop profiling (same as SIGUSR1)
+        if self.path.split("?", 1)[0] != "/profile":
+            self.send_error(404)
+            return
+        body = (profiler.toggle() + "\n").encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass    # scrapes every few seconds would flood the server console
+
+
+def serve(port, registry, host="127.0.0.1"):
+    """Serve registry's metrics on host:port from a daemon thread; returns the server (call shutdown())."""
+    handler = type("RegistryMetricsHandler", (MetricsHandler,), {"registry": registry})
+    server = http.server.ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    log.info("metrics_listening", "Metrics on http://{host}:{port}/metrics", host=host, port=port)
+    return server
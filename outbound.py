@@ -0,0 +1,134 @@
+# outbound.py
+#
+# Per-connection outbound queues for the threaded server core. broadcast() only
+# appends pre-encoded frames here; a dedicated writer thread per connection does
+# the blocking sendall(), so one slow socket can never stall the game lock.
+
+import collections
+import socket
+import threading
+
+import log
+import stats
+import wire
+
+# Overflow policy: a client with more than this many bytes queued and not yet
+# handed to the kernel is too far behind to catch up, so it is disconnected
+# (its reader sees the socket shut down and removes it from the lobby).
+MAX_QUEUED_BYTES = 256 * 1024
+
+
+class OutboundQueue:
+    """Bounded send queue with its own writer thread, wrapping one client socket.
+
+    Exposes the same sendall()/shutdown()/close() calls the game logic already
+    uses on sockets, so it can be registered in a room's clients directly.
+    """
+    def __init__(self, sock, max_bytes=MAX_QUEUED_BYTES):
+        self.sock = sock
+        # the writer already coalesces queued frames into one send, so waiting
+        # for Nagle (and the peer's delayed ACK) only adds latency
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError:
+            pass   # not a TCP socket
+        self.max_bytes = max_bytes
+        self.encoding = wire.JSON   # set by the handshake
+        self.deltas = False         # the client asked for delta updates (set by the handshake)
+        self.frames = collections.deque()
+        self.queued_bytes = 0
+        self.on_sent = []       # callbacks for queued frames, run once they are written
+        self.closing = False    # close() called: flush what is queued, then close
+        self.dead = False       # aborted: drop everything, stop writing
+        self.cond = threading.Condition()
+        self.writer = threading.Thread(target=self._drain, daemon=True)
+        self.writer.start()
+
+    def sendall(self, data, sent=None):
+        """Queue a frame for sending. Never blocks and never raises.
+
+        sent, if given, is called on the writer thread once the frame has
+        been written to the socket (never, if the frame is dropped).
+        """
+        with self.cond:
+            if self.dead or self.closing:
+                return
+            overflow = self.queued_bytes + len(data) > self.max_bytes
+            if not overflow:
+                self.frames.append(data)
+                self.queued_bytes += len(data)
+                if sent is not None:
+                    self.on_sent.append(sent)
+                self.cond.notify()
+
+        if overflow:
+            stats.incr("outbound_overflows")
+            log.warning("outbound_overflow", "Outbound queue overflow ({pending} bytes pending), disconnecting client.",
+                        pending=self.queued_bytes)
+            self.abort()
+
+    def pending_bytes(self):
+        with self.cond:
+            return self.queued_bytes
+
+    def abort(self):
+        """Drop queued frames and shut the socket down so its reader notices."""
+        with self.cond:
+            self.dead = True
+            self.frames.clear()
+            self.queued_bytes = 0
+            self.on_sent = []
+            self.cond.notify()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def shutdown(self, how=socket.SHUT_RDWR):
+        self.abort()
+
+    def close(self):
+        """Flush queued frames (unless aborted), then close the socket."""
+        with self.cond:
+            self.closing = True
+            dead = self.dead
+            self.cond.notify()
+        if dead:
+            self._close_socket()
+
+    def _drain(self):
+        while True:
+            with self.cond:
+                while not self.frames and not self.closing and not self.dead:
+                    self.cond.wait()
+                if self.dead:
+                    # close() closes the socket once the reader is done with it
+                    if self.closing:
+                        self._close_socket()
+                    return
+                if not self.frames:
+                    break             # closing and fully flushed
+                # coalesce everything queued so far into one syscall
+                batch = self.frames[0] if len(self.frames) == 1 else b"".join(self.frames)
+                self.frames.clear()
+                self.queued_bytes = 0
+                on_sent, self.on_sent = self.on_sent, []
+
+            stats.update(send_calls=1, bytes_sent=len(batch))
+            try:
+                self.sock.sendall(batch)
+            except OSError:
+                self.abort()
+                if self.closing:
+                    self._close_socket()
+                return
+            for sent in on_sent:
+                sent()
+
+        self._close_socket()
+
+    def _close_socket(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
@@ -0,0 +1,153 @@
+# profiler.py
+#
+# On-demand profiling of a running server: send the process SIGUSR1 to start
+# sampling, and SIGUSR1 again to stop and write the results to PROFILE_DIR
+# (socket_server.py --profile-dir). With --metrics-port the same toggle is
+# also available as "curl -X POST http://127.0.0.1:<port>/profile".
+#
+#   profile-<pid>-<time>.folded   wall-clock stack samples of every thread, one
+#                                 "root;...;leaf count" line per stack, ready for
+#                                 flamegraph.pl or speedscope
+#   alloc-<pid>-<time>.txt        the lines whose allocations grew the most while
+#                                 sampling (a tracemalloc snapshot diff)
+#
+# Until the first signal nothing runs: no sampler thread, no tracemalloc.
+# While sampling, the sampler wakes every INTERVAL seconds and tracemalloc
+# slows allocations down, so leave it on for seconds or minutes, not hours.
+
+import collections
+import os
+import re
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+
+import log
+
+INTERVAL = 0.01         # seconds between stack samples
+TOP_ALLOCATIONS = 30    # lines in the allocation diff
+
+_lock = threading.Lock()
+_session = None
+_directory = "profiles"
+
+
+class StackSampler:
+    """Samples the stack of every other thread every interval seconds into folded-stack counts."""
+    def __init__(self, interval=INTERVAL):
+        self.interval = interval
+        self.stacks = collections.Counter()     # "thread;outer;...;inner" -> samples
+        self.samples = 0
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        self.thread.join()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self.stopping.wait(self.interval):
+            # one connection thread per player: number-less names fold them together
+            names = {t.ident: re.sub(r"-\d+", "", t.name) for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, "thread"))
+                stack.reverse()
+                self.stacks[";".join(stack)] += 1
+            self.samples += 1
+
+    def write_folded(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfileSession:
+    """One start..stop profiling window: stack samples plus a tracemalloc before/after diff."""
+    def __init__(self, directory):
+        self.directory = directory
+        self.started = time.time()
+        self.sampler = StackSampler()
+        self.own_tracemalloc = not tracemalloc.is_tracing()
+        if self.own_tracemalloc:
+            tracemalloc.start()
+        self.before = take_snapshot()
+        self.sampler.start()
+
+    def stop(self):
+        """Stop sampling and write both reports; returns their paths."""
+        self.sampler.stop()
+        after = take_snapshot()
+        if self.own_tracemalloc:
+            tracemalloc.stop()
+
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started))
+        folded = os.path.join(self.directory, f"profile-{os.getpid()}-{stamp}.folded")
+        allocations = os.path.join(self.directory, f"alloc-{os.getpid()}-{stamp}.txt")
+        self.sampler.write_folded(folded)
+        with open(allocations, "w", encoding="utf-8") as f:
+            diff = after.compare_to(self.before, "lineno")
+            growth = sum(stat.size_diff for stat in diff)
+            f.write(f"tracemalloc diff over {time.time() - self.started:.1f}s: "
+                    f"{growth / 1024:+.1f} KiB in traced blocks\n\n")
+            for stat in diff[:TOP_ALLOCATIONS]:
+                f.write(f"{stat}\n")
+        return folded, allocations
+
+
+def take_snapshot():
+    # leave out tracemalloc's and the sampler's own bookkeeping
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+
+
+def toggle():
+    """Start profiling, or stop it and write the reports; returns what happened, in words."""
+    global _session
+    # held while the reports are written too, so a quick second toggle cannot
+    # start tracemalloc just before this stop turns it off
+    with _lock:
+        if _session is None:
+            _session = ProfileSession(_directory)
+            message = f"Profiling started (toggle again to stop and write to {_directory})"
+            log.info("profile_started", "{message}", message=message, directory=_directory)
+            return message
+        session, _session = _session, None
+        folded, allocations = session.stop()
+    message = (f"Profiling stopped: {session.sampler.samples} samples in {folded}, "
+               f"allocation diff in {allocations}")
+    log.info("profile_written", "{message}", message=message, folded=folded, allocations=allocations,
+             samples=session.sampler.samples)
+    return message
+
+
+def _on_signal(signum, frame):
+    # the handler runs on the main thread between bytecodes (in the asyncio core,
+    # inside the event loop), so hand the work to a thread and return at once
+    threading.Thread(target=toggle, name="profile-toggle", daemon=True).start()
+
+
+def install(directory="profiles"):
+    """Toggle profiling on SIGUSR1. Must be called from the main thread; a no-op without SIGUSR1."""
+    global _directory
+    _directory = directory
+    if not hasattr(signal, "SIGUSR1"):
+        return False
+    signal.signal(signal.SIGUSR1, _on_signal)
+    return True
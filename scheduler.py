@@ -0,0 +1,92 @@
+# scheduler.py
+#
+# One timer thread for every delayed transition in the threaded server core
+# (lobby -> round 1, round break -> next round, game over -> close). Calls sit
+# in a heap ordered by deadline; the thread sleeps until the earliest one is
+# due, so a thousand rooms waiting between rounds cost one thread instead of a
+# thousand threading.Timer threads. The asyncio core uses the event loop's own
+# call_later instead, which has the same signature.
+
+import heapq
+import itertools
+import threading
+import time
+
+import log
+
+
+class ScheduledCall:
+    """Handle for one scheduled callback (the equivalent of an asyncio TimerHandle)."""
+    __slots__ = ("when", "callback", "args", "cancelled")
+
+    def __init__(self, when, callback, args):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Scheduler:
+    """Runs callbacks after a delay, in deadline order, on a single daemon thread.
+
+    Callbacks run one at a time on the scheduler thread, so they must not
+    block; the game's callbacks only queue frames and take the room locks.
+    """
+    def __init__(self, name="scheduler"):
+        self.name = name
+        self.heap = []                  # (when, seq, ScheduledCall)
+        self.seq = itertools.count()    # tie-breaker: equal deadlines run in scheduling order
+        self.cond = threading.Condition()
+        self.thread = None
+        self.stopped = False
+
+    def call_later(self, delay, callback, *args):
+        """Run callback(*args) after delay seconds; returns a cancellable handle."""
+        call = ScheduledCall(time.monotonic() + max(delay, 0), callback, args)
+        with self.cond:
+            if self.thread is None:
+                # started on first use, so importing the server never spawns it
+                self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self.thread.start()
+            heapq.heappush(self.heap, (call.when, next(self.seq), call))
+            if self.heap[0][2] is call:
+                self.cond.notify()      # new earliest deadline: wake the thread to re-arm
+        return call
+
+    def pending(self):
+        """Number of calls waiting to run (including cancelled ones not yet reached)."""
+        with self.cond:
+            return len(self.heap)
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.heap.clear()
+            self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.stopped:
+                    if self.heap:
+                        wait = self.heap[0][0] - time.monotonic()
+                        if wait <= 0:
+                            break
+                        self.cond.wait(wait)
+                    else:
+                        self.cond.wait()
+                if self.stopped:
+                    return
+                _, _, call = heapq.heappop(self.heap)
+
+            if call.cancelled:
+                continue
+            try:
+                call.callback(*call.args)
+            except Exception as e:
+                # one failing transition must not stop every other room's timers
+                log.error("scheduled_call_failed", "Scheduled {callback} failed: {error!r}",
+                          callback=getattr(call.callback, "__qualname__", call.callback), error=e)
@@ -0,0 +1,149 @@
+# scoreboard.py
+#
+# A room's scores, kept ranked as they change. Players are grouped in
+# buckets by their points; each bucket remembers the order its players
+# reached that score, so the leader is the first player to reach the top
+# score (an equal score later does not take the lead from them).
+#
+#   award()            O(log P)  (P: highest score so far), plus a list insert
+#                                the first time anyone reaches a new score
+#   leader(), get()    O(1)
+#   leaders()          O(players tied for the lead)
+#   rank()             O(log P)  players with more points, from a Fenwick tree over scores
+#   top(k)             O(k + score levels visited)
+#
+# Points are whole numbers >= 0, as in the catalogue. The scoreboard does no
+# locking; GameRoom uses it under game_lock.
+
+import bisect
+
+
+class Scoreboard:
+    """username -> points, with the leader, ties, ranks and top-k available without a scan."""
+    __slots__ = ("points", "buckets", "levels", "tree")
+
+    def __init__(self):
+        self.points = {}        # username -> points, in the order players were added
+        self.buckets = {}       # points -> {username: None}, in the order they reached it
+        self.levels = []        # distinct scores held by someone, ascending
+        self.tree = [0] * 65    # Fenwick tree: players per score (index score + 1); grows by doubling
+
+    def __len__(self):
+        return len(self.points)
+
+    def __contains__(self, username):
+        return username in self.points
+
+    def get(self, username, default=None):
+        return self.points.get(username, default)
+
+    def add(self, username, points=0):
+        """Start tracking username (no-op if already tracked)."""
+        if username not in self.points:
+            self.points[username] = points
+            self._enter(username, points)
+
+    def award(self, username, points):
+        """Add points to username's score (adding the player if needed); returns the new score."""
+        old = self.points.get(username)
+        if old is None:
+            self.add(username, points)
+            return points
+        if points == 0:
+            return old
+        new = self.points[username] = old + points
+        self._leave(username, old)
+        self._enter(username, new)
+        return new
+
+    # ─── queries ────────────────────────────────────────────────────────────
+    def top_score(self):
+        return self.levels[-1] if self.levels else None
+
+    def leader(self):
+        """The first player to reach the top score, or None if nobody is tracked."""
+        if not self.levels:
+            return None
+        return next(iter(self.buckets[self.levels[-1]]))
+
+    def leaders(self):
+        """Every player tied at the top score, in the order they reached it."""
+        if not self.levels:
+            return []
+        return list(self.buckets[self.levels[-1]])
+
+    def sole_leader(self, username):
+        """True if username is ahead of every other player."""
+        if not self.levels:
+            return False
+        bucket = self.buckets[self.levels[-1]]
+        return len(bucket) == 1 and username in bucket
+
+    def rank(self, username):
+        """1 + the number of players with more points than username (tied players share a rank)."""
+        points = self.points[username]
+        return 1 + len(self.points) - self._count_upto(points)
+
+    def top(self, k):
+        """The k highest scores as [(username, points)], best first; ties in the order reached."""
+        result = []
+        for i in range(len(self.levels) - 1, -1, -1):
+            points = self.levels[i]
+            for username in self.buckets[points]:
+                if len(result) >= k:
+                    return result
+                result.append((username, points))
+        return result
+
+    def as_dict(self):
+        """A copy of every score, in the order players were added (what the wire messages carry)."""
+        return dict(self.points)
+
+    # ─── internals ──────────────────────────────────────────────────────────
+    def _enter(self, username, points):
+        bucket = self.buckets.get(points)
+        if bucket is None:
+            bucket = self.buckets[points] = {}
+            bisect.insort(self.levels, points)
+        bucket[username] = None
+        self._count(points, 1)
+
+    def _leave(self, username, points):
+        bucket = self.buckets[points]
+        del bucket[username]
+        if not bucket:
+            del self.buckets[points]
+            del self.levels[bisect.bisect_left(self.levels, points)]
+        self._count(points, -1)
+
+    def _count(self, points, delta):
+        tree = self.tree
+        if points + 1 >= len(tree):
+            # rebuilt from the buckets, which already include this change
+            self._grow(points + 1)
+            return
+        i = points + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def _count_upto(self, points):
+        """Players with at most points."""
+        tree = self.tree
+        i = min(points + 1, len(tree) - 1)
+        total = 0
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def _grow(self, index):
+        size = len(self.tree) - 1
+        while size < index:
+            size *= 2
+        self.tree = [0] * (size + 1)
+        for points, bucket in self.buckets.items():
+            i = points + 1
+            while i <= size:
+                self.tree[i] += len(bucket)
+                i += i & -i
@@ -0,0 +1,100 @@
+# sessions.py
+#
+# The players connected to one room. A ConnectionRegistry indexes the same
+# Session objects by connection and by username, so joining (with its
+# username check), leaving and pruning a dead connection are dict operations
+# instead of scans of the whole player list.
+#
+# Broadcasts iterate snapshot(): an immutable tuple of the sessions, built
+# once after each join or leave and then shared by every broadcast until
+# the membership changes again. A broadcast that grabbed a snapshot keeps
+# a consistent view even if a player leaves while it is sending.
+#
+# The registry does no locking of its own: GameRoom calls it under its
+# clients_lock.
+
+import time
+
+import wire
+
+
+class Session:
+    """One connected player."""
+    __slots__ = ("conn", "username", "addr", "joined", "encoding", "deltas")
+
+    def __init__(self, conn, username, addr=None):
+        self.conn = conn            # OutboundQueue or AsyncConnection (anything with sendall/close)
+        self.username = username
+        self.addr = addr
+        self.joined = time.monotonic()
+        # the handshake settles both before the player joins, so broadcasts read them here
+        self.encoding = getattr(conn, "encoding", wire.JSON)
+        self.deltas = getattr(conn, "deltas", False)
+
+    def __repr__(self):
+        return f"Session({self.username!r}, {self.addr!r})"
+
+
+class ConnectionRegistry:
+    """Sessions keyed by connection and by username, in join order."""
+    __slots__ = ("_by_conn", "_by_name", "_snapshot")
+
+    def __init__(self):
+        self._by_conn = {}      # conn -> Session (dicts keep insertion order: join order)
+        self._by_name = {}      # username -> Session
+        self._snapshot = ()     # tuple of the sessions; None until rebuilt after a change
+
+    def __len__(self):
+        return len(self._by_conn)
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+    def add(self, conn, username, addr=None):
+        """Register a new session; returns it, or None if username is already connected."""
+        if username in self._by_name:
+            return None
+        session = Session(conn, username, addr)
+        self._by_conn[conn] = session
+        self._by_name[username] = session
+        self._snapshot = None
+        return session
+
+    def remove(self, conn):
+        """Forget conn's session and return it (None if conn is not registered)."""
+        session = self._by_conn.pop(conn, None)
+        if session is not None:
+            del self._by_name[session.username]
+            self._snapshot = None
+        return session
+
+    def clear(self):
+        """Forget every session; returns them."""
+        sessions = self.snapshot()
+        self._by_conn.clear()
+        self._by_name.clear()
+        self._snapshot = ()
+        return sessions
+
+    def get(self, conn):
+        return self._by_conn.get(conn)
+
+    def find(self, username):
+        """The session of a connected username, or None."""
+        return self._by_name.get(username)
+
+    def has_username(self, username):
+        return username in self._by_name
+
+    def snapshot(self):
+        """Every session as a tuple, reused until the next add or remove."""
+        sessions = self._snapshot
+        if sessions is None:
+            sessions = self._snapshot = tuple(self._by_conn.values())
+        return sessions
+
+    def usernames(self):
+        return list(self._by_name)
+
+    def conns(self):
+        return [session.conn for session in self.snapshot()]
@@ -2,35 +2,49 @@
 
 import socket
 import threading
+import time
 import json
 import shutil
 import os
-import random
 import atexit
-import utils   # course list & points
-import time
+import collections
+import itertools
+import locks
+import log
+import stats
+import tracing
+import wire
+from catalogue import GameCourses, load as load_catalogue
+from scheduler import Scheduler
+from outbound import OutboundQueue
+from sessions import ConnectionRegistry
+from scoreboard import Scoreboard
+from framing import LineReader, LengthPrefixedReader
+import argparse
 
 HOST, PORT         = '0.0.0.0', 11888
-MAX_CLIENTS        = 4
+MAX_CLIENTS        = 4                # players per room
 COURSES_PER_ROUND  = 5
 POINTS_TO_WIN      = 15
+MAX_PREFERENCES    = 8                # course codes a select_ranked may list; the rest are ignored
 MAX_ROUNDS         = 6
-
-game_courses = {}                   # local copy of cmpt_courses from utils, that can be modified
-
-clients       = []                   # list of (conn, username)
-clients_lock  = threading.Lock()
-
-# ─── mutable game state (protected by game_lock) ────────────────────────────
-game_lock      = threading.Lock()
-round_no       = 0
-round_courses  = []                   # list of 5 dicts for current round
-seat_map       = {}                   # course_code -> seats left
-scores         = {}                   # username -> accumulated points
-player_picks   = set()                # usernames who have picked this round
-winner         = None                 # first person to hit threshold
-leading_player = None                 # if round cap is reached, winner is leading_player
-# ───────────────────────────────────────────────────────────────────────────
+MAX_ROOMS          = 1000             # concurrent games hosted by one server process
+HANDSHAKE_BYTES    = 1024             # longest username line we wait for
+
+# room transitions; shorter breaks mean more games per hour (see --round-break)
+LOBBY_DELAY        = 1.5              # seconds between a full lobby and round 1
+ROUND_BREAK        = 5                # seconds between round_over and the next round_start
+GAME_OVER_DELAY    = 1.0              # seconds to let clients render game_over before disconnecting
+ROUND_TIME         = 30               # seconds a round stays open; players who have not picked by then get no pick
+PICK_BATCH_WINDOW  = 0                # seconds to collect picks and resolve them together (--pick-batch-ms; 0 = off)
+HOLD_TIME          = 10               # seconds a hold_course keeps a seat for its player (--hold-seconds; 0 = no holds)
+TRACE_PICKS        = False            # time every pick through the server (--trace; see tracing.py)
+LOCK_DEBUG         = False            # instrument room locks: call sites, lock order, report on shutdown (--lock-debug)
+LOG_FILE           = None             # write the server log here (rotated) instead of stdout (--log-file)
+LOG_FORMAT         = "text"           # "text" lines or "json" records (--log-format)
+PROFILE_DIR        = "profiles"       # where SIGUSR1 profiling writes its reports (--profile-dir; see profiler.py)
+METRICS_PORT       = 0                # serve Prometheus metrics on this local port (--metrics-port; 0 = off)
+CATALOGUE_PATH     = os.path.join(os.path.dirname(os.path.abspath(__file__)), "courses.jsonl")
 
 
 def cleanup_pycache():
@@ -47,58 +61,783 @@ def cleanup_pycache():
 atexit.register(cleanup_pycache)
 
 
-def broadcast(message):
-    """Send a JSON message to all clients without holding the lock during send."""
-    global clients
+# Schedules a delayed game transition: call_later(delay, callback, *args).
+# The threaded core runs every room's timers on one Scheduler thread; the
+# asyncio core swaps in loop.call_later so every callback stays on the loop.
+scheduler = Scheduler()
+call_later = scheduler.call_later
 
-    data = (json.dumps(message) + '\n').encode()
-    with clients_lock:
-        targets = [conn for conn, _ in clients]
+# Room phases. Every transition goes through GameRoom.transition(), and a
+# scheduled step only runs if the room is still in the phase it was
+# scheduled from, so a stale timer can never start a round twice.
+LOBBY     = "lobby"       # waiting for players
+STARTING  = "starting"    # lobby full, round 1 scheduled
+PLAYING   = "playing"     # a round is open for picks
+BREAK     = "break"       # between rounds, next round scheduled
+GAME_OVER = "game_over"   # game_over sent, close scheduled
+CLOSED    = "closed"
+
+
+def send_direct(conn, message):
+    """Send one message to a single connection in whatever encoding it negotiated."""
+    stats.incr("frames_out")
+    if getattr(conn, "encoding", wire.JSON) == wire.BINARY:
+        conn.sendall(wire.encode_json_frame(message))
+    else:
+        conn.sendall(wire.encode_json(message))
+
+
+def close_connection(conn):
+    """Shut down and close one client connection, ignoring errors."""
+    try:
+        conn.shutdown(socket.SHUT_RDWR)
+    except Exception:
+        pass
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def format_round_over(fields):
+    """The round's score table, for the server log."""
+    lines = [f"Room {fields['room']}: round {fields['round']} completed. Current scores:"]
+    lines += [f"- {username}: {pts} points" for username, pts in fields["scores"].items()]
+    if fields["no_pick"]:
+        lines.append(f"  (no pick: {', '.join(fields['no_pick'])})")
+    return "\n".join(lines)
+
+
+class GameRoom:
+    """One game of up to MAX_CLIENTS players.
+
+    Each room owns its players, its copy of the course list and its round
+    state, guarded by its own clients_lock and game_lock, so rooms never
+    contend with each other.
+    """
+    def __init__(self, room_id, registry=None):
+        self.room_id = room_id
+        self.registry = registry
+        self.closed = False
+        self.phase = LOBBY                # see the phase constants; changed under game_lock
+
+        # lock order: game_lock before clients_lock (--lock-debug reports any inversion)
+        lock_type = locks.InstrumentedLock if LOCK_DEBUG else locks.TimedLock
+
+        self.clients = ConnectionRegistry()   # Sessions by conn and username; conn is an OutboundQueue or AsyncConnection
+        self.clients_lock = lock_type("clients_lock")
+
+        # ─── mutable game state (protected by game_lock) ────────────────────
+        self.game_lock = lock_type("game_lock")
+        self.courses = None               # GameCourses: this game's seats over the shared catalogue
+        self.round_no = 0
+        self.round_started = 0.0          # time.monotonic() when the current round opened
+        self.round_courses = []           # list of 5 dicts for current round
+        self.round_slots = {}             # course_code -> catalogue slot, for this round's courses
+        self.scores = Scoreboard()        # username -> accumulated points, kept ranked
+        self.player_picks = set()         # usernames who have picked this round
+        self.deadline_call = None         # scheduled round_timeout() for the current round
+        self.seq = 0                      # sequence number of the last message sent to deltas clients
+        self.lobby_users = []             # the roster as last broadcast (what deltas clients hold)
+        self.winner = None                # first person to hit threshold
+        self.leading_player = None        # if round cap is reached, winner is leading_player
+        self.holds = {}                   # username -> (slot, course_code, expires): a seat held for them this round
+        self.hold_expiry = collections.deque()   # (expires, username, hold), oldest first
+        self.hold_call = None             # scheduled expire_holds() for the oldest hold
+        # ───────────────────────────────────────────────────────────────────
+
+        # picks waiting for the batching window to close (PICK_BATCH_WINDOW > 0)
+        self.batch_lock = threading.Lock()
+        self.pending_picks = []           # (arrival, username, course_code, fallbacks, trace) until resolve_picks (batch_lock)
+
+        # ids the binary wire encoding uses instead of names and codes
+        self.player_ids = {}              # username -> id, never reused (clients_lock)
+        self.next_player_id = itertools.count()
+        self.course_index = {}            # course_code -> position in round_courses (game_lock)
+
+    def encode(self, messages, encoding, sequenced=False):
+        """Encode messages as one frame in the given wire encoding (sequenced: for a deltas client)."""
+        stats.incr("encodes", len(messages))
+        if encoding == wire.BINARY:
+            return b"".join(wire.encode_binary(m, self.course_index, self.player_ids, sequenced)
+                            for m in messages)
+        return b"".join(wire.encode_json(m) for m in messages)
+
+    def broadcast(self, *messages, trace=None, deltas=None):
+        """Send messages to every client as a single frame.
+
+        Each wire encoding in use is encoded once and the bytes are shared by
+        all clients using it.
+        Clients that negotiated deltas get the deltas messages instead (by
+        default the same messages), each stamped with the room's next
+        sequence number; deltas=() sends them nothing.
+        A PickTrace passed as trace is completed once every copy is sent.
+        Queues never block, so this is safe to call while holding game_lock,
+        and callers must hold it: it keeps the sequence numbers in send order.
+        """
+        frames = {}         # full frames by encoding
+        sequenced = None    # deltas frames by encoding, built when the first deltas client comes up
+        with self.clients_lock:
+            targets = self.clients.snapshot()   # shared until the next join or leave; no copy
+        if trace is not None:
+            trace.expect(len(targets))
+
+        queued = 0
+        dead_connections = []  # used to remove dead connections from clients list
+        unencodable = None     # (deltas, encoding) pairs that failed to encode: skip their other clients
+        for session in targets:
+            sock = session.conn
+            encoding = session.encoding
+            wants_deltas = session.deltas
+            if unencodable is not None and (wants_deltas, encoding) in unencodable:
+                continue
+            try:
+                if wants_deltas:
+                    if sequenced is None:
+                        sequenced = {}
+                        stamped = self.stamp(messages if deltas is None else deltas)
+                    if not stamped:
+                        continue
+                    data = sequenced.get(encoding)
+                    if data is None:
+                        data = sequenced[encoding] = self.encode(stamped, encoding, sequenced=True)
+                else:
+                    data = frames.get(encoding)
+                    if data is None:
+                        data = frames[encoding] = self.encode(messages, encoding)
+            except Exception as e:
+                # the messages are at fault, not the connection: keep the client
+                unencodable = unencodable or set()
+                unencodable.add((wants_deltas, encoding))
+                stats.incr("encode_errors")
+                log.error("encode_error", "Room {room}: could not encode {messages!r} as {encoding}: {error!r}",
+                          limit_key=self.room_id, room=self.room_id, messages=messages, encoding=encoding, error=e)
+                continue
+            try:
+                if trace is None:
+                    sock.sendall(data)
+                else:
+                    sock.sendall(data, trace.sent)
+                queued += len(data)
+            except (ConnectionResetError, ConnectionAbortedError, BrokenPipeError, OSError) as e:
+                log.warning("broadcast_failed", "Room {room}: connection lost during broadcast: {error}",
+                            limit_key=self.room_id, room=self.room_id, error=e)
+                dead_connections.append(sock)
+            except Exception as e:
+                log.error("broadcast_error", "Room {room}: unexpected error during broadcast: {error!r}",
+                          limit_key=self.room_id, room=self.room_id, error=e)
+                dead_connections.append(sock)
+        if trace is not None:
+            trace.done_queueing()
+        stats.update(frames_broadcast=1, frames_out=len(targets), broadcast_bytes=queued)
+
+        if dead_connections:
+            stats.incr("dead_connections", len(dead_connections))
+            with self.clients_lock:
+                for conn in dead_connections:
+                    self.clients.remove(conn)
+            # we may be inside game_lock here, so check for an empty room later
+            call_later(0, self.close_if_empty)
+
+    # ─── versioned state (deltas clients) ───────────────────────────────────
+    def stamp(self, messages):
+        """Copies of messages carrying the next sequence numbers. Call with game_lock held."""
+        stamped = []
+        for message in messages:
+            self.seq += 1
+            stamped.append({**message, "seq": self.seq})
+        return stamped
+
+    def state(self):
+        """The room as of sequence number self.seq: the snapshot a deltas client starts from.
+
+        Call with game_lock held.
+        """
+        courses = []
+        if self.courses is not None:
+            courses = [{**course, "available_seats": self.courses.seats_left(self.round_slots[course["code"]])}
+                       for course in self.round_courses]
+        return {
+            "type": "state",
+            "seq": self.seq,
+            "users": list(self.lobby_users),
+            "ids": dict(self.player_ids),
+            "round": self.round_no,
+            "courses": courses,
+            "time_left": max(0.0, ROUND_TIME - (time.monotonic() - self.round_started)) if self.phase == PLAYING else 0,
+            "picks": list(self.player_picks),
+            "scores": self.scores.as_dict(),
+        }
+
+    def send_state(self, conn):
+        """Send conn a fresh snapshot (a deltas client asking to resync after a gap)."""
+        stats.incr("resyncs")
+        with self.game_lock:
+            conn.sendall(self.encode([self.state()], conn.encoding))
+
+    # ─── membership ─────────────────────────────────────────────────────────
+    def is_open(self):
+        """True while the room is still a lobby with free spots."""
+        with self.game_lock, self.clients_lock:
+            return not self.closed and self.round_no == 0 and len(self.clients) < MAX_CLIENTS
+
+    def add_player(self, conn, addr, username):
+        """Add a player to the lobby.
+
+        Returns "joined", "username_taken" or "full" (game started or lobby full).
+        """
+        with self.game_lock, self.clients_lock:
+            if self.clients.has_username(username):
+                return "username_taken"
+            if self.closed or len(self.clients) >= MAX_CLIENTS or self.round_no > 0:
+                return "full"
+            # initialize score for new player
+            self.scores.add(username)
+            self.clients.add(conn, username, addr)
+            if username not in self.player_ids:
+                self.player_ids[username] = next(self.next_player_id)
+            if getattr(conn, "deltas", False):
+                # queued before any broadcast that could reach conn: the game_lock orders them
+                conn.sendall(self.encode([self.state()], conn.encoding))
+
+        log.info("player_joined", "{username} connected from {addr} (room {room})",
+                 username=username, addr=addr, room=self.room_id)
+        self.update_lobby()
+        return "joined"
+
+    def remove_player(self, conn):
+        """Remove a disconnected player; close the room if its game emptied out."""
+        with self.clients_lock:
+            self.clients.remove(conn)
+        self.update_lobby()
+        self.close_if_empty()   # if everyone is gone mid-game, close the room
+
+    def close_if_empty(self):
+        """If the game has started and all clients are gone, close the room."""
+        with self.clients_lock:
+            no_clients = (len(self.clients) == 0)
+        with self.game_lock:
+            started = (self.round_no > 0)
+
+        if no_clients and started and not self.closed:
+            log.info("room_abandoned", "Room {room}: all players disconnected. Closing room.", room=self.room_id)
+            self.close()
+
+    def close(self):
+        """Disconnect every player and remove the room from its registry."""
+        with self.game_lock, self.clients_lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.phase = CLOSED
+            targets = self.clients.clear()
+
+        for session in targets:
+            close_connection(session.conn)
+        if self.registry:
+            self.registry.remove(self)
+
+    def update_lobby(self):
+        """Notify all clients of current lobby membership and start game if full."""
+        with self.game_lock:
+            with self.clients_lock:
+                users = self.clients.usernames()
+            lobby = {
+                "type": "lobby",
+                "player_count": len(users),
+                "users": users
+            }
+            # deltas clients hear only who joined and left since the last roster
+            delta = ()
+            if users != self.lobby_users:
+                previous = set(self.lobby_users)
+                current = set(users)
+                joined = [u for u in users if u not in previous]
+                left = [u for u in self.lobby_users if u not in current]
+                self.lobby_users = users
+                delta = ({"type": "lobby", "joined": joined, "left": left},)
+            self.broadcast(lobby, deltas=delta)
+
+            # when lobby is now full, start the game after a delay (let clients render lobby)
+            if len(users) == MAX_CLIENTS and self.round_no == 0 and self.phase == LOBBY:
+                self.transition(STARTING, LOBBY_DELAY, self.start_round)
+
+    def transition(self, phase, delay, step):
+        """Enter phase now and run step after delay if the room is still in it.
+
+        Must be called with game_lock held.
+        """
+        self.phase = phase
+        call_later(delay, self.run_step, phase, step)
+
+    def run_step(self, phase, step):
+        with self.game_lock:
+            if self.phase != phase:
+                return   # the room moved on (or closed) since this was scheduled
+        step()
+
+    # ─── rounds ─────────────────────────────────────────────────────────────
+    def choose_round_courses(self):
+        """Randomly pick COURSES_PER_ROUND courses that still have seats."""
+        slots = self.courses.sample(COURSES_PER_ROUND)
+        self.round_courses = [self.courses.course(slot) for slot in slots]
+        self.round_slots = {c["code"]: slot for c, slot in zip(self.round_courses, slots)}
+        self.course_index = {c["code"]: i for i, c in enumerate(self.round_courses)}
+
+    def start_round(self):
+        """Increment round number, choose courses, broadcast round_start."""
+        with self.game_lock:
+            if self.phase not in (STARTING, BREAK):
+                return
+            self.phase = PLAYING
+            # initialize the game's seat counts on round 1 (the catalogue itself is shared)
+            if self.round_no == 0:
+                self.courses = GameCourses(get_catalogue())
+
+            self.round_no += 1
+            self.round_started = time.monotonic()
+            self.choose_round_courses()
+            # the server ends the round at the deadline, picked or not
+            self.deadline_call = call_later(ROUND_TIME, self.round_timeout, self.round_no)
+            round_start = {
+                "type":      "round_start",
+                "round":     self.round_no,
+                "courses":   self.round_courses,
+                "time_left": ROUND_TIME
+            }
+            self.broadcast(round_start)
+
+    def finish_round(self):
+        """Broadcast round_over (or game_over), clear picks, then schedule the next step."""
+        with self.game_lock:
+            # only the first caller ends a round
+            if self.phase != PLAYING:
+                return
+            finished_round = self.round_no
+            stats.observe("round_seconds", time.monotonic() - self.round_started)
+            if self.deadline_call is not None:
+                self.deadline_call.cancel()
+                self.deadline_call = None
+            self.clear_holds()
+            # take a snapshot of players and scores before clearing them
+            final_round_players = list(self.player_picks)
+            final_scores = self.scores.as_dict()
+            with self.clients_lock:
+                no_pick = [u for u in self.clients.usernames() if u not in self.player_picks]
+
+            # a winner, or the round cap is reached (then the leading player wins)
+            if self.winner or finished_round >= MAX_ROUNDS:
+                winner = self.winner or self.leading_player
+                self.broadcast({
+                    "type":         "game_over",
+                    "winner":       winner,
+                    "final_scores": final_scores
+                }, deltas=({"type": "game_over", "winner": winner},))
+                # give clients a moment to render Game Over, then close the room
+                self.transition(GAME_OVER, GAME_OVER_DELAY, self.close)
+                return
+
+            # tell everyone the round is over
+            self.broadcast({
+                "type":   "round_over",
+                "round":  finished_round,
+                "scores": final_scores,
+                "users":  final_round_players,
+                "no_pick": no_pick
+            }, deltas=({"type": "round_over", "round": finished_round, "no_pick": no_pick},))
+
+            # clear per-round picks, then a brief break to let clients update their UI
+            self.player_picks.clear()
+            self.transition(BREAK, ROUND_BREAK, self.start_round)
+
+        # log player scores (formatted by the log writer, off this thread)
+        log.info("round_over", format_round_over, room=self.room_id, round=finished_round,
+                 scores=final_scores, no_pick=no_pick)
+
+    def round_timeout(self, round_no):
+        """Round deadline: end the round even though some players have not picked."""
+        with self.game_lock:
+            if self.phase != PLAYING or self.round_no != round_no:
+                return   # the round already ended
+        log.info("round_deadline", "Room {room}: round {round} deadline reached.", room=self.room_id, round=round_no)
+        stats.incr("round_timeouts")
+        self.finish_round()
+
+    def take_pick(self, username, course_code, fallbacks=()):
+        """Grant or deny one pick and apply it to the seats, scores and leader.
+
+        fallbacks are the rest of a select_ranked's preference list: the player
+        gets the first of course_code and fallbacks with a seat left, and is
+        denied (on course_code, their first choice) only if none has one.
+        Returns the seat_update and the player's new score (None if denied).
+        Call with game_lock held, in a round that is PLAYING.
+        """
+        # only this round's courses can be picked
+        first_choice = course_code
+        slot = self.round_slots.get(course_code)
+        if (slot is None or self.courses.seats_left(slot) <= 0) and fallbacks:
+            for course_code in fallbacks:
+                slot = self.round_slots.get(course_code)
+                if slot is not None and self.courses.seats_left(slot) > 0:
+                    stats.incr("ranked_fallbacks")
+                    break
+        if slot is None or self.courses.seats_left(slot) <= 0:
+            return {
+                "type":        "seat_update",
+                "course_code": first_choice,
+                "seats_left":  0,
+                "username":    username,
+                "denied":      True
+            }, None
+
+        # successfully allocate seat (updates the game's open-course index in place)
+        seats_left = self.courses.take_seat(slot)
+
+        # award points
+        scores = self.scores
+        score = scores.award(username, self.courses.catalogue.points[slot])
+        self.player_picks.add(username)
+
+        # if someone reached the win threshold, they are the winner (highest score wins ties)
+        if score >= POINTS_TO_WIN and ((self.winner is None) or score > scores.get(self.winner)):
+            self.winner = username
+        elif scores.sole_leader(username):
+            self.leading_player = username
+
+        return {
+            "type": "seat_update",
+            "course_code": course_code,
+            "seats_left": seats_left,
+            "username": username,
+            "denied": False
+        }, score
+
+    def round_wait(self):
+        """The waiting-lobby update after a granted pick (game_lock held)."""
+        return {
+            "type":         "round_wait",
+            "round":        self.round_no,
+            "player_count": len(self.player_picks),
+            "current_players": len(self.clients),
+            "users":        list(self.player_picks),
+            "scores":       self.scores.as_dict()
+        }
+
+    def round_wait_delta(self, username, score):
+        # deltas clients already hold the other scores and picks
+        return {
+            "type":   "round_wait",
+            "round":  self.round_no,
+            "picked": username,
+            "points": score
+        }
+
+    def everyone_done(self):
+        return len(self.player_picks) == min(len(self.clients), MAX_CLIENTS)
+
+    def handle_selection(self, username, course_code, trace=None, fallbacks=()):
+        """Process a client's course pick (with fallbacks, a select_ranked: see take_pick).
+
+        Everything one pick produces goes out as a single frame: the
+        seat_update and the round_wait lines are encoded once and sent together.
+        trace is the pick's PickTrace when --trace is on.
+        """
+        stats.incr("picks")
+        everyone_done = False
+        with self.game_lock:
+            if trace is not None:
+                trace.mark("lock")
+            if self.phase != PLAYING:
+                return   # between rounds: nothing to pick from
+            released = self.drop_hold(username, course_code) if self.holds else None
+            seat_update, score = self.take_pick(username, course_code, fallbacks)
+            if trace is not None:
+                trace.mark("decide")
+            updates = (seat_update,) if released is None else (released, seat_update)
+
+            # notify everyone of this pick attempt
+            if score is None:
+                # broadcast denial immediately
+                self.broadcast(*updates, trace=trace)
+                return
+
+            # the updated seat count and the waiting-lobby update, in one send per client
+            everyone_done = self.everyone_done()
+            self.broadcast(*updates, self.round_wait(), trace=trace,
+                           deltas=(*updates, self.round_wait_delta(username, score)))
+
+        # finish the round and start next if all have picked
+        if everyone_done:
+            self.finish_round()
+
+    # ─── batched picks (--pick-batch-ms) ────────────────────────────────────
+    def queue_pick(self, username, course_code, trace=None, fallbacks=()):
+        """Hold a pick until the batching window closes, then resolve the batch in one go."""
+        if not isinstance(course_code, str) or not all(isinstance(code, str) for code in fallbacks):
+            # checked here: resolve_picks applies the whole batch under one lock
+            log.warning("invalid_message", "Invalid course code in a pick from {username}: {course_code!r}",
+                        limit_key=username, username=username, course_code=course_code)
+            return
+        arrival = time.monotonic()
+        with self.batch_lock:
+            self.pending_picks.append((arrival, username, course_code, fallbacks, trace))
+            first = len(self.pending_picks) == 1
+        if first:
+            call_later(PICK_BATCH_WINDOW, self.resolve_picks)
+
+    def resolve_picks(self):
+        """Resolve every queued pick under one game_lock, earliest arrival first, in one frame.
+
+        Clients get a seat_update per pick and a single round_wait after them
+        (deltas clients: one round_wait delta per granted pick).
+        """
+        with self.batch_lock:
+            batch, self.pending_picks = self.pending_picks, []
+        if not batch:
+            return
+        batch.sort(key=lambda pick: pick[0])   # stable: ties keep queue order
+        traces = [pick[4] for pick in batch if pick[4] is not None]
+        group = tracing.TraceGroup(traces) if traces else None
+        stats.update(picks=len(batch), pick_batches=1, batched_picks=len(batch))
+
+        everyone_done = False
+        with self.game_lock:
+            stats.observe("pick_batch_wait", time.monotonic() - batch[0][0])
+            if group is not None:
+                group.mark("lock")
+            if self.phase != PLAYING:
+                return   # between rounds: nothing to pick from
+            updates = []
+            deltas = []
+            for _, username, course_code, fallbacks, _ in batch:
+                released = self.drop_hold(username, course_code) if self.holds else None
+                if released is not None:
+                    updates.append(released)
+                    deltas.append(released)
+                try:
+                    seat_update, score = self.take_pick(username, course_code, fallbacks)
+                except Exception as e:
+                    # one bad pick must not cost the rest of the batch its replies
+                    log.error("pick_failed", "Room {room}: pick of {course_code!r} by {username} failed: {error!r}",
+                              limit_key=self.room_id, room=self.room_id, course_code=course_code,
+                              username=username, error=e)
+                    continue
+                updates.append(seat_update)
+                deltas.append(seat_update)
+                if score is not None:
+                    deltas.append(self.round_wait_delta(username, score))
+            if group is not None:
+                group.mark("decide")
+
+            if len(deltas) > len(updates):   # at least one seat was granted
+                everyone_done = self.everyone_done()
+                updates.append(self.round_wait())
+            self.broadcast(*updates, trace=group, deltas=tuple(deltas))
+
+        if everyone_done:
+            self.finish_round()
+
+    # ─── seat holds (hold_course) ───────────────────────────────────────────
+    # Every hold lasts HOLD_TIME, so holds expire in the order they were made:
+    # hold_expiry is a FIFO and one scheduled call (for the oldest hold) serves
+    # the whole room. Holds confirmed or replaced before they expire stay in
+    # the FIFO and are skipped when their time comes.
+    def hold_seat(self, username, course_code):
+        """Take a seat in course_code for username until they pick it or HOLD_TIME passes.
+
+        Everyone sees the seat go in a seat_update marked "hold": "held" (with
+        "denied" if the course is full). A player has at most one hold; a new
+        one gives the old seat back.
+        """
+        stats.incr("holds")
+        with self.game_lock:
+            if self.phase != PLAYING or username in self.player_picks:
+                return   # nothing left to hold a seat for this round
+            previous = self.holds.get(username)
+            if previous is not None and previous[1] == course_code:
+                return   # already held
+            updates = []
+            if previous is not None:
+                updates.append(self.drop_hold(username))
+
+            slot = self.round_slots.get(course_code)
+            if slot is None or self.courses.seats_left(slot) <= 0:
+                stats.incr("holds_denied")
+                updates.append({
+                    "type":        "seat_update",
+                    "course_code": course_code,
+                    "seats_left":  0,
+                    "username":    username,
+                    "denied":      True,
+                    "hold":        "held"
+                })
+                self.broadcast(*updates)
+                return
+
+            expires = time.monotonic() + HOLD_TIME
+            hold = self.holds[username] = (slot, course_code, expires)
+            self.hold_expiry.append((expires, username, hold))
+            if self.hold_call is None:
+                self.hold_call = call_later(HOLD_TIME, self.expire_holds)
+            updates.append({
+                "type":        "seat_update",
+                "course_code": course_code,
+                "seats_left":  self.courses.take_seat(slot),
+                "username":    username,
+                "denied":      False,
+                "hold":        "held"
+            })
+            self.broadcast(*updates)
+
+    def drop_hold(self, username, course_code=None):
+        """Give username's held seat back, if they have one. Call with game_lock held.
+
+        Returns the seat_update telling everyone, or None if there is no hold
+        or it is on course_code (the pick about to take that seat again says it).
+        """
+        hold = self.holds.pop(username, None)
+        if hold is None:
+            return None
+        slot, held_code, _ = hold
+        seats_left = self.courses.release_seat(slot)
+        if held_code == course_code:
+            return None
+        return {
+            "type":        "seat_update",
+            "course_code": held_code,
+            "seats_left":  seats_left,
+            "username":    username,
+            "denied":      False,
+            "hold":        "released"
+        }
+
+    def expire_holds(self):
+        """Give back the seats of holds that ran out, then wait for the next one to."""
+        with self.game_lock:
+            self.hold_call = None
+            now = time.monotonic()
+            expiry = self.hold_expiry
+            updates = []
+            while expiry and expiry[0][0] <= now:
+                _, username, hold = expiry.popleft()
+                if self.holds.get(username) is hold:
+                    stats.incr("holds_expired")
+                    updates.append(self.drop_hold(username))
+            if expiry:
+                self.hold_call = call_later(expiry[0][0] - now, self.expire_holds)
+            if updates:
+                self.broadcast(*updates)
+
+    def clear_holds(self):
+        """Give back every held seat without telling anyone (the round is ending). Call with game_lock held."""
+        for slot, _, _ in self.holds.values():
+            self.courses.release_seat(slot)
+        self.holds.clear()
+        self.hold_expiry.clear()
+        if self.hold_call is not None:
+            self.hold_call.cancel()
+            self.hold_call = None
+
+
+class RoomRegistry:
+    """All rooms hosted by this process, plus the one currently filling up.
+
+    New players are placed in the open lobby; once it fills (or its game
+    starts) the next player opens a fresh room. The registry lock is only
+    held while placing players, never during a game.
+    """
+    def __init__(self, max_rooms=MAX_ROOMS):
+        self.max_rooms = max_rooms
+        self.lock = threading.Lock()
+        self.rooms = {}                   # room_id -> GameRoom
+        self.open_room = None
+        self.ids = itertools.count(1)
+
+    def join(self, conn, addr, username):
+        """Place a player in a room. Returns (room, "joined") or (None, reason)."""
+        with self.lock:
+            while True:
+                room = self.open_room
+                if room is None or not room.is_open():
+                    if len(self.rooms) >= self.max_rooms:
+                        return None, "full"
+                    room = GameRoom(next(self.ids), registry=self)
+                    self.rooms[room.room_id] = room
+                    self.open_room = room
+
+                result = room.add_player(conn, addr, username)
+                if result != "full":
+                    return (room if result == "joined" else None), result
+                # lost a race with the lobby filling up; open another room
+                self.open_room = None
+
+    def remove(self, room):
+        with self.lock:
+            if self.rooms.pop(room.room_id, None) is not None:
+                # keep its lock timings in the process totals (under self.lock, so
+                # lock_totals() never counts a room twice or not at all)
+                locks.retire(room.game_lock, room.clients_lock)
+            if self.open_room is room:
+                self.open_room = None
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.rooms.values())
+
+    def lock_totals(self):
+        """Timing counters of every room's game_lock and clients_lock, past and present."""
+        with self.lock:
+            return locks.totals(lock for room in self.rooms.values()
+                                for lock in (room.game_lock, room.clients_lock))
+
+    def close_all(self):
+        for room in self.snapshot():
+            room.close()
+
+
+rooms = RoomRegistry()
+
+
+# ─── Course catalogue ───────────────────────────────────────────────────────
+# Loaded from CATALOGUE_PATH when first needed and shared by every room.
+# A compiled .cat file is memory-mapped, so even a huge catalogue loads at once.
+course_catalogue = None
+catalogue_lock = threading.Lock()
+
+
+def get_catalogue():
+    """Return the shared course catalogue, loading it on first use."""
+    global course_catalogue
+    with catalogue_lock:
+        if course_catalogue is None:
+            course_catalogue = load_catalogue(CATALOGUE_PATH)
+            log.info("catalogue_loaded", "Loaded {courses} courses from {path}",
+                     courses=len(course_catalogue), path=CATALOGUE_PATH)
+        return course_catalogue
 
-    dead_connections = []  # used to remove dead connections from clients list
-    for sock in targets:
-        try:
-            sock.sendall(data)
-        except (ConnectionResetError, ConnectionAbortedError, BrokenPipeError, OSError) as e:
-            print(f"[SERVER] Connection lost during broadcast: {e}")
-            dead_connections.append(sock)
-        except Exception as e:
-            print(f"[SERVER] Unexpected error during broadcast: {e}")
-            dead_connections.append(sock)
-
-    if dead_connections:
-        with clients_lock:
-            clients = [(conn, username) for conn, username in clients if conn not in dead_connections]
-        # If we pruned everyone and the game had started, shut down.
-        maybe_shutdown_if_empty()
 
 # ─── Clean shutdown support ─────────────────────────────────────────────────
 server_socket = None
 shutdown_event = threading.Event()
 
 def shutdown_server():
-    """Gracefully stop accepting and disconnect all clients."""
+    """Gracefully stop accepting and disconnect all clients in every room."""
     global server_socket
     if shutdown_event.is_set():
         return
     shutdown_event.set()
 
-    print("[SERVER] Shutting down…")
+    log.info("shutdown", "Shutting down…")
+    log.info("broadcast_cost", "Broadcast cost: {summary}", summary=stats.summary())
+    if TRACE_PICKS:
+        log.info("pick_latency", "Pick latency: {report}", report=tracing.report())
 
-    # close all client sockets
-    with clients_lock:
-        targets = [conn for conn, _ in clients]
-    for sock in targets:
-        try:
-            sock.shutdown(socket.SHUT_RDWR)
-        except Exception:
-            pass
-        try:
-            sock.close()
-        except Exception:
-            pass
-    with clients_lock:
-        clients.clear()
+    # close all rooms (and their client sockets), then drop their pending timers
+    rooms.close_all()
+    scheduler.stop()
+    stop_metrics()
+    if LOCK_DEBUG:
+        log.info("lock_report", "Lock contention:\n{report}", report=locks.report())
 
     # close the listening socket (break accept loop)
     if server_socket:
@@ -107,287 +846,255 @@ def shutdown_server():
         except Exception:
             pass
         server_socket = None
+    log.flush()
+# ────────────────────────────────────────────────────────────────────────────
 
 
-def maybe_shutdown_if_empty():
-    """If the game has started and all clients are gone, shut the server down."""
-    with clients_lock:
-        no_clients = (len(clients) == 0)
-    with game_lock:
-        started = (round_no > 0)
+def admit_player(conn, addr, username):
+    """Run the handshake checks for a new (sanitized) username and place it in a room.
 
-    if no_clients and started and not shutdown_event.is_set():
-        print("[SERVER] All players disconnected. Shutting down server.")
-        shutdown_server()
-# ────────────────────────────────────────────────────────────────────────────
+    Returns the player's GameRoom; otherwise None, and the connection has already
+    been told why and closed. Shared by the threaded and asyncio server cores.
+    """
+    try:
+        room, result = rooms.join(conn, addr, username)
+        if room:
+            return room
 
+        # Step 2: username already taken in the room being filled
+        if result == "username_taken":
+            send_direct(conn, { "type": "username_taken" })
+            conn.close()
+            return None
 
-def update_lobby():
-    """Notify all clients of current lobby membership and start game if full."""
-    is_full = False
-    with clients_lock:
-        users = [u for _, u in clients]
-        count = len(users)
-        if count == MAX_CLIENTS and round_no == 0:
-            is_full = True
-    broadcast({
-        "type": "lobby",
-        "player_count": count,
-        "users": users
-    })
-
-    # when lobby is now full, start the game after a delay (let clients render lobby)
-    if is_full:
-        threading.Timer(1.5, start_round).start()  # 1.5 seconds
-
-
-def choose_round_courses():
-    """Randomly pick COURSES_PER_ROUND courses and reset seat_map."""
-    global round_courses, seat_map, game_courses
-
-    # pool of courses only with nonzero seats
-    pool = [(code, info) for code, info in game_courses.items() if info["available_seats"] > 0]
-
-    picks = random.sample(pool, COURSES_PER_ROUND)
-    round_courses = [
-        {
-            "code": code,
-            "name": info["name"],
-            "points": info["points"],
-            "available_seats": info["available_seats"]
-        }
-        for code, info in picks
-    ]
-    seat_map = {c["code"]: c["available_seats"] for c in round_courses}
-
-
-def start_round():
-    """Increment round number, choose courses, broadcast round_start."""
-    global round_no, game_courses
-    with game_lock:
-        # initialize the game's course list on round 1
-        if round_no == 0:
-            # deep copy to avoid modifying utils.cmpt_courses
-            game_courses = {code: info.copy() for code, info in utils.cmpt_courses.items()}
-
-        round_no += 1
-        choose_round_courses()
-        payload = {
-            "type":    "round_start",
-            "round":   round_no,
-            "courses": round_courses
-        }
-    broadcast(payload)
-
-
-def finish_round():
-    """Broadcast round_over (with round number), clear picks, then start next round."""
-    global round_no, winner, leading_player
-    # snapshot which round is ending
-    with game_lock:
-        finished_round = round_no
-        # take a snapshot of players and scores before clearing them
-        final_round_players = list(player_picks)
-        final_scores = scores.copy()
-
-    # if there is a winner
-    if winner:
-        broadcast({
-            "type":         "game_over",
-            "winner":       winner,
-            "final_scores": scores.copy()
-        })
-        # give clients a moment to render Game Over, then disconnect server
-        threading.Timer(1.0, shutdown_server).start()
-        return
+        # Step 3: every room slot is in use
+        try:
+            send_direct(conn, {
+                "type": "game_in_progress",
+                "reason": "The server is hosting as many games as it can. Try again later."
+            })
+        except Exception:
+            pass
+        conn.close()
+        return None
 
-    # if round cap reached, leading player wins
-    elif finished_round >= MAX_ROUNDS:
-        broadcast({
-            "type":         "game_over",
-            "winner":       leading_player,
-            "final_scores": scores.copy()
-        })
-        threading.Timer(1.0, shutdown_server).start()
+    except Exception:
+        conn.close()
+        return None
+
+
+def start_session(conn, handshake):
+    """Apply the client's handshake line to conn and return the sanitized username.
+
+    A hello message negotiates the wire encoding (answered with a welcome);
+    a bare username line keeps the original JSON-lines protocol.
+    """
+    username, encoding, negotiated, features = wire.parse_handshake(handshake)
+    conn.encoding = encoding
+    conn.deltas = wire.DELTAS in features
+    if negotiated:
+        conn.sendall(wire.welcome(encoding, features))
+    return ''.join(username.split())
+
+
+def reader_for(conn, reader):
+    """Return the reader to use after the handshake, carrying over any bytes already received."""
+    if conn.encoding != wire.BINARY:
+        return reader
+    framed = LengthPrefixedReader()
+    framed.feed(reader.pending())
+    return framed
+
+
+def requested_courses(msg):
+    """The course codes a select_course or select_ranked asks for, best first."""
+    if msg["type"] == "select_course":
+        course_code = msg.get("course_code")
+        return [course_code] if course_code and isinstance(course_code, str) else []
+    course_codes = msg.get("course_codes")
+    if not isinstance(course_codes, list):
+        return []
+    stats.incr("ranked_picks")
+    # a code listed twice would only be tried twice
+    return list(dict.fromkeys(code for code in course_codes if code and isinstance(code, str)))[:MAX_PREFERENCES]
+
+
+def handle_message(room, username, frame, encoding=wire.JSON, received=None):
+    """Decode one client message (a JSON line or a bin1 payload) and dispatch it to the player's room.
+
+    received is the tracing.clock() time the frame's bytes were read, when
+    picks are being traced.
+    """
+    if not frame:
         return
 
-    # tell everyone the round is over
-    broadcast({
-        "type":   "round_over",
-        "round":  finished_round,
-        "scores": final_scores,
-        "users":  final_round_players
-    })
-
-    # print player scores on the server console
-    print(f"\n[SERVER] Round {finished_round} completed. Current scores:")
-    for username, pts in scores.items():
-        print(f"- {username}: {pts} points")
-
-    # clear per-round picks
-    with game_lock:
-        player_picks.clear()
-
-    # brief delay to let clients process UI updates
-    time.sleep(5)
-    start_round()
-
-
-def handle_selection(username, course_code):
-    """Process a client's course pick."""
-    global winner, leading_player
-    with game_lock:
-        seats = seat_map.get(course_code, 0)
-        denied = seats <= 0
-
-        # notify everyone of this pick attempt
-        if denied:
-            # broadcast denial immediately
-            broadcast({
-                "type":        "seat_update",
-                "course_code": course_code,
-                "seats_left":  0,
-                "username":    username,
-                "denied":      True
-            })
+    stats.incr("messages_in")
+    try:
+        msg = wire.decode_client(frame) if encoding == wire.BINARY else json.loads(frame)
+        if not isinstance(msg, dict) or not msg.get("type"):
+            log.warning("invalid_message", "Invalid message from {username}: {frame!r}",
+                        limit_key=username, username=username, frame=bytes(frame))
             return
 
-        # successfully allocate seat:
-        # decrease count in temporary seat_map and persistent game_courses
-        seat_map[course_code] -= 1
-        game_courses[course_code]["available_seats"] -= 1
+        if msg.get("type") in ("select_course", "select_ranked"):
+            course_codes = requested_courses(msg)
+            if course_codes:
+                trace = None
+                if received is not None:
+                    trace = tracing.PickTrace(room.room_id, received, msg.get("sent_at"))
+                course_code, fallbacks = course_codes[0], course_codes[1:]
+                if PICK_BATCH_WINDOW > 0:
+                    room.queue_pick(username, course_code, trace, fallbacks)
+                else:
+                    room.handle_selection(username, course_code, trace, fallbacks)
+            else:
+                log.warning("invalid_message", "Missing or invalid course_code from {username}",
+                            limit_key=username, username=username)
+
+        elif msg.get("type") == "hold_course":
+            course_code = msg.get("course_code")
+            if course_code and isinstance(course_code, str) and HOLD_TIME > 0:
+                room.hold_seat(username, course_code)
+
+        elif msg.get("type") == "resync":
+            with room.clients_lock:
+                session = room.clients.find(username)
+            if session is not None and getattr(session.conn, "deltas", False):
+                room.send_state(session.conn)
+
+    except (json.JSONDecodeError, UnicodeDecodeError, wire.ProtocolError) as e:
+        log.warning("invalid_message", "Invalid message from {username}: {frame!r} - {error}",
+                    limit_key=username, username=username, frame=bytes(frame), error=e)
+
+
+def drop_player(room, conn):
+    """Remove a disconnected player from their room and close their socket."""
+    room.remove_player(conn)
+    try:
+        conn.close()
+    except Exception:
+        pass
 
-        # award points
-        pts = next(c["points"] for c in round_courses if c["code"] == course_code)
-        scores[username] = scores.get(username, 0) + pts
-        player_picks.add(username)
 
-        # broadcast with the updated seat count
-        broadcast({
-            "type": "seat_update",
-            "course_code": course_code,
-            "seats_left": seat_map[course_code],
-            "username": username,
-            "denied": False
-        })
+def read_handshake(conn, reader):
+    """Receive the handshake line (a username or a hello message) into reader and return it decoded."""
+    while True:
+        line = reader.next_frame()
+        if line is not None:
+            return line.decode()
+        if len(reader) > HANDSHAKE_BYTES:
+            raise ValueError("handshake line too long")
+        if not reader.recv_from(conn):
+            raise ConnectionResetError
 
-        everyone_done = (len(player_picks) == min(len(clients), MAX_CLIENTS))
 
-        # broadcast waiting-lobby update
-        broadcast({
-            "type":         "round_wait",
-            "round":        round_no,
-            "player_count": len(player_picks),
-            "current_players": len(clients),
-            "users":        list(player_picks),
-            "scores":       scores.copy()
-        })
+def handle_connection(conn, addr, handshake=None, pending=b""):
+    """Main loop for each client connection (threaded server core).
 
-        # if someone reached the win threshold, they are the winner (highest score wins ties)
-        if scores[username] >= POINTS_TO_WIN and ((winner is None) or scores[username] > scores[winner]):
-            winner = username
-        elif all(other_points < scores[username] for other_user, other_points in scores.items() if other_user != username):
-            leading_player = username
+    A gateway that already read the handshake line passes it in, along with
+    any bytes that arrived after it as pending.
+    """
+    reader = LineReader()
+    try:
+        # Step 1: Receive the handshake
+        if handshake is None:
+            handshake = read_handshake(conn, reader)
+        else:
+            reader.feed(pending)
+    except Exception:
+        conn.close()
+        return
 
-    # finish the round and start next if all have picked
-    if everyone_done:
-        finish_round()
+    # all sends to this player go through its bounded queue and writer thread
+    outbox = OutboundQueue(conn)
+    room = None
+    try:
+        username = start_session(outbox, handshake)
+        reader = reader_for(outbox, reader)
+        room = admit_player(outbox, addr, username)
+        if room is None:
+            return   # turned away; admit_player told the client why
 
+        received = None
+        while True:
+            for frame in reader.frames():
+                handle_message(room, username, frame, outbox.encoding, received)
+            if not reader.recv_from(conn):
+                raise ConnectionResetError
+            if TRACE_PICKS:
+                received = tracing.clock()
+    except Exception as e:
+        if room is None:
+            log.warning("handshake_failed", "Bad handshake from {addr}: {error!r}",
+                        limit_key=addr[0], addr=addr, error=e)
+            close_connection(outbox)    # stops its writer thread too
+        else:
+            log.info("player_left", "{username} disconnected. {reason}", username=username, reason=e)
+    finally:
+        if room is not None:
+            drop_player(room, outbox)
 
-def handle_connection(conn, addr):
-    """Main loop for each client connection."""
-    try:
-        # Step 1: Receive and sanitize username
-        username = conn.recv(1024).decode().strip()
-        username = ''.join(username.split())
-
-        # Step 2: Check if username is already taken
-        with clients_lock:
-            existing_usernames = {u for _, u in clients}
-            if username in existing_usernames:
-                payload = { "type": "username_taken" }
-                data = (json.dumps(payload) + '\n').encode()
-                conn.sendall(data)
-                conn.close()
-                return
 
-        # Step 3: Reject if game already started or lobby full
-        with game_lock, clients_lock:
-            lobby_full = (len(clients) >= MAX_CLIENTS)
-            game_in_progress = (round_no > 0)
+def add_delay_arguments(parser):
+    """Command-line options for the room timings (shared with gateway.py)."""
+    parser.add_argument("--lobby-delay", type=float, default=LOBBY_DELAY,
+                        help=f"seconds between a full lobby and round 1 (default {LOBBY_DELAY})")
+    parser.add_argument("--round-break", type=float, default=ROUND_BREAK,
+                        help=f"seconds between rounds (default {ROUND_BREAK})")
+    parser.add_argument("--game-over-delay", type=float, default=GAME_OVER_DELAY,
+                        help=f"seconds before a finished room disconnects its players (default {GAME_OVER_DELAY})")
+    parser.add_argument("--round-time", type=float, default=ROUND_TIME,
+                        help=f"seconds players have to pick before the round ends without them (default {ROUND_TIME})")
+    parser.add_argument("--hold-seconds", type=float, default=HOLD_TIME,
+                        help=f"how long a course added to the cart keeps its seat (default {HOLD_TIME}; 0: no holds)")
+    parser.add_argument("--pick-batch-ms", type=float, default=PICK_BATCH_WINDOW * 1000,
+                        help="collect picks for this many milliseconds and resolve them together: "
+                             "fewer lock acquisitions and sends in bursts, for that much latency (default 0: off)")
 
-        if lobby_full or game_in_progress:
-            try:
-                notice = (json.dumps({
-                    "type": "game_in_progress",
-                    "reason": "No new connections accepted once the game has started."
-                }) + '\n').encode()
-                conn.sendall(notice)
-            except Exception:
-                pass
-            conn.close()
-            return
 
-        print(f"{username} connected from {addr}")
+def start_logging(prefix="[SERVER]"):
+    """Send the server log to LOG_FILE (or stdout) in LOG_FORMAT."""
+    log.configure(LOG_FILE, LOG_FORMAT, prefix=prefix)
 
-    except Exception:
-        conn.close()
-        return
 
-    # Step 4: Initialize score for new player
-    with game_lock:
-        scores.setdefault(username, 0)
+def install_profiler():
+    """Let SIGUSR1 start and stop the sampling profiler (see profiler.py)."""
+    import profiler
+    if profiler.install(PROFILE_DIR):
+        log.info("profiler_ready", "kill -USR1 {pid} toggles profiling", pid=os.getpid())
 
-    # Step 5: Add player to lobby
-    with clients_lock:
-        clients.append((conn, username))
-    update_lobby()
 
-    buffer = ""
-    try:
-        while True:
-            data = conn.recv(1024).decode()
-            if not data:
-                raise ConnectionResetError
-            buffer += data
+metrics_server = None
 
-            while '\n' in buffer:
-                line, buffer = buffer.split('\n', 1)
-                if not line:
-                    continue
 
-                try:
-                    msg = json.loads(line)
-                    if not isinstance(msg, dict) or not msg.get("type"):
-                        print(f"[SERVER] Invalid message from {username}: {line}")
-                        continue
+def start_metrics():
+    """Serve Prometheus metrics on METRICS_PORT, if one is set (see metrics.py)."""
+    global metrics_server
+    if METRICS_PORT and metrics_server is None:
+        import metrics
+        metrics_server = metrics.serve(METRICS_PORT, rooms)
 
-                    if msg.get("type") == "select_course":
-                        course_code = msg.get("course_code")
-                        if course_code:
-                            handle_selection(username, msg["course_code"])
-                        else:
-                            print(f"[SERVER] Missing course_code from {username}")
 
-                except json.JSONDecodeError as e:
-                    print(f"[SERVER] Invalid JSON from {username}: {line} - {e}")
-                    continue
-    except Exception as e:
-        print(f"[SERVER] {username} disconnected. {e}")
-    finally:
-        with clients_lock:
-            clients[:] = [(c, u) for c, u in clients if c != conn]
-        update_lobby()
-        maybe_shutdown_if_empty()   # if everyone is gone mid-game, shut down
-        try:
-            conn.close()
-        except Exception:
-            pass
+def stop_metrics():
+    global metrics_server
+    if metrics_server is not None:
+        metrics_server.shutdown()
+        metrics_server.server_close()
+        metrics_server = None
 
 
-def main():
+def main(core="threads"):
     global server_socket
-    print(f"Server listening on port {PORT}…")
+    start_logging()
+    get_catalogue()   # fail fast on a missing or broken catalogue file
+    start_metrics()
+    install_profiler()
+    if core == "asyncio":
+        import async_server
+        async_server.main()
+        return
+
+    log.info("listening", "Server listening on port {port}…", port=PORT)
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     # helpful for quick restarts during development
     server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
@@ -412,4 +1119,47 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Enrolment Rush game server")
+    parser.add_argument("--core", choices=("threads", "asyncio"), default="threads",
+                        help="threads: one thread per player (default); asyncio: single event loop")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--catalogue", default=CATALOGUE_PATH,
+                        help="course catalogue: JSON lines or a file compiled with catalogue.py")
+    parser.add_argument("--trace", action="store_true",
+                        help="time each pick through the server and print latency histograms on shutdown")
+    parser.add_argument("--lock-debug", action="store_true",
+                        help="record lock call sites and order, and print a contention report on shutdown")
+    parser.add_argument("--log-file", default=LOG_FILE,
+                        help="write the log to this file, rotated every 10 MB (default: stdout)")
+    parser.add_argument("--log-format", choices=("text", "json"), default=LOG_FORMAT,
+                        help="text lines (default) or one JSON record per line")
+    parser.add_argument("--profile-dir", default=PROFILE_DIR,
+                        help="where kill -USR1 <pid> profiling writes stack samples and allocation diffs")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="serve Prometheus metrics on 127.0.0.1:PORT/metrics (default: off)")
+    add_delay_arguments(parser)
+    args = parser.parse_args()
+
+    # Run from the importable module, not this __main__ copy of it: async_server,
+    # metrics and gateway import socket_server, so the settings and the rooms
+    # they see must live there (as gateway.worker_main does for its workers).
+    import socket_server
+    settings = {
+        "PORT": args.port,
+        "CATALOGUE_PATH": args.catalogue,
+        "TRACE_PICKS": args.trace,
+        "LOCK_DEBUG": args.lock_debug,
+        "LOG_FILE": args.log_file,
+        "LOG_FORMAT": args.log_format,
+        "PROFILE_DIR": args.profile_dir,
+        "METRICS_PORT": args.metrics_port,
+        "LOBBY_DELAY": args.lobby_delay,
+        "ROUND_BREAK": args.round_break,
+        "GAME_OVER_DELAY": args.game_over_delay,
+        "ROUND_TIME": args.round_time,
+        "PICK_BATCH_WINDOW": args.pick_batch_ms / 1000,
+        "HOLD_TIME": args.hold_seconds,
+    }
+    for name, value in settings.items():
+        setattr(socket_server, name, value)
+    socket_server.main(core=args.core)
@@ -0,0 +1,141 @@
+# stats.py
+#
+# Process-wide counters for the game server (picks, frames, bytes, send calls)
+# and timing histograms (round durations). Every thread counts into its own
+# shard, so rooms on different threads never contend for a stats lock (nor
+# ever wait on game_lock or clients_lock); readers add the shards up.
+
+import threading
+
+from tracing import Histogram
+
+_local = threading.local()
+_shards_lock = threading.Lock()     # taken when a thread first counts and by readers, never per update
+_shards = []                        # Shard of every live thread that has counted
+
+
+class Shard:
+    """One thread's counters and timings; only that thread writes to it."""
+    __slots__ = ("thread", "counters", "timings")
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.counters = {}
+        self.timings = {}       # name -> Histogram of microseconds
+
+    def merge_into(self, counters, timings):
+        # copy() is atomic, so a concurrent update can't break the iteration
+        for name, amount in self.counters.copy().items():
+            counters[name] = counters.get(name, 0) + amount
+        for name, hist in self.timings.copy().items():
+            total = timings.get(name)
+            if total is None:
+                total = timings[name] = Histogram()
+            total.merge(hist)
+
+
+_retired = Shard(None)              # totals of shards whose thread has exited
+
+
+def _shard():
+    """The calling thread's shard, registered on its first update."""
+    try:
+        return _local.shard
+    except AttributeError:
+        shard = _local.shard = Shard(threading.current_thread())
+        with _shards_lock:
+            _retire_exited()
+            _shards.append(shard)
+        return shard
+
+
+def _retire_exited():
+    # fold exited threads (one writer per connection on the threaded core)
+    # into _retired so the list stays as long as the live thread count;
+    # called with _shards_lock held
+    live = []
+    for shard in _shards:
+        if shard.thread.is_alive():
+            live.append(shard)
+        else:
+            shard.merge_into(_retired.counters, _retired.timings)
+    _shards[:] = live
+
+
+def incr(name, amount=1):
+    try:
+        counters = _local.shard.counters
+    except AttributeError:
+        counters = _shard().counters
+    counters[name] = counters.get(name, 0) + amount
+
+
+def update(**amounts):
+    """Add to several counters at once."""
+    try:
+        counters = _local.shard.counters
+    except AttributeError:
+        counters = _shard().counters
+    for name, amount in amounts.items():
+        counters[name] = counters.get(name, 0) + amount
+
+
+def observe(name, seconds):
+    """Record one duration in the named timing histogram."""
+    timings = _shard().timings
+    hist = timings.get(name)
+    if hist is None:
+        hist = timings[name] = Histogram()
+    hist.record(seconds * 1e6)
+
+
+def _totals():
+    counters, timings = {}, {}
+    with _shards_lock:
+        _retire_exited()
+        _retired.merge_into(counters, timings)
+        for shard in _shards:
+            shard.merge_into(counters, timings)
+    return counters, timings
+
+
+def timings():
+    """Summaries of every timing histogram: {name: Histogram.summary()} in microseconds."""
+    return {name: hist.summary() for name, hist in _totals()[1].items()}
+
+
+def snapshot():
+    """Return a copy of every counter."""
+    return _totals()[0]
+
+
+def reset():
+    """Zero every counter and timing (for benchmarks; updates racing with it may survive)."""
+    with _shards_lock:
+        for shard in [_retired] + _shards:
+            shard.counters.clear()
+            shard.timings.clear()
+
+
+def per_pick(counters=None):
+    """Serialization and network cost per successful or denied pick."""
+    counters = snapshot() if counters is None else counters
+    picks = counters.get("picks", 0)
+    if not picks:
+        return {}
+    return {
+        "encodes": counters.get("encodes", 0) / picks,
+        "frames_broadcast": counters.get("frames_broadcast", 0) / picks,
+        "bytes_sent": counters.get("bytes_sent", 0) / picks,
+        "send_calls": counters.get("send_calls", 0) / picks,
+    }
+
+
+def summary():
+    """One-line per-pick cost summary for the server console."""
+    counters = snapshot()
+    cost = per_pick(counters)
+    if not cost:
+        return "no picks recorded"
+    return (f"{counters['picks']} picks: {cost['bytes_sent']:.0f} bytes, "
+            f"{cost['send_calls']:.1f} send calls, {cost['encodes']:.1f} encodes per pick")
@@ -0,0 +1,125 @@
+# tests/rooms.py
+#
+# In-process rooms for the unit tests: a GameRoom whose players are fake
+# connections that record every frame sent to them, a fixed five-course
+# catalogue, and a call_later that only records what the room schedules, so
+# each test runs the room's timers (round start, hold expiry, batches)
+# itself.
+
+import json
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import log   # noqa: E402
+import socket_server   # noqa: E402
+import wire   # noqa: E402
+from catalogue import Catalogue   # noqa: E402
+
+# one round offers COURSES_PER_ROUND courses, so every round offers all of these
+COURSES = {
+    "CS 101": {"name": "Programming", "points": 3, "available_seats": 1},
+    "CS 102": {"name": "Data Structures", "points": 4, "available_seats": 2},
+    "MATH 101": {"name": "Calculus", "points": 2, "available_seats": 3},
+    "PHYS 101": {"name": "Mechanics", "points": 1, "available_seats": 4},
+    "ART 101": {"name": "Drawing", "points": 1, "available_seats": 4},
+}
+
+
+class FakeConn:
+    """A player's connection: keeps every frame the room sends it."""
+    def __init__(self, deltas=False):
+        self.encoding = wire.JSON
+        self.deltas = deltas
+        self.frames = []
+        self.read = 0       # messages already returned by new_messages()
+
+    def sendall(self, data, sent=None):
+        self.frames.append(bytes(data))
+        if sent is not None:
+            sent()
+
+    def shutdown(self, how=None):
+        pass
+
+    def close(self):
+        pass
+
+    def messages(self):
+        """Every message received, in order."""
+        return [json.loads(line) for line in b"".join(self.frames).splitlines()]
+
+    def new_messages(self):
+        """The messages received since the last call."""
+        messages = self.messages()
+        fresh, self.read = messages[self.read:], len(messages)
+        return fresh
+
+
+class Timer:
+    def __init__(self, delay, function, args):
+        self.delay = delay
+        self.function = function
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Timers:
+    """Stands in for socket_server.call_later: records calls instead of scheduling them."""
+    def __init__(self):
+        self.pending = []
+
+    def call_later(self, delay, function, *args):
+        timer = Timer(delay, function, args)
+        self.pending.append(timer)
+        return timer
+
+    def run(self, name):
+        """Run (once) every pending, uncancelled timer whose function is called name; returns how many ran."""
+        due = [t for t in self.pending if t.function.__name__ == name and not t.cancelled]
+        self.pending = [t for t in self.pending if t not in due]
+        for timer in due:
+            timer.function(*timer.args)
+        return len(due)
+
+
+class RoomTestCase(unittest.TestCase):
+    """Patches the server module for in-process rooms; restores it afterwards."""
+    def setUp(self):
+        self.timers = Timers()
+        patched = {"call_later": self.timers.call_later,
+                   "course_catalogue": Catalogue.from_dict(COURSES),
+                   "HOLD_TIME": socket_server.HOLD_TIME,
+                   "PICK_BATCH_WINDOW": socket_server.PICK_BATCH_WINDOW}
+        saved = {name: getattr(socket_server, name) for name in patched}
+        for name, value in patched.items():
+            setattr(socket_server, name, value)
+        self.addCleanup(lambda: [setattr(socket_server, name, value) for name, value in saved.items()])
+        # joins and round results would fill the test output
+        log.configure(level=log.WARNING)
+        self.addCleanup(log.configure)
+
+    def start_game(self, deltas=()):
+        """A room whose four players p0..p3 have joined and whose round 1 is open.
+
+        deltas: the usernames that negotiated delta updates. Returns (room, {username: FakeConn}).
+        """
+        room = socket_server.GameRoom(0)
+        conns = {}
+        for i in range(socket_server.MAX_CLIENTS):
+            username = f"p{i}"
+            conns[username] = FakeConn(deltas=username in deltas)
+            self.assertEqual(room.add_player(conns[username], ("127.0.0.1", i), username), "joined")
+        self.assertEqual(self.timers.run("run_step"), 1)     # the lobby delay ends: round 1
+        self.assertEqual(room.phase, socket_server.PLAYING)
+        return room, conns
+
+    @staticmethod
+    def seats(room, code):
+        return room.courses.seats_left(room.round_slots[code])
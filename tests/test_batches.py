@@ -0,0 +1,77 @@
+# tests/test_batches.py
+#
+# Batched picks (--pick-batch-ms) in process: picks queued in one window are
+# resolved together when its timer fires, earliest arrival first, in one
+# frame per client, and a batch never gives out more seats than a course has.
+
+import json
+from unittest import mock
+
+from rooms import RoomTestCase
+
+import socket_server
+
+
+class BatchTest(RoomTestCase):
+    def setUp(self):
+        super().setUp()
+        socket_server.PICK_BATCH_WINDOW = 0.05
+
+    def queue(self, room, picks):
+        """Queue (arrival, username, course_code[, fallbacks]) picks in list order, stamped with arrival."""
+        arrivals = [pick[0] for pick in picks]
+        with mock.patch.object(socket_server.time, "monotonic", side_effect=arrivals):
+            for _, username, course_code, *fallbacks in picks:
+                room.queue_pick(username, course_code, fallbacks=tuple(fallbacks))
+
+    def test_queued_picks_resolve_earliest_first(self):
+        room, conns = self.start_game()
+        watcher = conns["p3"]
+        watcher.new_messages()
+        # queued out of arrival order, as racing connection threads can
+        self.queue(room, [(3.0, "p2", "CS 101"), (1.0, "p0", "CS 101"), (2.0, "p1", "CS 101")])
+        self.assertEqual(watcher.new_messages(), [])     # nothing resolved before the window closes
+
+        self.assertEqual(self.timers.run("resolve_picks"), 1)   # one timer for the whole batch
+        updates = [m for m in watcher.new_messages() if m["type"] == "seat_update"]
+        self.assertEqual([(m["username"], m["denied"]) for m in updates],
+                         [("p0", False), ("p1", True), ("p2", True)])
+        self.assertEqual(room.player_picks, {"p0"})
+
+    def test_one_frame_per_batch(self):
+        room, conns = self.start_game(deltas=("p3",))
+        sent = {username: len(conn.frames) for username, conn in conns.items()}
+        self.queue(room, [(1.0, "p0", "CS 102"), (2.0, "p1", "MATH 101"), (3.0, "p2", "CS 102")])
+        self.timers.run("resolve_picks")
+
+        full = ["seat_update", "seat_update", "seat_update", "round_wait"]
+        deltas = ["seat_update", "round_wait"] * 3      # a round_wait delta after each grant
+        for username, conn in conns.items():
+            with self.subTest(username=username):
+                self.assertEqual(len(conn.frames), sent[username] + 1)
+                messages = [json.loads(line) for line in conn.frames[-1].splitlines()]
+                self.assertEqual([m["type"] for m in messages], deltas if conn.deltas else full)
+        round_wait = json.loads(conns["p0"].frames[-1].splitlines()[-1])
+        self.assertEqual(sorted(round_wait["users"]), ["p0", "p1", "p2"])
+        self.assertEqual(room.phase, socket_server.PLAYING)
+
+    def test_last_seat_is_never_oversold(self):
+        room, conns = self.start_game()
+        # everyone wants CS 101 (one seat), then CS 102 (two seats)
+        self.queue(room, [(float(i), f"p{i}", "CS 101", "CS 102") for i in range(4)])
+        self.timers.run("resolve_picks")
+        self.assertEqual((self.seats(room, "CS 101"), self.seats(room, "CS 102")), (0, 0))
+        updates = [m for m in conns["p0"].messages() if m["type"] == "seat_update"]
+        self.assertEqual([(m["username"], m["course_code"], m["denied"]) for m in updates],
+                         [("p0", "CS 101", False), ("p1", "CS 102", False), ("p2", "CS 102", False),
+                          ("p3", "CS 101", True)])
+
+    def test_batch_respects_held_seats(self):
+        socket_server.HOLD_TIME = 60
+        room, conns = self.start_game()
+        room.hold_seat("p3", "CS 101")
+        self.queue(room, [(1.0, "p0", "CS 101"), (2.0, "p1", "CS 101"), (3.0, "p3", "CS 101")])
+        self.timers.run("resolve_picks")
+        self.assertEqual(self.seats(room, "CS 101"), 0)
+        self.assertEqual(room.player_picks, {"p3"})     # the holder's pick confirmed the hold
+        self.assertEqual(room.holds, {})
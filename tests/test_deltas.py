@@ -0,0 +1,96 @@
+# tests/test_deltas.py
+#
+# Delta updates end to end, in process: the room stamps what it sends a
+# deltas client with sequence numbers, client.RoomState rebuilds the full
+# messages from them, and a dropped delta makes the client ask for a resync
+# and catch up from the server's snapshot.
+
+import json
+
+from rooms import RoomTestCase
+
+import socket_server
+from client import RoomState
+
+
+def feed(state, messages):
+    """Apply messages in order; returns (rebuilt messages, how many resyncs were asked for)."""
+    rebuilt, resyncs = [], 0
+    for message in messages:
+        applied, resync = state.apply(message)
+        rebuilt += applied
+        resyncs += resync
+    return rebuilt, resyncs
+
+
+# picks are a set on the server: compare them sorted
+def client_view(state):
+    return {"seq": state.seq, "users": state.users, "round": state.round, "courses": state.courses,
+            "picks": sorted(state.picks), "scores": state.scores}
+
+
+def server_view(room):
+    with room.game_lock:
+        snapshot = room.state()
+    view = {name: snapshot[name] for name in ("seq", "users", "round", "courses", "scores")}
+    view["picks"] = sorted(snapshot["picks"])
+    return view
+
+
+class DeltaTest(RoomTestCase):
+    def test_sequence_numbers_are_consecutive(self):
+        room, conns = self.start_game(deltas=("p0",))
+        room.handle_selection("p1", "CS 102")
+        room.handle_selection("p2", "CS 101")
+        seqs = [m["seq"] for m in conns["p0"].messages() if "seq" in m]
+        self.assertEqual(seqs, list(range(seqs[0], seqs[0] + len(seqs))))
+        self.assertEqual(seqs[-1], room.seq)
+
+    def test_deltas_rebuild_what_full_clients_get(self):
+        room, conns = self.start_game(deltas=("p0",))
+        room.handle_selection("p1", "CS 102")
+        room.handle_selection("p2", "MATH 101")
+        state = RoomState()
+        rebuilt, resyncs = feed(state, conns["p0"].messages())
+        self.assertEqual(resyncs, 0)
+        self.assertEqual(client_view(state), server_view(room))
+
+        full = conns["p1"].messages()
+        for kind in ("round_start", "round_wait"):
+            last_rebuilt = [m for m in rebuilt if m["type"] == kind][-1]
+            last_full = [m for m in full if m["type"] == kind][-1]
+            last_rebuilt.pop("seq", None)   # passed through as stamped
+            if kind == "round_wait":
+                last_rebuilt["users"].sort()
+                last_full["users"].sort()
+            self.assertEqual(last_rebuilt, last_full)
+        self.assertEqual([m for m in rebuilt if m["type"] == "lobby"][-1]["users"], ["p0", "p1", "p2", "p3"])
+
+    def test_dropped_delta_resyncs_to_the_server_state(self):
+        room, conns = self.start_game(deltas=("p0",))
+        p0 = conns["p0"]
+        state = RoomState()
+        feed(state, p0.new_messages())
+
+        room.handle_selection("p1", "CS 102")
+        lost = p0.new_messages()
+        self.assertTrue(lost)   # never reaches the client
+        room.handle_selection("p2", "MATH 101")
+        _, resyncs = feed(state, p0.new_messages())
+        self.assertEqual(resyncs, 1)
+        self.assertTrue(state.awaiting)
+
+        # the client's {"type": "resync"}, as the server receives it
+        socket_server.handle_message(room, "p0", json.dumps({"type": "resync"}).encode())
+        rebuilt, resyncs = feed(state, p0.new_messages())
+        self.assertEqual(resyncs, 0)
+        self.assertFalse(state.awaiting)
+        self.assertEqual(client_view(state), server_view(room))
+        self.assertEqual(rebuilt[-1]["type"], "round_wait")
+        self.assertEqual(sorted(rebuilt[-1]["users"]), ["p1", "p2"])
+
+        # and it keeps up from there on deltas alone
+        room.handle_selection("p3", "PHYS 101")
+        _, resyncs = feed(state, p0.new_messages())
+        self.assertEqual(resyncs, 0)
+        self.assertEqual(client_view(state), server_view(room))
@@ -0,0 +1,102 @@
+# tests/test_gateway.py
+#
+# Runs gateway.py with one worker process and checks that a hostile
+# handshake or a dead worker costs only the player concerned: the next
+# players are still handed over and reach a lobby.
+
+import os
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+import unittest
+
+from test_server_cli import ROOT, Player, connect, free_port
+
+
+def dead(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] in "ZX"
+    except FileNotFoundError:
+        return True
+
+
+class GatewayProcess:
+    def __init__(self, *args):
+        self.port = free_port()
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "gateway.py"), "--workers", "1", "--port", str(self.port), *args],
+            cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        self.lines = []
+        threading.Thread(target=self.collect, daemon=True).start()
+
+    def collect(self):
+        for line in self.process.stdout:
+            self.lines.append(line.decode(errors="replace"))
+
+    def wait_for(self, pattern, deadline):
+        """The first match of pattern in the output so far, waiting until deadline for one."""
+        while time.monotonic() < deadline:
+            for line in list(self.lines):
+                match = re.search(pattern, line)
+                if match:
+                    return match
+            time.sleep(0.05)
+        raise AssertionError(f"{pattern!r} not in output:\n{''.join(self.lines)}")
+
+    def stop(self):
+        self.process.send_signal(signal.SIGINT)
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        return "".join(self.lines)
+
+
+class GatewayHandOffTest(unittest.TestCase):
+    def join_after_bad_handshake(self, core):
+        gateway = GatewayProcess("--core", core)
+        try:
+            deadline = time.monotonic() + 15
+            gateway.wait_for(r"ready \(pid", deadline)
+            # control bytes would expand to \uXXXX escapes in a JSON hand-off
+            evil = connect(gateway.port, deadline)
+            evil.sendall(b"evil\n" + b"\x01" * 1000)
+            player = Player(gateway.port, "alice", deadline)
+            lobby = player.next_message("lobby")
+            evil.close()
+            player.close()
+        finally:
+            gateway.stop()
+        self.assertEqual(lobby["users"][-1], "alice")
+
+    def test_threaded_worker_survives_bad_handshake(self):
+        self.join_after_bad_handshake("threads")
+
+    def test_asyncio_worker_survives_bad_handshake(self):
+        self.join_after_bad_handshake("asyncio")
+
+    def test_dead_worker_is_replaced(self):
+        gateway = GatewayProcess()
+        try:
+            deadline = time.monotonic() + 15
+            pid = int(gateway.wait_for(r"ready \(pid (\d+)", deadline).group(1))
+            os.kill(pid, signal.SIGKILL)
+            # the gateway reaps it only when it next looks, so wait for a zombie
+            while not dead(pid) and time.monotonic() < deadline:
+                time.sleep(0.05)
+            player = Player(gateway.port, "bob", deadline)
+            lobby = player.next_message("lobby")
+            player.close()
+            gateway.wait_for(r"starting a new one", deadline)
+        finally:
+            gateway.stop()
+        self.assertEqual(lobby["users"], ["bob"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+# tests/test_holds.py
+#
+# Seat holds (hold_course) in process: a hold takes a seat that the holder's
+# pick confirms, that expiry or the end of the round gives back, and that
+# nobody else can take meanwhile.
+
+from rooms import RoomTestCase
+
+import socket_server
+
+
+def seat_updates(conn):
+    return [m for m in conn.new_messages() if m["type"] == "seat_update"]
+
+
+class HoldTest(RoomTestCase):
+    def setUp(self):
+        super().setUp()
+        # every hold has run out by the time the test runs the expiry timer
+        socket_server.HOLD_TIME = 0
+
+    def test_expired_hold_gives_the_seat_back(self):
+        room, conns = self.start_game()
+        watcher = conns["p3"]
+        watcher.new_messages()
+        room.hold_seat("p0", "CS 102")
+        self.assertEqual(self.seats(room, "CS 102"), 1)
+        self.assertEqual(seat_updates(watcher), [{"type": "seat_update", "course_code": "CS 102", "seats_left": 1,
+                                                  "username": "p0", "denied": False, "hold": "held"}])
+
+        self.assertEqual(self.timers.run("expire_holds"), 1)
+        self.assertEqual(self.seats(room, "CS 102"), 2)
+        self.assertEqual(room.holds, {})
+        self.assertEqual(seat_updates(watcher), [{"type": "seat_update", "course_code": "CS 102", "seats_left": 2,
+                                                  "username": "p0", "denied": False, "hold": "released"}])
+        # both seats can be picked again
+        room.handle_selection("p1", "CS 102")
+        room.handle_selection("p2", "CS 102")
+        self.assertEqual([m["denied"] for m in seat_updates(watcher)], [False, False])
+
+    def test_picking_the_held_course_confirms_the_hold(self):
+        room, conns = self.start_game()
+        watcher = conns["p3"]
+        room.hold_seat("p0", "CS 101")      # its only seat
+        self.assertEqual(self.seats(room, "CS 101"), 0)
+        room.handle_selection("p1", "CS 101")
+        self.assertTrue(seat_updates(watcher)[-1]["denied"])     # the held seat is not for others
+
+        room.handle_selection("p0", "CS 101")
+        self.assertEqual(self.seats(room, "CS 101"), 0)
+        self.assertEqual(room.holds, {})
+        self.assertEqual(seat_updates(watcher), [{"type": "seat_update", "course_code": "CS 101", "seats_left": 0,
+                                                  "username": "p0", "denied": False}])
+        self.assertEqual(room.player_picks, {"p0"})
+        # the confirmed hold's expiry finds nothing to give back
+        self.timers.run("expire_holds")
+        self.assertEqual(self.seats(room, "CS 101"), 0)
+        self.assertEqual(seat_updates(watcher), [])
+
+    def test_picking_another_course_releases_the_hold(self):
+        room, conns = self.start_game()
+        watcher = conns["p3"]
+        room.hold_seat("p0", "CS 102")
+        watcher.new_messages()
+        room.handle_selection("p0", "MATH 101")
+        self.assertEqual(self.seats(room, "CS 102"), 2)
+        self.assertEqual([(m["course_code"], m.get("hold")) for m in seat_updates(watcher)],
+                         [("CS 102", "released"), ("MATH 101", None)])
+
+    def test_hold_on_a_full_course_is_denied(self):
+        room, conns = self.start_game()
+        watcher = conns["p3"]
+        room.handle_selection("p0", "CS 101")
+        watcher.new_messages()
+
+        room.hold_seat("p1", "CS 101")
+        self.assertEqual(seat_updates(watcher), [{"type": "seat_update", "course_code": "CS 101", "seats_left": 0,
+                                                  "username": "p1", "denied": True, "hold": "held"}])
+        self.assertEqual(room.holds, {})
+        self.assertEqual(self.seats(room, "CS 101"), 0)
+        self.assertEqual(self.timers.run("expire_holds"), 0)
+
+    def test_round_end_clears_holds(self):
+        room, conns = self.start_game()
+        watcher = conns["p3"]
+        room.hold_seat("p0", "CS 102")
+        room.hold_seat("p1", "MATH 101")
+        self.assertEqual((self.seats(room, "CS 102"), self.seats(room, "MATH 101")), (1, 2))
+        watcher.new_messages()
+
+        room.finish_round()
+        self.assertEqual(room.phase, socket_server.BREAK)
+        self.assertEqual((room.holds, list(room.hold_expiry), room.hold_call), ({}, [], None))
+        self.assertEqual((self.seats(room, "CS 102"), self.seats(room, "MATH 101")), (2, 3))
+        # given back silently (round_over says it all), and the expiry timer is cancelled
+        self.assertEqual(seat_updates(watcher), [])
+        self.assertEqual(self.timers.run("expire_holds"), 0)
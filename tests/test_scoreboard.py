@@ -0,0 +1,81 @@
+# tests/test_scoreboard.py
+#
+# Scoreboard against the obvious implementation: after every award in a long
+# random run, rank(), top(), leader() and leaders() must match what sorting a
+# plain dict of scores gives.
+
+import os
+import random
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from scoreboard import Scoreboard   # noqa: E402
+
+
+class BruteForce:
+    """Scores in a dict, ranked by sorting on every query."""
+    def __init__(self):
+        self.points = {}
+        self.reached = {}       # username -> when they reached their current score
+        self.clock = 0
+
+    def award(self, username, points):
+        if username in self.points and points == 0:
+            return
+        self.points[username] = self.points.get(username, 0) + points
+        self.clock += 1
+        self.reached[username] = self.clock
+
+    def rank(self, username):
+        return 1 + sum(1 for p in self.points.values() if p > self.points[username])
+
+    def top(self, k):
+        ranked = sorted(self.points, key=lambda name: (-self.points[name], self.reached[name]))
+        return [(name, self.points[name]) for name in ranked[:k]]
+
+
+class ScoreboardTest(unittest.TestCase):
+    def check(self, board, expected):
+        self.assertEqual(board.as_dict(), expected.points)
+        for username in expected.points:
+            self.assertEqual(board.rank(username), expected.rank(username), username)
+        for k in (0, 1, 3, len(expected.points), len(expected.points) + 1):
+            self.assertEqual(board.top(k), expected.top(k), k)
+        ranked = expected.top(len(expected.points))
+        self.assertEqual(board.leader(), ranked[0][0] if ranked else None)
+        self.assertEqual(board.leaders(), [name for name, points in ranked if points == ranked[0][1]])
+
+    def test_matches_brute_force(self):
+        for seed in range(5):
+            rng = random.Random(seed)
+            board, expected = Scoreboard(), BruteForce()
+            players = [f"p{i}" for i in range(rng.randint(2, 30))]
+            self.check(board, expected)
+            for _ in range(400):
+                username = rng.choice(players)
+                # mostly catalogue-sized points, many ties, and now and then a
+                # jump past the Fenwick tree's size so it has to grow
+                points = rng.choice((0, 1, 1, 2, 3, 4, rng.randint(50, 3000)))
+                with self.subTest(seed=seed, username=username, points=points):
+                    self.assertEqual(board.award(username, points),
+                                     expected.points.get(username, 0) + points)
+                    expected.award(username, points)
+                    self.check(board, expected)
+
+    def test_added_players_rank_with_zero(self):
+        board, expected = Scoreboard(), BruteForce()
+        for username in ("ann", "ben", "cat"):
+            board.add(username)
+            expected.award(username, 0)
+        board.award("ben", 2)
+        expected.award("ben", 2)
+        board.add("ben")        # already tracked: no change
+        self.check(board, expected)
+        self.assertEqual([board.rank(name) for name in ("ann", "ben", "cat")], [2, 1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+# tests/test_server_cli.py
+#
+# Runs socket_server.py as a real process with command-line flags and plays
+# against it over TCP, so settings and rooms must reach whichever core serves
+# the game (the asyncio core runs from async_server, a separate module).
+
+import collections
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import unittest
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import wire   # noqa: E402
+from framing import LineReader   # noqa: E402
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def connect(port, deadline):
+    while True:
+        try:
+            return socket.create_connection(("127.0.0.1", port), timeout=5)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+class Player:
+    """A JSON-encoding player speaking the hello handshake (or sending hello, a message of its own)."""
+    def __init__(self, port, username, deadline, hello=None):
+        self.sock = connect(port, deadline)
+        self.sock.sendall(wire.hello(username, (wire.JSON,)) if hello is None else wire.encode_json(hello))
+        self.reader = LineReader()
+        self.inbox = collections.deque()    # received and not yet looked at
+
+    def next_message(self, kind):
+        """Read messages until one of type kind arrives; returns it (skipping the ones before)."""
+        while True:
+            while self.inbox:
+                message = self.inbox.popleft()
+                if message.get("type") == kind:
+                    return message
+            self.inbox.extend(json.loads(frame) for frame in self.reader.frames())
+            if not self.inbox and not self.reader.recv_from(self.sock):
+                raise ConnectionError(f"closed before {kind}")
+
+    def close(self):
+        self.sock.close()
+
+
+class ServerProcess:
+    def __init__(self, *args):
+        self.port = free_port()
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "socket_server.py"), "--port", str(self.port), *args],
+            cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            return self.process.communicate(timeout=10)[0].decode(errors="replace")
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            return self.process.communicate()[0].decode(errors="replace")
+
+
+class CommandLineSettingsTest(unittest.TestCase):
+    def play_round(self, core):
+        server = ServerProcess("--core", core, "--round-time", "7", "--lobby-delay", "0.1")
+        players = []
+        try:
+            deadline = time.monotonic() + 10
+            players = [Player(server.port, f"p{i}", deadline) for i in range(4)]
+            round_start = players[0].next_message("round_start")
+        finally:
+            for player in players:
+                player.close()
+            output = server.stop()
+        self.assertEqual(round_start["time_left"], 7)
+        self.assertEqual(output.count("Loaded"), 1, output)
+
+    def test_threaded_core_applies_flags(self):
+        self.play_round("threads")
+
+    def test_asyncio_core_applies_flags(self):
+        self.play_round("asyncio")
+
+
+class MalformedHelloTest(unittest.TestCase):
+    def join_with(self, core, hello):
+        server = ServerProcess("--core", core)
+        try:
+            player = Player(server.port, "unused", time.monotonic() + 10, hello=hello)
+            welcome = player.next_message("welcome")
+            lobby = player.next_message("lobby")
+            player.close()
+        finally:
+            output = server.stop()
+        self.assertNotIn("Traceback", output)
+        return welcome, lobby
+
+    def test_threaded_core_ignores_bad_encodings(self):
+        welcome, lobby = self.join_with("threads", {"type": "hello", "username": "bob", "encodings": 5})
+        self.assertEqual((welcome["encoding"], lobby["users"]), (wire.JSON, ["bob"]))
+
+    def test_asyncio_core_ignores_bad_encodings(self):
+        welcome, lobby = self.join_with("asyncio", {"type": "hello", "username": "bob", "encodings": 5})
+        self.assertEqual((welcome["encoding"], lobby["users"]), (wire.JSON, ["bob"]))
+
+    def test_threaded_core_ignores_bad_features(self):
+        welcome, lobby = self.join_with("threads", {"type": "hello", "username": "bob", "features": 7})
+        self.assertEqual((welcome.get("features"), lobby["users"]), (None, ["bob"]))
+
+    def test_asyncio_core_ignores_bad_features(self):
+        welcome, lobby = self.join_with("asyncio", {"type": "hello", "username": "bob", "features": 7})
+        self.assertEqual((welcome.get("features"), lobby["users"]), (None, ["bob"]))
+
+
+class MetricsTest(unittest.TestCase):
+    def scrape_connected(self, core):
+        """enrolment_connected_clients from a server with two players in its lobby."""
+        metrics_port = free_port()
+        server = ServerProcess("--core", core, "--metrics-port", str(metrics_port))
+        players = []
+        try:
+            deadline = time.monotonic() + 10
+            players = [Player(server.port, f"p{i}", deadline) for i in range(2)]
+            for player in players:
+                player.next_message("lobby")
+            # the second player's join may still be on its way to the first one's lobby
+            while True:
+                with urllib.request.urlopen(f"http://127.0.0.1:{metrics_port}/metrics", timeout=5) as response:
+                    text = response.read().decode()
+                connected = [line for line in text.splitlines() if line.startswith("enrolment_connected_clients")]
+                if connected == ["enrolment_connected_clients 2"] or time.monotonic() > deadline:
+                    return connected
+                time.sleep(0.05)
+        finally:
+            for player in players:
+                player.close()
+            server.stop()
+
+    def test_threaded_core_metrics_see_players(self):
+        self.assertEqual(self.scrape_connected("threads"), ["enrolment_connected_clients 2"])
+
+    def test_asyncio_core_metrics_see_players(self):
+        self.assertEqual(self.scrape_connected("asyncio"), ["enrolment_connected_clients 2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
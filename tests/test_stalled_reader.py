@@ -0,0 +1,163 @@
+# tests/test_stalled_reader.py
+#
+# Pick latency with one client that never reads its socket.
+#
+# Three active players pick continuously while a fourth connection stops
+# reading, so its TCP window fills up. With per-client outbound queues the
+# other players' pick latency must stay flat and the stalled client must be
+# dropped once it overflows its queue. With a direct sendall() broadcast the
+# room freezes as soon as the stalled socket's buffers are full; that run
+# checks the setup really stalls a writer.
+#
+# Latency counts as growing when the mean of the last 10% of picks is above
+# FLAT_FACTOR times the first 10%, and by more than FLAT_SLACK.
+
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import socket_server   # noqa: E402
+from catalogue import Catalogue, GameCourses   # noqa: E402
+from outbound import OutboundQueue   # noqa: E402
+
+COURSE = "BENCH 100"
+PICKS = 3000             # enough to overflow the stalled client's outbound queue
+ACTIVE_PLAYERS = 3
+SMALL_BUFFER = 4096      # shrink kernel buffers so the stalled window fills quickly
+PICK_TIMEOUT = 2.0       # seconds before we call the room frozen
+FLAT_FACTOR = 3.0        # last 10% of picks may be this many times slower than the first 10%...
+FLAT_SLACK = 0.001       # ...or this many seconds slower, before latency counts as growing
+
+_keepalive = []          # client ends stay open until exit so closing them can't unblock a run
+
+
+def tcp_pair(listener, small_buffers=False):
+    """Return (server_side, client_side) of a loopback TCP connection."""
+    client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if small_buffers:
+        client.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SMALL_BUFFER)
+    client.connect(listener.getsockname())
+    server, _ = listener.accept()
+    if small_buffers:
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SMALL_BUFFER)
+    return server, client
+
+
+class Reader(threading.Thread):
+    """Drains one active client socket and counts complete lines."""
+    def __init__(self, sock):
+        super().__init__(daemon=True)
+        self.sock = sock
+        self.lines = 0
+        self.cond = threading.Condition()
+
+    def run(self):
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except OSError:
+                return
+            if not data:
+                return
+            with self.cond:
+                self.lines += data.count(b"\n")
+                self.cond.notify_all()
+
+    def wait_for(self, lines, timeout):
+        with self.cond:
+            return self.cond.wait_for(lambda: self.lines >= lines, timeout)
+
+
+def make_room(conns):
+    """A room mid-round with one course that never runs out of seats."""
+    room = socket_server.GameRoom(0)
+    for i, conn in enumerate(conns):
+        room.clients.add(conn, f"p{i}")
+    room.round_no = 1
+    room.phase = socket_server.PLAYING
+    room.courses = GameCourses(Catalogue.from_dict({COURSE: {"name": "Benchmark", "points": 1, "available_seats": 10 ** 9}}))
+    room.choose_round_courses()
+    for i in range(len(conns)):
+        room.scores.add(f"p{i}")
+    return room
+
+
+def run(mode, picks):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+
+    active = [tcp_pair(listener) for _ in range(ACTIVE_PLAYERS)]
+    stalled_server, stalled_client = tcp_pair(listener, small_buffers=True)
+    server_socks = [s for s, _ in active] + [stalled_server]
+    _keepalive.extend([listener, stalled_client] + [c for _, c in active])
+
+    if mode == "queued":
+        conns = [OutboundQueue(s) for s in server_socks]
+    else:
+        conns = server_socks
+    room = make_room(conns)
+
+    readers = [Reader(c) for _, c in active]
+    for r in readers:
+        r.start()
+
+    latencies = []
+    frozen_at = None
+    for i in range(picks):
+        start = time.perf_counter()
+        picker = threading.Thread(target=room.handle_selection,
+                                  args=(f"p{i % ACTIVE_PLAYERS}", COURSE), daemon=True)
+        picker.start()
+        # each pick broadcasts seat_update + round_wait to every player
+        if not all(r.wait_for(2 * (i + 1), PICK_TIMEOUT) for r in readers):
+            frozen_at = i
+            break
+        # the readers can all be served while the picker is still blocked on
+        # the stalled socket (holding game_lock), so wait for it too
+        picker.join(PICK_TIMEOUT)
+        if picker.is_alive():
+            frozen_at = i
+            break
+        latencies.append(time.perf_counter() - start)
+
+    dropped = mode == "queued" and conns[-1].dead
+    return latencies, frozen_at, dropped
+
+
+def check(latencies, frozen_at, dropped):
+    """Why a queued-mode run failed, as a list of reasons (empty if it passed)."""
+    failures = []
+    if frozen_at is not None:
+        failures.append(f"room froze at pick {frozen_at}")
+    if not dropped:
+        failures.append("stalled client was never disconnected")
+    if latencies:
+        tenth = len(latencies) // 10 or 1
+        first = statistics.mean(latencies[:tenth])
+        last = statistics.mean(latencies[-tenth:])
+        if last > first * FLAT_FACTOR and last - first > FLAT_SLACK:
+            failures.append(f"latency grew from {first * 1000:.3f} ms to {last * 1000:.3f} ms (mean, first/last 10%)")
+    return failures
+
+
+class StalledReaderTest(unittest.TestCase):
+    def test_queued_broadcast_stays_flat_and_drops_the_stalled_client(self):
+        latencies, frozen_at, dropped = run("queued", PICKS)
+        self.assertEqual(check(latencies, frozen_at, dropped), [])
+
+    def test_direct_broadcast_freezes(self):
+        # what the queues are for: without them the stalled socket blocks the room
+        _, frozen_at, _ = run("direct", PICKS)
+        self.assertIsNotNone(frozen_at)
+
+
+if __name__ == "__main__":
+    unittest.main()
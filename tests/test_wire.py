@@ -0,0 +1,209 @@
+# tests/test_wire.py
+#
+# The wire protocol on its own: bin1 frames encode and decode back to the
+# dicts the JSON protocol carries, malformed frames raise ProtocolError
+# rather than whatever the decoder tripped over, and the handshake settles
+# on the best encoding and the features both sides know.
+
+import json
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import wire   # noqa: E402
+from framing import LengthPrefixedReader   # noqa: E402
+
+COURSES = ["CS 101", "CS 102", "MATH 101"]
+PLAYER_IDS = {"alice": 0, "bob": 1, "carol": 2}
+
+
+def payloads(data):
+    """The payloads of the bin1 frames in data."""
+    reader = LengthPrefixedReader()
+    reader.feed(data)
+    return list(reader.frames())
+
+
+def payload(data):
+    (only,) = payloads(data)
+    return only
+
+
+def lobby(users):
+    return {"type": "lobby", "player_count": len(users), "users": users}
+
+
+class CodecTest(unittest.TestCase):
+    def setUp(self):
+        # what a client knows once it has seen the roster and round_start
+        self.decoder = wire.BinaryDecoder()
+        self.round_trip(lobby(list(PLAYER_IDS)))
+        self.round_trip({"type": "round_start", "round": 1,
+                         "courses": [{"code": code, "points": 1, "available_seats": 2} for code in COURSES]})
+
+    def round_trip(self, message, sequenced=False):
+        course_index = {code: i for i, code in enumerate(COURSES)}
+        data = wire.encode_binary(message, course_index, PLAYER_IDS, sequenced=sequenced)
+        return self.decoder.decode(payload(data))
+
+    def test_seat_updates(self):
+        by_index = {"type": "seat_update", "course_code": "CS 102", "seats_left": 1,
+                    "username": "bob", "denied": False}
+        self.assertEqual(self.round_trip(by_index), by_index)
+        by_name = dict(by_index, course_code="ART 101", seats_left=300, denied=True)   # not in this round
+        self.assertEqual(self.round_trip(by_name), by_name)
+        for hold in ("held", "released"):
+            message = dict(by_index, hold=hold)
+            self.assertEqual(self.round_trip(message), message)
+
+    def test_round_wait_and_roster(self):
+        message = {"type": "round_wait", "round": 2, "player_count": 4, "current_players": 3,
+                   "users": ["carol", "alice"], "scores": {"alice": 3, "bob": 0, "carol": 130}}
+        self.assertEqual(self.round_trip(message), message)
+        # bob left, but his id still decodes in the scores
+        self.assertEqual(self.round_trip(lobby(["alice", "carol"])), lobby(["alice", "carol"]))
+        self.assertEqual(self.decoder.players, {0: "alice", 1: "bob", 2: "carol"})
+
+    def test_sequenced_deltas(self):
+        wait = {"type": "round_wait", "round": 1, "picked": "carol", "points": 4, "seq": 7}
+        self.assertEqual(self.round_trip(wait, sequenced=True), wait)
+        joined = {"type": "lobby", "joined": ["dave"], "left": ["bob"], "seq": 8}
+        PLAYER_IDS["dave"] = 3
+        self.addCleanup(PLAYER_IDS.pop, "dave")
+        self.assertEqual(self.round_trip(joined, sequenced=True), joined)
+        self.assertEqual(self.decoder.players[3], "dave")
+        update = {"type": "seat_update", "course_code": "MATH 101", "seats_left": 0,
+                  "username": "dave", "denied": False, "seq": 9}
+        self.assertEqual(self.round_trip(update, sequenced=True), update)
+
+    def test_other_messages_go_as_json(self):
+        message = {"type": "round_end", "round": 1, "scores": {"alice": 3}}
+        data = wire.encode_binary(message, {}, PLAYER_IDS)
+        self.assertEqual(payload(data)[0], wire.KIND_JSON)
+        self.assertEqual(self.round_trip(message), message)
+        # a name without an id cannot go compact either
+        stranger = {"type": "seat_update", "course_code": "CS 101", "seats_left": 0,
+                    "username": "mallory", "denied": False}
+        self.assertEqual(payload(wire.encode_binary(stranger, {}, PLAYER_IDS))[0], wire.KIND_JSON)
+
+    def test_client_messages(self):
+        for message in ({"type": "select_course", "course_code": "CS 101"},
+                        {"type": "select_ranked", "course_codes": ["MATH 101", "CS 102", "Über 1"]},
+                        {"type": "select_course", "course_code": "CS 101", "sent_at": 12.5},
+                        {"type": "resync"}):
+            self.assertEqual(wire.decode_client(payload(wire.encode_select(message))), message)
+        self.assertEqual(payload(wire.encode_select({"type": "select_course", "course_code": "CS 101"}))[0],
+                         wire.KIND_SELECT_COURSE)
+
+    def test_varints(self):
+        for value in (0, 1, 127, 128, 300, 2 ** 32, 2 ** 63 + 5):
+            out = bytearray(b"x")
+            wire.write_varint(out, value)
+            self.assertEqual(wire.read_varint(out, 1), (value, len(out)))
+
+
+class MalformedFrameTest(unittest.TestCase):
+    def setUp(self):
+        self.decoder = wire.BinaryDecoder()
+        self.decoder.decode(payload(wire.encode_binary(lobby(["alice", "bob"]), {}, PLAYER_IDS)))
+        self.decoder.courses = list(COURSES)
+
+    def test_truncated_server_frames(self):
+        messages = [
+            {"type": "seat_update", "course_code": "CS 101", "seats_left": 1, "username": "bob", "denied": False},
+            {"type": "seat_update", "course_code": "ART 101", "seats_left": 1, "username": "bob", "denied": True},
+            {"type": "round_wait", "round": 1, "player_count": 2, "current_players": 2,
+             "users": ["alice", "bob"], "scores": {"alice": 300, "bob": 1}},
+            lobby(["alice", "bob"]),
+            {"type": "round_end", "round": 1, "scores": {"alice": 3}},
+        ]
+        for message in messages:
+            whole = payload(wire.encode_binary(message, {"CS 101": 0}, PLAYER_IDS))
+            for cut in range(len(whole)):
+                with self.subTest(message=message["type"], cut=cut):
+                    with self.assertRaises(wire.ProtocolError):
+                        self.decoder.decode(whole[:cut])
+
+    def test_truncated_sequenced_frames(self):
+        message = {"type": "round_wait", "round": 1, "picked": "alice", "points": 200, "seq": 300}
+        whole = payload(wire.encode_binary(message, {}, PLAYER_IDS, sequenced=True))
+        for cut in range(len(whole)):
+            with self.subTest(cut=cut):
+                with self.assertRaises(wire.ProtocolError):
+                    self.decoder.decode(whole[:cut])
+
+    def test_truncated_client_frames(self):
+        for message in ({"type": "select_course", "course_code": "CS 101"},
+                        {"type": "select_ranked", "course_codes": ["CS 101", "CS 102"]},
+                        {"type": "select_course", "course_code": "CS 101", "sent_at": 1.0}):
+            whole = payload(wire.encode_select(message))
+            for cut in range(len(whole)):
+                with self.subTest(message=message, cut=cut):
+                    with self.assertRaises(wire.ProtocolError):
+                        wire.decode_client(whole[:cut])
+
+    def test_bad_utf8(self):
+        with self.assertRaises(wire.ProtocolError):
+            wire.decode_client(bytes((wire.KIND_SELECT_COURSE, 2)) + b"\xc3\x28")
+        with self.assertRaises(wire.ProtocolError):
+            wire.decode_client(bytes((wire.KIND_JSON,)) + b'{"type": "\xff"}')
+        # a roster naming player 5 "\xff"
+        with self.assertRaises(wire.ProtocolError):
+            self.decoder.decode(bytes((wire.KIND_ROSTER, 1, 5, 1, 1, 0xFF)))
+
+    def test_unknown_ids_and_kinds(self):
+        update = {"type": "seat_update", "course_code": "CS 101", "seats_left": 1, "username": "carol",
+                  "denied": False}
+        with self.assertRaises(wire.ProtocolError):   # no roster ever gave carol id 9
+            self.decoder.decode(payload(wire.encode_binary(update, {"CS 101": 0}, {"carol": 9})))
+        with self.assertRaises(wire.ProtocolError):   # index past this round's courses
+            self.decoder.decode(payload(wire.encode_binary(dict(update, username="bob"), {"CS 101": 9},
+                                                           PLAYER_IDS)))
+        for data in (b"", bytes((99,)), bytes((wire.KIND_JSON,)) + b"[1, 2]"):
+            with self.subTest(data=data):
+                with self.assertRaises(wire.ProtocolError):
+                    self.decoder.decode(data)
+        with self.assertRaises(wire.ProtocolError):
+            wire.decode_client(bytes((wire.KIND_SEAT_UPDATE,)))
+
+
+class HandshakeTest(unittest.TestCase):
+    def test_bare_username(self):
+        self.assertEqual(wire.parse_handshake(b"alice"), ("alice", wire.JSON, False, []))
+
+    def test_hello_picks_the_best_shared_encoding(self):
+        self.assertEqual(wire.parse_handshake(wire.hello("alice").rstrip()), ("alice", wire.BINARY, True, []))
+        self.assertEqual(wire.parse_handshake(wire.hello("bob", [wire.JSON, wire.BINARY])),
+                         ("bob", wire.BINARY, True, []))
+        self.assertEqual(wire.parse_handshake(wire.hello("carol", [wire.JSON])), ("carol", wire.JSON, True, []))
+        # nothing in common: JSON, which every client speaks
+        self.assertEqual(wire.parse_handshake(wire.hello("dave", ["bin9"])), ("dave", wire.JSON, True, []))
+
+    def test_features_are_those_both_sides_know(self):
+        line = wire.hello("alice", features=[wire.DELTAS, "telepathy"])
+        self.assertEqual(wire.parse_handshake(line), ("alice", wire.BINARY, True, [wire.DELTAS]))
+
+    def test_malformed_hello_fields_are_ignored(self):
+        hello = {"type": "hello", "version": wire.PROTOCOL_VERSION, "username": "alice", "encodings": [wire.BINARY]}
+        for fields in ({"encodings": "bin1"}, {"encodings": [1, {}]}, {"encodings": None},
+                       {"features": "deltas"}, {"features": [[wire.DELTAS]]}, {"features": {"deltas": 1}}):
+            with self.subTest(fields=fields):
+                self.assertEqual(wire.parse_handshake(json.dumps(dict(hello, **fields))),
+                                 ("alice", wire.JSON if "encodings" in fields else wire.BINARY, True, []))
+
+    def test_json_that_is_not_a_hello_is_a_username(self):
+        for line in ('{"type": "welcome"}', '{not json', '["hello"]'):
+            with self.subTest(line=line):
+                self.assertEqual(wire.parse_handshake(line), (line, wire.JSON, False, []))
+
+    def test_welcome(self):
+        self.assertEqual(json.loads(wire.welcome(wire.BINARY, [wire.DELTAS])),
+                         {"type": "welcome", "version": wire.PROTOCOL_VERSION, "encoding": wire.BINARY,
+                          "features": [wire.DELTAS]})
+
+
+if __name__ == "__main__":
+    unittest.main()
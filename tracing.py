@@ -0,0 +1,240 @@
+# tracing.py
+#
+# Optional per-pick latency tracing (socket_server.py --trace). Each traced
+# select_course carries a PickTrace that is stamped as it moves through the
+# server:
+#
+#   read     the recv() that delivered the frame returned
+#   lock     handle_selection acquired game_lock (with --pick-batch-ms, after
+#            the batching window: it counts as waiting for the lock)
+#   decide   the seat was granted or denied
+#   encode   the seat_update frame was encoded and queued for every player
+#   send     the last player's copy was handed to the kernel
+#
+# The gaps between the stamps are the stages below, recorded in log-linear
+# (HDR-style) histograms for the whole process and for each room. A client
+# that stamps its picks with "sent_at" (wall-clock seconds) adds a "network"
+# stage, which is only meaningful when both clocks agree (e.g. on one host).
+# With tracing off, the only cost is one flag check per recv.
+
+import collections
+import threading
+import time
+
+clock = time.perf_counter
+
+STAGES = ("network", "lock_wait", "decide", "encode", "send", "total")
+ROOM_HISTORY = 1000     # rooms whose histograms are kept (oldest dropped first)
+
+
+class Histogram:
+    """Latency histogram in microseconds with the HDR histogram's bucket layout.
+
+    Values below 2 * 2**SUB_BITS are counted exactly; above that each power of
+    two is split into 2**SUB_BITS buckets, so a percentile is never more than
+    about 3% above the true value, whatever its magnitude. Buckets are stored
+    sparsely, so a histogram costs a few hundred bytes however long it runs.
+    Not thread-safe: the module-level recorder guards its own histograms.
+    """
+    SUB_BITS = 5
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = {}    # bucket index -> count
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, micros):
+        value = int(micros) if micros > 0 else 0
+        shift = value.bit_length() - self.SUB_BITS - 1
+        index = value if shift <= 0 else (shift << self.SUB_BITS) + (value >> shift)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        # copy() is atomic, so other may be recording on another thread
+        for index, count in other.counts.copy().items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    @classmethod
+    def upper_bound(cls, index):
+        """Largest value counted in bucket index."""
+        if index < 2 << cls.SUB_BITS:
+            return index
+        shift = (index >> cls.SUB_BITS) - 1
+        mantissa = index - (shift << cls.SUB_BITS)
+        return ((mantissa + 1) << shift) - 1
+
+    def percentile(self, p):
+        """Value at or below which p percent of the recorded values fall."""
+        if not self.count:
+            return 0
+        rank = max(1, -(-self.count * p // 100))   # ceil
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self.upper_bound(index), self.max)
+        return self.max
+
+    def summary(self):
+        """{"count", "mean", "p50", "p90", "p99", "p99.9", "max"} in microseconds."""
+        result = {"count": self.count, "mean": self.total / self.count if self.count else 0.0}
+        for p in (50, 90, 99, 99.9):
+            result[f"p{p:g}"] = self.percentile(p)
+        result["max"] = self.max
+        return result
+
+
+class PickTrace:
+    """Timestamps of one select_course on its way through the server.
+
+    The broadcast that answers the pick calls expect() with the number of
+    copies it is about to queue, and every connection calls sent() once its
+    copy reaches the socket; the last one completes the trace. A pick whose
+    frame is dropped (overflow, disconnect) is never recorded.
+    """
+    __slots__ = ("room_id", "marks", "network", "pending", "lock")
+
+    def __init__(self, room_id, received, sent_at=None):
+        self.room_id = room_id
+        self.marks = {"read": received}
+        self.network = None
+        if isinstance(sent_at, (int, float)):
+            # wall-clock time of the read = now minus the time since the read
+            self.network = time.time() - (clock() - received) - sent_at
+        self.pending = 0
+        self.lock = threading.Lock()
+
+    def mark(self, stage):
+        self.marks[stage] = clock()
+
+    def expect(self, copies):
+        """The answering broadcast queues this many copies (plus one released by done_queueing)."""
+        self.pending = copies + 1
+
+    def done_queueing(self):
+        self.mark("encode")
+        self.sent()
+
+    def sent(self):
+        """Called by a connection once its copy of the answer has been written."""
+        with self.lock:
+            self.pending -= 1
+            if self.pending:
+                return
+        self.mark("send")
+        record(self)
+
+    def durations(self):
+        """Seconds spent in each stage (stages that were not reached are left out)."""
+        m = self.marks
+        result = {}
+        if self.network is not None and self.network >= 0:
+            result["network"] = self.network
+        for stage, start, end in (("lock_wait", "read", "lock"), ("decide", "lock", "decide"),
+                                  ("encode", "decide", "encode"), ("send", "encode", "send"),
+                                  ("total", "read", "send")):
+            if start in m and end in m:
+                result[stage] = m[end] - m[start]
+        return result
+
+
+class TraceGroup:
+    """The PickTraces of a batch of picks answered by one broadcast (--pick-batch-ms).
+
+    Stands in for a single PickTrace in broadcast(): every member is
+    expected, sent and completed together.
+    """
+    __slots__ = ("traces",)
+
+    def __init__(self, traces):
+        self.traces = traces
+
+    def mark(self, stage):
+        now = clock()
+        for trace in self.traces:
+            trace.marks[stage] = now
+
+    def expect(self, copies):
+        for trace in self.traces:
+            trace.expect(copies)
+
+    def done_queueing(self):
+        for trace in self.traces:
+            trace.done_queueing()
+
+    def sent(self):
+        for trace in self.traces:
+            trace.sent()
+
+
+# ─── process-wide recorder ──────────────────────────────────────────────────
+
+_lock = threading.Lock()
+_stages = {}                            # stage -> Histogram
+_rooms = collections.OrderedDict()      # room_id -> {stage: Histogram}
+
+
+def record(trace):
+    durations = trace.durations()
+    with _lock:
+        room = _rooms.get(trace.room_id)
+        if room is None:
+            room = _rooms[trace.room_id] = {}
+            if len(_rooms) > ROOM_HISTORY:
+                _rooms.popitem(last=False)
+        for stage, seconds in durations.items():
+            micros = seconds * 1e6
+            hist = _stages.get(stage)
+            if hist is None:
+                hist = _stages[stage] = Histogram()
+            hist.record(micros)
+            hist = room.get(stage)
+            if hist is None:
+                hist = room[stage] = Histogram()
+            hist.record(micros)
+
+
+def snapshot(room_id=None):
+    """Summaries of every stage, for the whole process or one room: {stage: summary}."""
+    with _lock:
+        stages = _stages if room_id is None else _rooms.get(room_id, {})
+        return {stage: stages[stage].summary() for stage in STAGES if stage in stages}
+
+
+def room_ids():
+    with _lock:
+        return list(_rooms)
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _rooms.clear()
+
+
+def report(slowest=5):
+    """Per-stage percentile table plus the rooms with the worst p99 total, for the server console."""
+    stages = snapshot()
+    if not stages:
+        return "no picks traced"
+    lines = [f"{stages['total']['count'] if 'total' in stages else 0} picks traced (microseconds)",
+             f"  {'stage':<10} {'count':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'p99.9':>8} {'max':>8}"]
+    for stage, s in stages.items():
+        lines.append(f"  {stage:<10} {s['count']:>8} {s['p50']:>8} {s['p90']:>8} {s['p99']:>8} "
+                     f"{s['p99.9']:>8} {s['max']:>8}")
+    with _lock:
+        worst = sorted(((hists["total"].percentile(99), room_id) for room_id, hists in _rooms.items()
+                        if "total" in hists), reverse=True)[:slowest]
+    if worst:
+        lines.append("  slowest rooms (p99 total): " +
+                     ", ".join(f"room {room_id} {p99}" for p99, room_id in worst))
+    return "\n".join(lines)
@@ -0,0 +1,459 @@
+# wire.py
+#
+# Wire encodings for game messages.
+#
+# "json" is the original protocol: one JSON object per line. "bin1" is a
+# compact binary encoding negotiated in the hello handshake:
+#
+#   client -> server   {"type": "hello", "version": 2, "username": ..., "encodings": ["bin1", "json"]}\n
+#   server -> client   {"type": "welcome", "version": 2, "encoding": "bin1"}\n
+#
+# after which both directions switch to frames of <varint length><payload>.
+# The payload's first byte is the message kind. The hot messages (seat_update,
+# round_wait and the lobby roster) are packed field by field with varints.
+# Courses are sent as their index in the current round's round_start list,
+# and players by a per-room id announced in the roster. Every other message
+# travels as KIND_JSON wrapping its JSON text. Old clients that send a bare
+# username line keep getting plain JSON lines.
+#
+# A hello may also ask for "features": ["deltas"] (protocol version 3). Such a
+# client gets the room's state once, as a "state" snapshot when it joins, and
+# from then on only what changed: lobby joined/left lists, the one score a
+# pick changed, a round_over without the scores it already has. Every message
+# after the snapshot carries the room's next sequence number ("seq"; in bin1,
+# a KIND_SEQ prefix), so a client that sees a gap sends {"type": "resync"}
+# and gets a fresh snapshot.
+#
+# Instead of one select_course, a client can send its whole preference list,
+# {"type": "select_ranked", "course_codes": [...]}: the server grants the
+# first listed course that still has a seat, so a lost race costs no retry.
+#
+# {"type": "hold_course", "course_code": ...} reserves a seat for a few
+# seconds while the player confirms; the seat_update that announces it (and
+# the one when the hold runs out) carries "hold": "held" or "released".
+
+import json
+import struct
+
+PROTOCOL_VERSION = 3
+JSON = "json"
+BINARY = "bin1"
+ENCODINGS = (BINARY, JSON)     # in order of preference
+DELTAS = "deltas"
+FEATURES = (DELTAS,)            # optional behaviours a hello can ask for
+
+KIND_SEAT_UPDATE = 1
+KIND_ROUND_WAIT = 2
+KIND_ROSTER = 3
+KIND_SEQ = 4                    # varint seq, then a whole inner payload (deltas clients only)
+KIND_ROUND_WAIT_DELTA = 5
+KIND_ROSTER_DELTA = 6
+KIND_SELECT_COURSE = 16
+KIND_SELECT_RANKED = 17         # varint count, then that many course code strings
+KIND_JSON = 127
+
+FLAG_DENIED = 1
+FLAG_CODE_STRING = 2            # course is not in this round: sent as a string
+FLAG_HELD = 4                   # a hold_course took the seat (or, with FLAG_DENIED, could not)
+FLAG_RELEASED = 8               # a held seat went back (expired or given up)
+HOLD_FLAGS = {"held": FLAG_HELD, "released": FLAG_RELEASED}
+
+_byte = struct.Struct("B")
+
+
+class ProtocolError(ValueError):
+    """A binary frame could not be decoded."""
+
+
+# what decoding a malformed payload raises before it is reported as a ProtocolError
+_DECODE_ERRORS = (IndexError, KeyError, UnicodeDecodeError, json.JSONDecodeError)
+
+
+# ─── varints and strings ────────────────────────────────────────────────────
+
+def write_varint(out, value):
+    """Append an unsigned LEB128 varint to bytearray out."""
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(buf, pos):
+    """Decode a varint from buf at pos; returns (value, next_pos)."""
+    result = shift = 0
+    while True:
+        try:
+            byte = buf[pos]
+        except IndexError:
+            raise ProtocolError("truncated varint") from None
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def write_string(out, text):
+    data = text.encode()
+    write_varint(out, len(data))
+    out += data
+
+
+def read_string(buf, pos):
+    length, pos = read_varint(buf, pos)
+    end = pos + length
+    if end > len(buf):
+        raise ProtocolError("truncated string")
+    try:
+        return bytes(buf[pos:end]).decode(), end
+    except UnicodeDecodeError as e:
+        raise ProtocolError(f"string is not UTF-8: {e}") from None
+
+
+def frame(payload):
+    """Prefix a payload with its varint length."""
+    out = bytearray()
+    write_varint(out, len(payload))
+    out += payload
+    return bytes(out)
+
+
+# ─── handshake ──────────────────────────────────────────────────────────────
+
+def hello(username, encodings=ENCODINGS, features=()):
+    message = {"type": "hello", "version": PROTOCOL_VERSION, "username": username, "encodings": list(encodings)}
+    if features:
+        message["features"] = list(features)
+    return encode_json(message)
+
+
+def parse_handshake(line):
+    """Parse the first line from a client.
+
+    Returns (username, encoding, negotiated, features): old clients send a bare
+    username and get JSON; new clients send a hello and get the best shared
+    encoding, plus the features of FEATURES they asked for.
+    """
+    text = line.decode() if isinstance(line, (bytes, bytearray)) else line
+    if text.lstrip().startswith("{"):
+        try:
+            msg = json.loads(text)
+        except json.JSONDecodeError:
+            msg = None
+        if isinstance(msg, dict) and msg.get("type") == "hello":
+            offered = msg.get("encodings")
+            if not isinstance(offered, list) or not all(isinstance(e, str) for e in offered):
+                offered = [JSON]    # missing or malformed: what every client speaks
+            encoding = next((e for e in ENCODINGS if e in offered), JSON)
+            requested = msg.get("features")
+            if not isinstance(requested, list) or not all(isinstance(f, str) for f in requested):
+                requested = ()
+            features = [f for f in FEATURES if f in requested]
+            return str(msg.get("username", "")), encoding, True, features
+    return text, JSON, False, []
+
+
+def welcome(encoding, features=()):
+    message = {"type": "welcome", "version": PROTOCOL_VERSION, "encoding": encoding}
+    if features:
+        message["features"] = list(features)
+    return encode_json(message)
+
+
+# ─── encoding ───────────────────────────────────────────────────────────────
+
+def encode_json(message):
+    """One message as a newline-terminated JSON line."""
+    return (json.dumps(message) + '\n').encode()
+
+
+def _json_payload(message):
+    payload = bytearray(_byte.pack(KIND_JSON))
+    payload += json.dumps(message).encode()
+    return payload
+
+
+def encode_json_frame(message):
+    return frame(_json_payload(message))
+
+
+def encode_binary(message, course_index, player_ids, sequenced=False):
+    """One server->client message as a bin1 frame.
+
+    course_index maps this round's course codes to their round_start position;
+    player_ids maps usernames to the ids announced in the room's roster.
+    With sequenced (a deltas connection), the message's "seq" goes in a
+    KIND_SEQ prefix and delta messages use their compact kinds.
+    """
+    if not sequenced:
+        return frame(_encode_payload(message, course_index, player_ids))
+    out = bytearray((KIND_SEQ,))
+    write_varint(out, message["seq"])
+    out += _encode_payload(message, course_index, player_ids, deltas=True)
+    return frame(out)
+
+
+def _encode_payload(message, course_index, player_ids, deltas=False):
+    kind = message.get("type")
+    try:
+        if kind == "seat_update":
+            return _encode_seat_update(message, course_index, player_ids)
+        if kind == "round_wait":
+            if deltas:
+                return _encode_round_wait_delta(message, player_ids)
+            return _encode_round_wait(message, player_ids)
+        if kind == "lobby":
+            if deltas:
+                return _encode_roster_delta(message, player_ids)
+            return _encode_roster(message, player_ids)
+    except KeyError:
+        pass   # a name without an id: fall back to JSON
+    return _json_payload(message)
+
+
+def _encode_seat_update(message, course_index, player_ids):
+    out = bytearray((KIND_SEAT_UPDATE,))
+    code = message["course_code"]
+    index = course_index.get(code)
+    flags = (FLAG_DENIED if message.get("denied") else 0) | (FLAG_CODE_STRING if index is None else 0)
+    if "hold" in message:
+        flags |= HOLD_FLAGS[message["hold"]]
+    out.append(flags)
+    if index is None:
+        write_string(out, code)
+    else:
+        write_varint(out, index)
+    write_varint(out, message["seats_left"])
+    write_varint(out, player_ids[message["username"]])
+    return out
+
+
+def _encode_round_wait(message, player_ids):
+    out = bytearray((KIND_ROUND_WAIT,))
+    write_varint(out, message["round"])
+    write_varint(out, message["player_count"])
+    write_varint(out, message["current_players"])
+    users = message["users"]
+    write_varint(out, len(users))
+    for name in users:
+        write_varint(out, player_ids[name])
+    scores = message["scores"]
+    write_varint(out, len(scores))
+    for name, points in scores.items():
+        write_varint(out, player_ids[name])
+        write_varint(out, points)
+    return out
+
+
+def _encode_round_wait_delta(message, player_ids):
+    out = bytearray((KIND_ROUND_WAIT_DELTA,))
+    write_varint(out, message["round"])
+    write_varint(out, player_ids[message["picked"]])
+    write_varint(out, message["points"])
+    return out
+
+
+def _encode_roster(message, player_ids):
+    # every id the room has handed out, current players first (in lobby order):
+    # scores can still mention players who left before this client joined
+    out = bytearray((KIND_ROSTER,))
+    users = message["users"]
+    present = set(users)
+    write_varint(out, len(player_ids))
+    for name in users:
+        write_varint(out, player_ids[name])
+        out.append(1)
+        write_string(out, name)
+    for name, player in list(player_ids.items()):
+        if name not in present:
+            write_varint(out, player)
+            out.append(0)
+            write_string(out, name)
+    return out
+
+
+def _encode_roster_delta(message, player_ids):
+    # joined players with their new ids; players who left by id
+    out = bytearray((KIND_ROSTER_DELTA,))
+    joined = message["joined"]
+    write_varint(out, len(joined))
+    for name in joined:
+        write_varint(out, player_ids[name])
+        write_string(out, name)
+    left = message["left"]
+    write_varint(out, len(left))
+    for name in left:
+        write_varint(out, player_ids[name])
+    return out
+
+
+def encode_select(message):
+    """One client->server message as a bin1 frame.
+
+    A select_course or select_ranked with extra fields (such as a "sent_at"
+    stamp) goes as KIND_JSON, since the compact forms only carry course codes.
+    """
+    if len(message) == 2:
+        kind = message.get("type")
+        if kind == "select_course" and message.get("course_code"):
+            out = bytearray((KIND_SELECT_COURSE,))
+            write_string(out, message["course_code"])
+            return frame(out)
+        if kind == "select_ranked" and isinstance(message.get("course_codes"), list):
+            out = bytearray((KIND_SELECT_RANKED,))
+            codes = message["course_codes"]
+            write_varint(out, len(codes))
+            for code in codes:
+                write_string(out, code)
+            return frame(out)
+    return encode_json_frame(message)
+
+
+# ─── decoding ───────────────────────────────────────────────────────────────
+
+def decode_client(payload):
+    """Decode one client->server bin1 payload into a message dict (ProtocolError if it is malformed)."""
+    try:
+        return _decode_client(payload)
+    except _DECODE_ERRORS as e:
+        raise ProtocolError(f"malformed frame: {e!r}") from None
+
+
+def _decode_client(payload):
+    if not payload:
+        raise ProtocolError("empty frame")
+    kind = payload[0]
+    if kind == KIND_SELECT_COURSE:
+        code, _ = read_string(payload, 1)
+        return {"type": "select_course", "course_code": code}
+    if kind == KIND_SELECT_RANKED:
+        count, pos = read_varint(payload, 1)
+        codes = []
+        for _ in range(count):
+            code, pos = read_string(payload, pos)
+            codes.append(code)
+        return {"type": "select_ranked", "course_codes": codes}
+    if kind == KIND_JSON:
+        return json.loads(payload[1:])
+    raise ProtocolError(f"unknown message kind {kind}")
+
+
+class BinaryDecoder:
+    """Client-side bin1 decoder.
+
+    Tracks the state the compact messages refer to (the current round's
+    courses and the room's player ids) and turns every frame back into the
+    same dict the JSON protocol would have delivered (for a deltas
+    connection, the same delta dicts).
+    """
+    def __init__(self):
+        self.courses = []      # course codes of the current round, in round_start order
+        self.players = {}      # player id -> username
+
+    def decode(self, payload):
+        """One server->client payload as a message dict (ProtocolError if it is malformed)."""
+        try:
+            return self._decode(payload)
+        except _DECODE_ERRORS as e:
+            # a truncated payload, or an id or course index never announced
+            raise ProtocolError(f"malformed frame: {e!r}") from None
+
+    def _decode(self, payload):
+        if not payload:
+            raise ProtocolError("empty frame")
+        kind = payload[0]
+        if kind == KIND_SEAT_UPDATE:
+            return self._seat_update(payload)
+        if kind == KIND_ROUND_WAIT:
+            return self._round_wait(payload)
+        if kind == KIND_ROSTER:
+            return self._roster(payload)
+        if kind == KIND_SEQ:
+            seq, pos = read_varint(payload, 1)
+            message = self._decode(payload[pos:])
+            message["seq"] = seq
+            return message
+        if kind == KIND_ROUND_WAIT_DELTA:
+            return self._round_wait_delta(payload)
+        if kind == KIND_ROSTER_DELTA:
+            return self._roster_delta(payload)
+        if kind == KIND_JSON:
+            message = json.loads(payload[1:])
+            if not isinstance(message, dict):
+                raise ProtocolError("JSON frame is not an object")
+            kind = message.get("type")
+            if kind == "round_start":
+                self.courses = [c["code"] for c in message.get("courses", [])]
+            elif kind == "state":
+                self.courses = [c["code"] for c in message.get("courses", [])]
+                self.players.update((player, name) for name, player in message.get("ids", {}).items())
+            return message
+        raise ProtocolError(f"unknown message kind {kind}")
+
+    def _seat_update(self, payload):
+        flags = payload[1]
+        if flags & FLAG_CODE_STRING:
+            code, pos = read_string(payload, 2)
+        else:
+            index, pos = read_varint(payload, 2)
+            code = self.courses[index]
+        seats, pos = read_varint(payload, pos)
+        player, pos = read_varint(payload, pos)
+        message = {"type": "seat_update", "course_code": code, "seats_left": seats,
+                   "username": self.players[player], "denied": bool(flags & FLAG_DENIED)}
+        if flags & FLAG_HELD:
+            message["hold"] = "held"
+        elif flags & FLAG_RELEASED:
+            message["hold"] = "released"
+        return message
+
+    def _round_wait(self, payload):
+        round_no, pos = read_varint(payload, 1)
+        player_count, pos = read_varint(payload, pos)
+        current_players, pos = read_varint(payload, pos)
+        count, pos = read_varint(payload, pos)
+        users = []
+        for _ in range(count):
+            player, pos = read_varint(payload, pos)
+            users.append(self.players[player])
+        count, pos = read_varint(payload, pos)
+        scores = {}
+        for _ in range(count):
+            player, pos = read_varint(payload, pos)
+            scores[self.players[player]], pos = read_varint(payload, pos)
+        return {"type": "round_wait", "round": round_no, "player_count": player_count,
+                "current_players": current_players, "users": users, "scores": scores}
+
+    def _round_wait_delta(self, payload):
+        round_no, pos = read_varint(payload, 1)
+        player, pos = read_varint(payload, pos)
+        points, pos = read_varint(payload, pos)
+        return {"type": "round_wait", "round": round_no, "picked": self.players[player], "points": points}
+
+    def _roster_delta(self, payload):
+        count, pos = read_varint(payload, 1)
+        joined = []
+        for _ in range(count):
+            player, pos = read_varint(payload, pos)
+            name, pos = read_string(payload, pos)
+            self.players[player] = name
+            joined.append(name)
+        count, pos = read_varint(payload, pos)
+        left = []
+        for _ in range(count):
+            player, pos = read_varint(payload, pos)
+            left.append(self.players[player])
+        return {"type": "lobby", "joined": joined, "left": left}
+
+    def _roster(self, payload):
+        count, pos = read_varint(payload, 1)
+        users = []
+        for _ in range(count):
+            player, pos = read_varint(payload, pos)
+            present = payload[pos]
+            name, pos = read_string(payload, pos + 1)
+            self.players[player] = name
+            if present:
+                users.append(name)
+        return {"type": "lobby", "player_count": len(users), "users": users}